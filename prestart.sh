@@ -3,7 +3,7 @@ set -e
 
 cd src
 
-# Check if the database is up
+# Check if the database is up, and create it if it doesn't exist
 python check_db.py
 
 # Run migrations
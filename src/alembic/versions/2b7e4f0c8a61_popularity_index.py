@@ -0,0 +1,25 @@
+"""popularity index
+
+Revision ID: 2b7e4f0c8a61
+Revises: e71b5c09d3a8
+Create Date: 2022-10-30 10:41:26.308117
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2b7e4f0c8a61"
+down_revision = "e71b5c09d3a8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # keyset index of `sort=popularity`, also serves the popularity filters
+    op.create_index(
+        "ix_movies_popularity_id", "movies", ["popularity", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_movies_popularity_id", table_name="movies")
@@ -0,0 +1,39 @@
+"""keyset pagination indexes
+
+Revision ID: 5a1c2e7d9b40
+Revises: 38bc891f72e5
+Create Date: 2022-10-24 18:02:11.482913
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5a1c2e7d9b40"
+down_revision = "38bc891f72e5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_movies_created_at_id", "movies", ["created_at", "id"], unique=False
+    )
+    op.create_index(
+        "ix_movies_imdb_score_id", "movies", ["imdb_score", "id"], unique=False
+    )
+    op.create_index(
+        "ix_movies_created_by_id_created_at_id",
+        "movies",
+        ["created_by_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_users_created_at_id", "users", ["created_at", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_created_at_id", table_name="users")
+    op.drop_index("ix_movies_created_by_id_created_at_id", table_name="movies")
+    op.drop_index("ix_movies_imdb_score_id", table_name="movies")
+    op.drop_index("ix_movies_created_at_id", table_name="movies")
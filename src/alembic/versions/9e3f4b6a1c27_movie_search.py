@@ -0,0 +1,64 @@
+"""movie search
+
+Revision ID: 9e3f4b6a1c27
+Revises: 5a1c2e7d9b40
+Create Date: 2022-10-26 11:37:52.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "9e3f4b6a1c27"
+down_revision = "5a1c2e7d9b40"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(director, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "movies",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_movies_search_vector",
+        "movies",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_movies_name_trgm",
+        "movies",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_movies_director_trgm",
+        "movies",
+        ["director"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"director": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_movies_director_trgm", table_name="movies")
+    op.drop_index("ix_movies_name_trgm", table_name="movies")
+    op.drop_index("ix_movies_search_vector", table_name="movies")
+    op.drop_column("movies", "search_vector")
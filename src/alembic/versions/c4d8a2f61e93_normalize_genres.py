@@ -0,0 +1,45 @@
+"""normalize genres
+
+Revision ID: c4d8a2f61e93
+Revises: 9e3f4b6a1c27
+Create Date: 2022-10-27 09:12:40.615208
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4d8a2f61e93"
+down_revision = "9e3f4b6a1c27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # trim and collapse whitespace, drop empty and duplicate entries while
+    # keeping the original order, same as `app.models.movies.normalize_genres`
+    op.execute(
+        r"""
+        UPDATE movies SET genre = ARRAY(
+            SELECT g FROM (
+                SELECT btrim(regexp_replace(raw, '\s+', ' ', 'g')) AS g, min(ord) AS ord
+                FROM unnest(movies.genre) WITH ORDINALITY AS u(raw, ord)
+                WHERE btrim(regexp_replace(raw, '\s+', ' ', 'g')) <> ''
+                GROUP BY 1
+            ) AS normalized
+            ORDER BY ord
+        )::varchar[]
+        WHERE EXISTS (
+            SELECT 1 FROM unnest(movies.genre) AS raw
+            WHERE raw <> btrim(regexp_replace(raw, '\s+', ' ', 'g'))
+        )
+        OR cardinality(genre) <> (SELECT count(DISTINCT raw) FROM unnest(movies.genre) AS raw)
+        """
+    )
+    op.create_index(
+        "ix_movies_genre", "movies", ["genre"], unique=False, postgresql_using="gin"
+    )
+
+
+def downgrade() -> None:
+    # the original spellings are gone, only the index can be reverted
+    op.drop_index("ix_movies_genre", table_name="movies")
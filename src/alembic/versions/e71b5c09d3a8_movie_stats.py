@@ -0,0 +1,219 @@
+"""movie stats
+
+Revision ID: e71b5c09d3a8
+Revises: c4d8a2f61e93
+Create Date: 2022-10-29 10:21:06.318842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "e71b5c09d3a8"
+down_revision = "c4d8a2f61e93"
+branch_labels = None
+depends_on = None
+
+STATS_TRIGGER = """
+DROP TYPE IF EXISTS movie_stats_change CASCADE;
+CREATE TYPE movie_stats_change AS (
+    id uuid, director varchar, genre varchar[], imdb_score float, popularity float,
+    delta integer
+);
+
+CREATE OR REPLACE FUNCTION movie_stats_apply(changes movie_stats_change[]) RETURNS void AS $$
+BEGIN
+    IF cardinality(changes) = 0 THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO movie_director_stats AS s
+        (director, movie_count, imdb_score_sum, popularity_sum, popularity_count, avg_imdb_score)
+    SELECT
+        director, movie_count, imdb_score_sum, popularity_sum, popularity_count,
+        imdb_score_sum / nullif(movie_count, 0)
+    FROM (
+        SELECT
+            director,
+            sum(delta) AS movie_count,
+            sum(delta * imdb_score) AS imdb_score_sum,
+            sum(delta * coalesce(popularity, 0)) AS popularity_sum,
+            sum(CASE WHEN popularity IS NULL THEN 0 ELSE delta END) AS popularity_count
+        FROM unnest(changes)
+        GROUP BY director
+    ) AS d
+    WHERE (movie_count, imdb_score_sum, popularity_sum, popularity_count) <> (0, 0, 0, 0)
+    ORDER BY director
+    ON CONFLICT (director) DO UPDATE SET
+        movie_count = s.movie_count + excluded.movie_count,
+        imdb_score_sum = s.imdb_score_sum + excluded.imdb_score_sum,
+        popularity_sum = s.popularity_sum + excluded.popularity_sum,
+        popularity_count = s.popularity_count + excluded.popularity_count,
+        avg_imdb_score = (s.imdb_score_sum + excluded.imdb_score_sum)
+            / nullif(s.movie_count + excluded.movie_count, 0);
+
+    INSERT INTO movie_genre_stats AS s
+        (genre, movie_count, imdb_score_sum, popularity_sum, popularity_count, avg_imdb_score)
+    SELECT
+        genre, movie_count, imdb_score_sum, popularity_sum, popularity_count,
+        imdb_score_sum / nullif(movie_count, 0)
+    FROM (
+        SELECT
+            g.genre,
+            sum(c.delta) AS movie_count,
+            sum(c.delta * c.imdb_score) AS imdb_score_sum,
+            sum(c.delta * coalesce(c.popularity, 0)) AS popularity_sum,
+            sum(CASE WHEN c.popularity IS NULL THEN 0 ELSE c.delta END) AS popularity_count
+        FROM unnest(changes) AS c
+        CROSS JOIN LATERAL (SELECT DISTINCT unnest(c.genre) AS genre) AS g
+        GROUP BY g.genre
+    ) AS d
+    WHERE (movie_count, imdb_score_sum, popularity_sum, popularity_count) <> (0, 0, 0, 0)
+    ORDER BY genre
+    ON CONFLICT (genre) DO UPDATE SET
+        movie_count = s.movie_count + excluded.movie_count,
+        imdb_score_sum = s.imdb_score_sum + excluded.imdb_score_sum,
+        popularity_sum = s.popularity_sum + excluded.popularity_sum,
+        popularity_count = s.popularity_count + excluded.popularity_count,
+        avg_imdb_score = (s.imdb_score_sum + excluded.imdb_score_sum)
+            / nullif(s.movie_count + excluded.movie_count, 0);
+
+    DELETE FROM movie_genres
+    WHERE movie_id IN (SELECT id FROM unnest(changes) WHERE delta < 0);
+    INSERT INTO movie_genres (genre, movie_id, imdb_score)
+    SELECT DISTINCT unnest(genre), id, imdb_score FROM unnest(changes) WHERE delta > 0;
+
+    DELETE FROM movie_director_stats
+    WHERE movie_count <= 0
+        AND director IN (SELECT director FROM unnest(changes) WHERE delta < 0);
+    DELETE FROM movie_genre_stats
+    WHERE movie_count <= 0
+        AND genre IN (SELECT unnest(genre) FROM unnest(changes) WHERE delta < 0);
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION movies_stats_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM movie_stats_apply(ARRAY(
+            SELECT (id, director, genre, imdb_score, popularity, 1)::movie_stats_change
+            FROM new_rows
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM movie_stats_apply(ARRAY(
+            SELECT (id, director, genre, imdb_score, popularity, -1)::movie_stats_change
+            FROM old_rows
+        ));
+    ELSE
+        PERFORM movie_stats_apply(ARRAY(
+            SELECT (c.id, c.director, c.genre, c.imdb_score, c.popularity, c.delta)::movie_stats_change
+            FROM old_rows AS o
+            JOIN new_rows AS n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES
+                (o.id, o.director, o.genre, o.imdb_score, o.popularity, -1),
+                (n.id, n.director, n.genre, n.imdb_score, n.popularity, 1)
+            ) AS c (id, director, genre, imdb_score, popularity, delta)
+            WHERE (o.director, o.genre, o.imdb_score, o.popularity)
+                IS DISTINCT FROM (n.director, n.genre, n.imdb_score, n.popularity)
+        ));
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS movies_stats_insert ON movies;
+CREATE TRIGGER movies_stats_insert
+    AFTER INSERT ON movies REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE movies_stats_trigger();
+
+DROP TRIGGER IF EXISTS movies_stats_update ON movies;
+CREATE TRIGGER movies_stats_update
+    AFTER UPDATE ON movies REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE movies_stats_trigger();
+
+DROP TRIGGER IF EXISTS movies_stats_delete ON movies;
+CREATE TRIGGER movies_stats_delete
+    AFTER DELETE ON movies REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE movies_stats_trigger();
+"""
+
+
+def _stats_table(name: str, key: str, source: str) -> None:
+    """Create an aggregate table and fill it from `source` rows of movies."""
+    op.create_table(
+        name,
+        sa.Column(key, sa.String(), nullable=False),
+        sa.Column("movie_count", sa.BigInteger(), nullable=False),
+        sa.Column("imdb_score_sum", sa.Float(), nullable=False),
+        sa.Column("popularity_sum", sa.Float(), nullable=False),
+        sa.Column("popularity_count", sa.BigInteger(), nullable=False),
+        sa.Column("avg_imdb_score", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint(key),
+    )
+    op.execute(
+        f"""
+        INSERT INTO {name}
+            ({key}, movie_count, imdb_score_sum, popularity_sum, popularity_count, avg_imdb_score)
+        SELECT {key}, count(*), sum(imdb_score), coalesce(sum(popularity), 0), count(popularity),
+            avg(imdb_score)
+        FROM {source} AS m
+        GROUP BY {key}
+        """
+    )
+
+
+def upgrade() -> None:
+    _stats_table(
+        "movie_genre_stats",
+        "genre",
+        "(SELECT DISTINCT id, unnest(genre) AS genre, imdb_score, popularity FROM movies)",
+    )
+    op.create_index(
+        "ix_movie_genre_stats_movie_count", "movie_genre_stats", ["movie_count", "genre"]
+    )
+    _stats_table("movie_director_stats", "director", "movies")
+    op.create_index(
+        "ix_movie_director_stats_avg_imdb_score",
+        "movie_director_stats",
+        ["avg_imdb_score", "director"],
+    )
+    op.create_index(
+        "ix_movie_director_stats_movie_count",
+        "movie_director_stats",
+        ["movie_count", "director"],
+    )
+    op.create_table(
+        "movie_genres",
+        sa.Column("genre", sa.String(), nullable=False),
+        sa.Column("movie_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("imdb_score", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["movie_id"], ["movies.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("genre", "movie_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO movie_genres (genre, movie_id, imdb_score)
+        SELECT DISTINCT unnest(genre), id, imdb_score FROM movies
+        """
+    )
+    op.create_index(
+        "ix_movie_genres_genre_imdb_score",
+        "movie_genres",
+        ["genre", "imdb_score", "movie_id"],
+    )
+    op.execute(STATS_TRIGGER)
+
+
+def downgrade() -> None:
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS movies_stats_{event} ON movies")
+    op.execute("DROP FUNCTION IF EXISTS movies_stats_trigger()")
+    op.execute("DROP TYPE IF EXISTS movie_stats_change CASCADE")
+    op.drop_index("ix_movie_genres_genre_imdb_score", table_name="movie_genres")
+    op.drop_table("movie_genres")
+    op.drop_index("ix_movie_director_stats_movie_count", table_name="movie_director_stats")
+    op.drop_index("ix_movie_director_stats_avg_imdb_score", table_name="movie_director_stats")
+    op.drop_table("movie_director_stats")
+    op.drop_index("ix_movie_genre_stats_movie_count", table_name="movie_genre_stats")
+    op.drop_table("movie_genre_stats")
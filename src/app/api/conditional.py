@@ -0,0 +1,36 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette import status
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag derived from the values that identify a representation."""
+    raw = json.dumps(jsonable_encoder(parts), sort_keys=True).encode()
+    return f'W/"{hashlib.sha1(raw).hexdigest()}"'
+
+
+def _opaque(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """`If-None-Match` check using weak comparison, as RFC 7232 requires."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(candidate) == opaque for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    # the same `Vary` as the 200 it stands for, movie responses come in several codings
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Vary": "Accept-Encoding"},
+    )
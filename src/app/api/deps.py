@@ -1,22 +1,44 @@
-from typing import Generator
+import math
+import time
+from typing import AsyncGenerator, Callable, Generator, Optional, Tuple
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app import crud, models, schemas
-from app.db.session import SessionLocal
+from app import crud, schemas
+from app.cache.tokens import cache_principal, get_principal, token_cache, user_epoch
+from app.db.session import (
+    AsyncSessionLocal,
+    SessionLocal,
+    async_replica_engines,
+    primary_pins,
+    replica_engines,
+    replica_router,
+)
+from app.metrics.http import requests_rejected
+from app.ratelimit import RateLimit, limiters
 from config import settings
 
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
 
-def get_db() -> Generator:
-    """Dependency to get a database session."""
+def get_db(request: Request) -> Generator:
+    """
+    Dependency to get a database session on the primary.
+
+    Clients making a write request are pinned to the primary for a while,
+    see `get_read_db`.
+    """
+    if request.method not in SAFE_METHODS:
+        primary_pins.pin(request.headers.get("Authorization"))
     try:
         db = SessionLocal()
         yield db
@@ -24,10 +46,50 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
-    """Dependency to get current user from token."""
+def get_read_db(request: Request) -> Generator:
+    """
+    Dependency to get a session for reads, on a replica when there are some.
+
+    Clients that recently wrote read from the primary so they see their
+    own writes. Replica sessions have `info["replica"]` set, see
+    `app.api.endpoints.movies.serves_fresh`.
+    """
+    if not replica_router or primary_pins.pinned(request.headers.get("Authorization")):
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    with replica_router.choose() as index:
+        db = SessionLocal(bind=replica_engines[index], info={"replica": True})
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    """Dependency to get an async database session, used when `ASYNC_DB` is on."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator:
+    """Async variant of `get_read_db`."""
+    if not async_replica_engines or primary_pins.pinned(request.headers.get("Authorization")):
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    with replica_router.choose() as index:
+        async with AsyncSessionLocal(
+            bind=async_replica_engines[index], info={"replica": True}
+        ) as db:
+            yield db
+
+
+def decode_token(token: str) -> Tuple[schemas.TokenPayload, float]:
+    """Verify an access token, returns its payload and how long it can be cached."""
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -39,15 +101,115 @@ def get_current_user(
             detail="Could not validate credentials",
         ) from e
 
+    ttl = settings.TOKEN_CACHE_TTL_SECONDS
+    if expires_at := payload.get("exp"):
+        ttl = min(ttl, expires_at - time.time())
+    return token_data, ttl
+
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> schemas.UserPrincipal:
+    """
+    Dependency to get current user from token.
+
+    Verified tokens are cached until they expire (or for at most
+    `TOKEN_CACHE_TTL_SECONDS`), so repeated requests with the same token
+    neither decode the JWT nor query the user. Entries are outdated through
+    `app.cache.tokens.invalidate_user` whenever the user changes. The user
+    is read from the primary, a lagging replica could cache a stale one.
+    """
+    if principal := get_principal(token):
+        return principal
+
+    token_data, ttl = decode_token(token)
+    epoch = user_epoch(token_data.sub)
     if not (user := crud.user.get(db, id=token_data.sub)):
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    principal = schemas.UserPrincipal.from_orm(user)
+    cache_principal(token, principal, epoch=epoch, ttl=ttl)
+    return principal
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(reusable_oauth2)
+) -> schemas.UserPrincipal:
+    """Async variant of `get_current_user`, sharing the same token cache."""
+    if principal := get_principal(token):
+        return principal
+
+    token_data, ttl = decode_token(token)
+    epoch = user_epoch(token_data.sub)
+    if not (user := await crud.user_async.get(db, id=token_data.sub)):
+        raise HTTPException(status_code=404, detail="User not found")
+    principal = schemas.UserPrincipal.from_orm(user)
+    cache_principal(token, principal, epoch=epoch, ttl=ttl)
+    return principal
 
 
 def get_current_active_admin_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    current_user: schemas.UserPrincipal = Depends(get_current_user),
+) -> schemas.UserPrincipal:
     """Dependency to get current active admin user."""
     if not crud.user.is_admin(current_user):
         raise HTTPException(status_code=401, detail="Not enough permissions")
     return current_user
+
+
+def token_user_id(request: Request) -> Optional[str]:
+    """Id of the user of a valid bearer token, without loading the user."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    # the id of a token never changes, no need to check the user's epoch
+    if cached := token_cache.get(token):
+        return str(cached.principal.id)
+    try:
+        token_data, _ = decode_token(token)
+    except HTTPException:
+        return None
+    return str(token_data.sub)
+
+
+def rate_limit_key(request: Request, rule: RateLimit) -> str:
+    """
+    The client as `rule` tells them apart. Requests without a valid token
+    are keyed by IP where the rule wants the user.
+    """
+    ip = request.client.host if request.client else "unknown"
+    parts = []
+    for part in rule.by:
+        if part == "ip":
+            parts.append(ip)
+        elif part == "user":
+            parts.append(token_user_id(request) or f"ip:{ip}")
+        else:
+            route = request.scope.get("route")
+            parts.append(f"{request.method} {getattr(route, 'path', request.url.path)}")
+    return "|".join(parts)
+
+
+def rate_limit(*rules: RateLimit) -> Callable[[Request], None]:
+    """
+    Dependency enforcing `rules`, answering 429 with `Retry-After` once a
+    client is over one of them. Add it to a router's `dependencies`, see
+    `app.api.router`.
+    """
+
+    def check_rate_limits(request: Request) -> None:
+        if (limiter := limiters.rate_limiter) is None:
+            return
+        for rule in rules:
+            decision = limiter.hit(rule, rate_limit_key(request, rule))
+            if not decision.allowed:
+                requests_rejected.labels("rate_limit").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={
+                        "Retry-After": str(max(1, math.ceil(decision.retry_after))),
+                        "X-RateLimit-Limit": str(rule.limit),
+                    },
+                )
+
+    return check_rate_limits
@@ -0,0 +1,72 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Response, status
+
+from app import crud
+from app.cache.tokens import token_cache
+from app.catalogue import catalogue
+from app.db.health import DatabaseProbe, migration_head, pool_available
+from app.db.session import engine
+from app.search import search_index
+from config import settings
+
+router = APIRouter()
+
+database_probe = DatabaseProbe(
+    engine,
+    ttl=settings.HEALTH_PROBE_TTL_SECONDS,
+    timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS,
+)
+
+
+def cache_state() -> Dict[str, Any]:
+    """How warm the in-process caches are, reported but never failing readiness."""
+    age = catalogue.age()
+    return {
+        "catalogue": {
+            "enabled": settings.CATALOGUE_SNAPSHOT and catalogue.available,
+            "warm": age is not None and age < catalogue.max_age,
+            "age_seconds": age,
+        },
+        "search_index": {
+            "enabled": crud.movie.search_backend(engine.dialect.name) == "memory",
+            "warm": search_index.built,
+        },
+        "tokens": {"entries": len(token_cache)},
+    }
+
+
+@router.get("/live")
+async def live() -> Dict[str, str]:
+    """The worker's event loop answers, nothing else is checked."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready(response: Response) -> Dict[str, Any]:
+    """
+    Whether the worker can serve requests: the database answers, the pool
+    has a free connection and the schema is at the migration head. Returns
+    503 otherwise, so load balancers stop routing to the worker.
+    """
+    probe = await database_probe.check_async()
+    checks: Dict[str, Dict[str, Any]] = {
+        "database": {
+            "ok": probe.ok,
+            "latency_ms": None if probe.latency_seconds is None else probe.latency_seconds * 1000,
+            "error": probe.error,
+        },
+    }
+    if hasattr(engine.pool, "status_dict"):
+        checks["pool"] = pool_available(engine.pool.status_dict())
+    if settings.HEALTH_CHECK_MIGRATIONS:
+        head = migration_head()
+        checks["migrations"] = {
+            "ok": probe.ok and probe.revision == head,
+            "current": probe.revision,
+            "head": head,
+        }
+    ok = all(check["ok"] for check in checks.values())
+    if not ok:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ok else "unavailable", "checks": checks, "caches": cache_state()}
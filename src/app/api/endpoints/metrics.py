@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from app.metrics import CONTENT_TYPE, registry
+from app.metrics import collectors  # noqa: F401, registers the collectors
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """The metrics of this worker in the Prometheus text format."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,82 @@
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.api import deps
+from app.models.movies import normalize_genre
+
+router = APIRouter()
+
+
+@router.get("/genres/", response_model=List[schemas.GenreStats])
+def get_genre_stats(
+    db: Session = Depends(deps.get_read_db),
+    offset: int = 0,
+    limit: int = Query(default=100, ge=1, le=100),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Movie count and average scores per genre, most common genres first.
+    """
+    return crud.stats.genres(db, offset=offset, limit=limit)
+
+
+@router.get("/genres/{genre}/", response_model=schemas.GenreStats)
+def get_genre_stat(
+    genre: str,
+    db: Session = Depends(deps.get_read_db),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Movie count and average scores of a genre.
+    """
+    if stats := crud.stats.genre(db, genre=normalize_genre(genre)):
+        return stats
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No movies for {genre=}")
+
+
+@router.get("/genres/{genre}/top/", response_model=List[schemas.Movie])
+def get_top_rated(
+    genre: str,
+    db: Session = Depends(deps.get_read_db),
+    limit: int = Query(default=50, ge=1, le=100),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Best scored movies of a genre.
+    """
+    return crud.stats.top_rated(db, genre=normalize_genre(genre), limit=limit)
+
+
+@router.get("/directors/", response_model=List[schemas.DirectorStats])
+def get_director_stats(
+    db: Session = Depends(deps.get_read_db),
+    sort: str = Query(default="movie_count", regex="^(movie_count|avg_imdb_score)$"),
+    min_movies: int = Query(default=1, ge=1),
+    offset: int = 0,
+    limit: int = Query(default=100, ge=1, le=100),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Directors ranked by movie count or average score, descending.
+
+    `min_movies` keeps directors with a single well rated movie from topping
+    the average score ranking.
+    """
+    return crud.stats.directors(db, sort=sort, min_movies=min_movies, offset=offset, limit=limit)
+
+
+@router.get("/directors/{director}/", response_model=schemas.DirectorStats)
+def get_director_stat(
+    director: str,
+    db: Session = Depends(deps.get_read_db),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Movie count and average scores of a director.
+    """
+    if stats := crud.stats.director(db, director=director):
+        return stats
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No movies for {director=}")
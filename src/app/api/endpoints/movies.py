@@ -1,47 +1,488 @@
-from typing import Any, List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from pydantic.types import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.sql import Select
+from starlette.responses import Response
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.conditional import etag_matches, make_etag, not_modified
+from app.api.serialization import dump_row, dump_rows, partial_schema, schema_columns
+from app.cache.responses import MOVIES_DETAIL, MOVIES_LIST, CachedResponse, response_cache
+from app.catalogue import Selection, catalogue
+from app.crud.counts import COUNT_STRATEGIES
+from app.crud.crud_movies import BulkWriteError
+from app.crud.filters import FilterError
+from app.crud.pagination import Page, PaginationError, build_page, decode_cursor, parse_sort
+from app.db.session import SessionLocal
+from app.search import tokenize
+from config import settings
 
 router = APIRouter()
 
+MOVIE_FIELDS = tuple(schemas.Movie.__fields__)
+
+
+def movie_fields(
+    fields: Optional[str] = Query(
+        default=None,
+        description="Comma separated fields to return, e.g. `id,name,imdb_score`",
+    ),
+) -> Optional[Tuple[str, ...]]:
+    """The requested sparse fieldset in schema order, None for all fields."""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if unknown := requested.difference(MOVIE_FIELDS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields {sorted(unknown)}, expected some of {list(MOVIE_FIELDS)}",
+        )
+    return tuple(name for name in MOVIE_FIELDS if name in requested)
+
+
+class MovieListParams:
+    """
+    Query parameters of the movie listing, shared by the sync and async
+    endpoints.
+
+    Besides the declared parameters movies are filtered with
+    `field[op]=value` parameters, see `MovieMixin.filter_fields`.
+    """
+
+    names = (
+        "offset", "limit", "cursor", "sort", "search", "genre", "genre_match", "fields", "count"
+    )
+
+    def __init__(
+        self,
+        request: Request,
+        offset: int = 0,
+        limit: int = Query(default=100, ge=1, lte=100),
+        cursor: Optional[str] = None,
+        sort: Optional[str] = Query(
+            default=None,
+            regex=r"^(-?(created_at|imdb_score|popularity|id)|rank)$",
+            description="`created_at` by default, `rank` (the default) with `search`",
+        ),
+        search: Optional[str] = Query(default=None, min_length=1, max_length=200),
+        genre: Optional[List[str]] = Query(default=None),
+        genre_match: str = Query(default="all", regex="^(all|any)$"),
+        fields: Optional[Tuple[str, ...]] = Depends(movie_fields),
+        count: Optional[str] = Query(
+            default=None,
+            regex=f"^({'|'.join(COUNT_STRATEGIES)})$",
+            description="Send the total in `X-Total-Count`, counted this way",
+        ),
+    ):
+        # search results come from the full-text index in relevance order, no
+        # index serves them in another order or seeks past a cursor
+        if search and cursor:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="cursor can't be combined with search, use offset",
+            )
+        if search and sort not in (None, "rank"):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"search results are ordered by relevance, sort={sort} isn't supported with it",
+            )
+        if not search and sort == "rank":
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="sort=rank needs search",
+            )
+        params = (
+            (key, value)
+            for key, value in request.query_params.multi_items()
+            if key not in self.names
+        )
+        try:
+            conditions = crud.movie.parse_filters(params)
+            if genre:
+                op = "in" if genre_match == "any" else "all"
+                conditions += (crud.movie.filter_condition("genre", op, genre),)
+        except FilterError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        self.offset = offset
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort or ("rank" if search else "created_at")
+        self.search = search
+        self.conditions = conditions
+        self.fields = fields
+        self.count = count
+
+    def apply_filters(self, statement):
+        """Apply the filters to a `Query` or `Select` of movies."""
+        return crud.movie.apply_filters(statement, self.conditions)
+
+    def filter_key(self) -> Dict[str, Any]:
+        """Normalized parameters deciding which movies match."""
+        return {
+            "search": tokenize(self.search),
+            "filters": sorted(self.conditions, key=lambda c: (c.field, c.op)),
+        }
+
+    def cache_key(self) -> Dict[str, Any]:
+        """Normalized parameters, equivalent requests share a cache entry."""
+        return {
+            "offset": self.offset,
+            "limit": self.limit,
+            "cursor": self.cursor,
+            "sort": self.sort,
+            "fields": self.fields,
+            "count": self.count,
+            **self.filter_key(),
+        }
+
+    def count_method(self, estimate: Optional[int]) -> Optional[str]:
+        """The count to send, `auto` counts exactly when the estimate is small."""
+        if self.count == "auto":
+            return "exact" if estimate <= settings.COUNT_EXACT_THRESHOLD else "estimate"
+        return self.count
+
+    def search_limit(self) -> Optional[int]:
+        """
+        Matches a search needs: up to the end of the page when the ranking
+        alone decides it, all of them when filters or a count apply too.
+        """
+        if self.conditions or self.count:
+            return None
+        return self.offset + self.limit + 1
+
+    def count_key(self) -> str:
+        return response_cache.key(MOVIES_LIST, {"count": self.filter_key()})
+
+    def from_catalogue(self) -> Optional[Selection]:
+        """The page of ids from the catalogue snapshot, None if it can't serve the filters."""
+        try:
+            keys, descending = parse_sort(self.sort, crud.movie.sort_fields)
+            after = None
+            if self.cursor:
+                after = decode_cursor(models.Movies, self.cursor, keys, descending)
+        except PaginationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return catalogue.select(
+            self.conditions,
+            keys=keys,
+            descending=descending,
+            after=after,
+            offset=self.offset,
+            limit=self.limit,
+        )
+
+    def select(self, statement):
+        """Narrow the statement to the fields, keeping the sort keys for the cursor."""
+        extra = ("id",) if self.search else ("id", self.sort.lstrip("-"))
+        return select_movies(statement, self.fields, extra=extra)
+
+
+def select_movies(statement, fields: Optional[Tuple[str, ...]], *, extra: Tuple[str, ...] = ()):
+    """
+    Load only what is rendered from a `Query` or `Select` of movies.
+
+    With `settings.FAST_SERIALIZATION` the columns are selected as rows,
+    otherwise entities are loaded with `load_only`. `extra` columns are
+    loaded but not rendered, e.g. the keys a cursor or ETag is built from.
+    """
+    if fields is None and not settings.FAST_SERIALIZATION:
+        return statement
+    names = MOVIE_FIELDS if fields is None else set(fields).union(extra)
+    columns = schema_columns(schemas.Movie, models.Movies, names)
+    if not settings.FAST_SERIALIZATION:
+        return statement.options(load_only(*columns))
+    if isinstance(statement, Select):
+        return statement.with_only_columns(*columns)
+    return statement.with_entities(*columns)
+
+
+def movie_etag(id: UUID, updated_at: Any, fields: Optional[Tuple[str, ...]] = None) -> str:
+    return make_etag(id, updated_at, fields)
+
+
+def render_movies(
+    items: List[Any],
+    *,
+    etag: str,
+    next_cursor: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> CachedResponse:
+    """
+    Serialize a page of movies like `response_model=List[schemas.Movie]` would.
+
+    Rows of a column query are encoded directly, entities are validated
+    through the schema first, or the schema restricted to `fields`.
+    """
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if items and isinstance(items[0], Row):
+        return CachedResponse(dump_rows(items, fields), headers)
+    schema = partial_schema(schemas.Movie, fields) if fields else schemas.Movie
+    return CachedResponse.from_content([schema.from_orm(item) for item in items], headers)
+
+
+def render_movie(item: Any, fields: Optional[Tuple[str, ...]] = None) -> CachedResponse:
+    headers = {"ETag": movie_etag(item.id, item.updated_at, fields)}
+    if isinstance(item, Row):
+        return CachedResponse(dump_row(item, fields), headers)
+    schema = partial_schema(schemas.Movie, fields) if fields else schemas.Movie
+    return CachedResponse.from_content(schema.from_orm(item), headers)
+
+
+def listing_version() -> Optional[int]:
+    """
+    Version of the movie listing cache, None unless the cache is shared and
+    healthy.
+
+    Every movie write bumps it, so with the parameters it identifies a
+    listing without aggregating the matching movies. A per-process counter
+    misses the writes of other workers, the import CLI and plain SQL, an
+    ETag built from it would answer 304 for a changed listing.
+    """
+    return response_cache.version(MOVIES_LIST) if response_cache.shared else None
+
+
+def catalogue_version() -> Optional[int]:
+    """
+    The listing version a catalogue snapshot has to be at, None when it's off
+    or the version may have missed a write.
+    """
+    if not (settings.CATALOGUE_SNAPSHOT and catalogue.available and response_cache.healthy):
+        return None
+    return response_cache.version(MOVIES_LIST)
+
+
+def serves_fresh(db: Any) -> bool:
+    """
+    Whether the session sees every movie write: it is on the primary, or on
+    a replica and no movie was written within DB_REPLICA_STICKY_SECONDS.
+
+    Responses rendered otherwise may predate a write the listing version
+    already counts, they aren't cached and the listing ETag falls back to
+    the matching movies, or a writer pinned to the primary would be served
+    its own stale page.
+    """
+    return not db.info.get("replica") or not response_cache.recently_written()
+
+
+def load_catalogue() -> Tuple[int, List[Any]]:
+    """The listing version, then the catalogue rows read from the primary after it."""
+    version = response_cache.version(MOVIES_LIST)
+    with SessionLocal() as db:
+        return version, db.execute(crud.movie.catalogue_statement()).all()
+
+
+def catalogue_selection(params: MovieListParams) -> Optional[Selection]:
+    """
+    Select the page from the catalogue snapshot. A stale one is rebuilt in
+    the background, None sends the request to SQL meanwhile.
+    """
+    if params.search or (version := catalogue_version()) is None:
+        return None
+    if not catalogue.is_current(version):
+        catalogue.refresh(load_catalogue)
+        return None
+    return params.from_catalogue()
+
+
+def catalogue_page(items: List[Any], selection: Selection, limit: int) -> Page:
+    """Put the rows loaded for a selection in its order and trim the page."""
+    by_id = {item.id: item for item in items}
+    return build_page(
+        [by_id[id_] for id_ in selection.ids if id_ in by_id],
+        keys=selection.keys,
+        descending=selection.descending,
+        limit=limit,
+    )
+
+
+def total_count_headers(
+    method: Optional[str], total: Optional[int], estimate: Optional[int]
+) -> Dict[str, str]:
+    if method is None:
+        return {}
+    total = estimate if method == "estimate" else total
+    return {"X-Total-Count": str(total), "X-Total-Count-Method": method}
+
+
+def cached_or_not_modified(
+    key: str, if_none_match: Optional[str], accept_encoding: Optional[str] = None
+) -> Optional[Response]:
+    """
+    Serve a request from the response cache, as a 304 when the ETag matches
+    and with the stored compressed body when the client accepts it.
+    """
+    if cached := response_cache.get(key):
+        if etag_matches(if_none_match, etag := cached.headers.get("ETag")):
+            return not_modified(etag)
+        response_cache.add_encoding(key, cached, accept_encoding)
+        return cached.to_response(accept_encoding)
+    return None
+
+
+def raise_for_missing_or_not_owned(db: Session, id: UUID) -> None:
+    """
+    Writes are scoped to the owner in SQL, only when one matched nothing is
+    it worth a query to tell a missing movie from someone else's.
+    """
+    if not crud.movie.exists(db, id=id):
+        raise HTTPException(
+            status_code=404, detail=f"Movie not found for provided {id=}"
+        )
+    raise HTTPException(status_code=400, detail="Not enough permissions")
+
 
 ####USER ENDPOINTS####
 @router.get("/", response_model=List[schemas.Movie])
 def get_movies(
-    db: Session = Depends(deps.get_db),
-    offset: int = 0,
-    limit: int = Query(default=100, ge=1, lte=100),
-    sstr: Optional[Dict[str, Any]] = None,
-    user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_read_db),
+    params: MovieListParams = Depends(),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
 ) -> Any:
     """
     List Movies.
 
     Authenticated users can only see movie
+
+    Results are ordered by `sort` (prefix with `-` for descending). The
+    `X-Next-Cursor` response header carries an opaque cursor; pass it back as
+    `cursor` to fetch the next page without an OFFSET scan.
+
+    With `search`, movies whose name or director match every search word are
+    returned by relevance instead (`sort=rank`), paged with `offset`. Any
+    other `sort`, or a `cursor`, can't be combined with it and is a 422.
+
+    `genre` can be repeated, `genre_match` decides whether movies need all
+    of them or any of them.
+
+    Other filters are written `field[op]=value`, e.g.
+    `imdb_score[gte]=8&genre[in]=Drama,Action&name[ilike]=star`, a bare
+    `field=value` compares for equality. Only fields and operators an index
+    can serve are accepted, anything else is a 400.
+
+    With `count` the total number of matching movies is sent in
+    `X-Total-Count`, `X-Total-Count-Method` tells how it was counted:
+    `exact` counts on every request, `cached` reuses a count of the same
+    filters for `COUNT_CACHE_TTL_SECONDS` or until a movie changes,
+    `estimate` asks the query planner, `auto` counts exactly up to
+    `COUNT_EXACT_THRESHOLD` estimated rows.
+
+    With `CATALOGUE_SNAPSHOT` the filters are evaluated on an in-process
+    snapshot of the catalogue, see `app.catalogue`, and only the page is
+    loaded from the database.
+
+    Rendered pages are cached, see `app.cache.responses`. Responses carry
+    an ETag derived from the parameters and the listing version, or the
+    `(max(updated_at), count)` of the matching movies when the cache is off,
+    with a matching `If-None-Match` a 304 is returned without loading the
+    rows.
     """
-    results = crud.movie.get_base_query(db)
-    if sstr:
-        results = crud.movie.filter(base_query=results, q=sstr)
-    return results.offset(offset).limit(limit).all()
+    key = response_cache.key(MOVIES_LIST, params.cache_key())
+    if response := cached_or_not_modified(key, if_none_match, accept_encoding):
+        return response
+
+    results = params.apply_filters(crud.movie.get_base_query(db))
+    if params.search:
+        results = crud.movie.search(db, results, q=params.search, limit=params.search_limit())
+    total = estimate = None
+    version = listing_version() if (fresh := serves_fresh(db)) else None
+    fingerprint = None if version is None else (version,)
+    selection = catalogue_selection(params) if fresh else None
+    if selection:
+        # the snapshot counts exactly for free
+        method, total = params.count and "exact", selection.fingerprint[1]
+        fingerprint = fingerprint or selection.fingerprint
+    else:
+        if params.count in ("estimate", "auto"):
+            estimate = crud.movie.count_estimate(db, results)
+        method = params.count_method(estimate)
+        if fingerprint is None:
+            fingerprint = crud.movie.fingerprint(results)
+            total = fingerprint[1]
+    etag = make_etag(MOVIES_LIST, params.cache_key(), *fingerprint)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if total is None and method == "cached":
+        total = response_cache.get_json(params.count_key())
+    if total is None and method in ("exact", "cached"):
+        total = crud.movie.count(results)
+        if method == "cached" and fresh:
+            response_cache.set_json(
+                params.count_key(), total, ttl=settings.COUNT_CACHE_TTL_SECONDS
+            )
+    results = params.select(results)
+
+    if params.search:
+        rendered = render_movies(
+            results.offset(params.offset).limit(params.limit).all(),
+            etag=etag,
+            fields=params.fields,
+        )
+    elif selection:
+        query = params.select(crud.movie.get_base_query(db))
+        page = catalogue_page(
+            query.filter(models.Movies.id.in_(selection.ids)).all(), selection, params.limit
+        )
+        rendered = render_movies(
+            page.items, etag=etag, next_cursor=page.next_cursor, fields=params.fields
+        )
+    else:
+        try:
+            page = crud.movie.paginate(
+                results,
+                offset=params.offset,
+                limit=params.limit,
+                cursor=params.cursor,
+                sort=params.sort,
+            )
+        except PaginationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        rendered = render_movies(
+            page.items, etag=etag, next_cursor=page.next_cursor, fields=params.fields
+        )
+    rendered.headers.update(total_count_headers(method, total, estimate))
+    if fresh:
+        response_cache.set(key, rendered, accept_encoding)
+    return rendered.to_response(accept_encoding)
 
 
 @router.get("/{id}/", response_model=schemas.Movie)
 def get_movie(
     *,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
     id: UUID,
-    user: models.User = Depends(deps.get_current_user),
+    fields: Optional[Tuple[str, ...]] = Depends(movie_fields),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get movie by ID.
+
+    The ETag is derived from `id`, `updated_at` and `fields`, with a
+    matching `If-None-Match` a 304 is returned after only reading
+    `updated_at`. Only the full representation is cached.
     """
-    if item := crud.movie.get(db=db, id=id):
-        return item
+    key = response_cache.key(MOVIES_DETAIL, str(id))
+    if not fields and (response := cached_or_not_modified(key, if_none_match, accept_encoding)):
+        return response
+    if if_none_match and (updated_at := crud.movie.get_updated_at(db, id=id)):
+        if etag_matches(if_none_match, etag := movie_etag(id, updated_at, fields)):
+            return not_modified(etag)
+
+    query = crud.movie.get_base_query(db).filter(models.Movies.id == id)
+    if item := select_movies(query, fields, extra=("id", "updated_at")).first():
+        rendered = render_movie(item, fields)
+        if not fields and serves_fresh(db):
+            response_cache.set(key, rendered, accept_encoding)
+        return rendered.to_response(accept_encoding)
 
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -55,7 +496,7 @@ def create_movie(
     *,
     db: Session = Depends(deps.get_db),
     movie: schemas.MovieCreate,
-    current_user: models.User = Depends(deps.get_current_active_admin_user),
+    current_user: schemas.UserPrincipal = Depends(deps.get_current_active_admin_user),
 ) -> Any:
     """
     Create new Movie.
@@ -65,25 +506,73 @@ def create_movie(
     return crud.movie.create_with_owner(db=db, obj=movie, created_by_id=current_user.id)
 
 
+# the bulk routes are registered before `/{id}/` so `bulk` isn't read as an id
+@router.post("/bulk/", response_model=List[schemas.Movie], status_code=status.HTTP_201_CREATED)
+def create_movies_bulk(
+    *,
+    db: Session = Depends(deps.get_db),
+    data: schemas.MovieBulkCreate,
+    current_user: schemas.UserPrincipal = Depends(deps.get_current_active_admin_user),
+) -> Any:
+    """
+    Create many Movies with a single statement.
+    """
+    for movie in data.items:
+        if not movie.popularity:
+            movie.popularity = movie.imdb_score * 10
+    return crud.movie.create_many(db=db, objs=data.items, created_by_id=current_user.id)
+
+
+@router.patch("/bulk/", response_model=List[schemas.Movie])
+def update_movies_bulk(
+    *,
+    db: Session = Depends(deps.get_db),
+    data: schemas.MovieBulkUpdate,
+    current_user: schemas.UserPrincipal = Depends(deps.get_current_active_admin_user),
+) -> Any:
+    """
+    Update many movies.
+
+    Either all movies are updated or, when some don't exist or belong to
+    another user, none are and a 400 lists them.
+    """
+    try:
+        return crud.movie.update_many(db=db, items=data.items, created_by_id=current_user.id)
+    except BulkWriteError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/bulk/", status_code=status.HTTP_204_NO_CONTENT)
+def delete_movies_bulk(
+    *,
+    db: Session = Depends(deps.get_db),
+    data: schemas.MovieBulkDelete,
+    current_user: schemas.UserPrincipal = Depends(deps.get_current_active_admin_user),
+) -> Any:
+    """
+    Delete many Movies, all or nothing like the bulk update.
+    """
+    try:
+        crud.movie.remove_many(db=db, ids=data.ids, created_by_id=current_user.id)
+    except BulkWriteError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.patch("/{id}/", response_model=schemas.Movie)
 def update_movie(
     *,
     db: Session = Depends(deps.get_db),
     id: UUID,
     data: schemas.MovieUpdate,
-    current_user: models.User = Depends(deps.get_current_active_admin_user),
+    current_user: schemas.UserPrincipal = Depends(deps.get_current_active_admin_user),
 ) -> Any:
     """
     Update movie.
     """
-    movie = crud.movie.get(db=db, id=id)
+    movie = crud.movie.update_by_id(db=db, id=id, data=data, created_by_id=current_user.id)
     if not movie:
-        raise HTTPException(
-            status_code=404, detail=f"Movie not found for provided {id=}"
-        )
-    if movie.created_by_id != current_user.id:
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    return crud.movie.update(db=db, db_obj=movie, data=data)
+        raise_for_missing_or_not_owned(db, id)
+    return movie
 
 
 @router.delete("/{id}/", status_code=status.HTTP_204_NO_CONTENT)
@@ -91,16 +580,10 @@ def delete_movie(
     *,
     db: Session = Depends(deps.get_db),
     id: UUID,
-    current_user: models.User = Depends(deps.get_current_active_admin_user),
+    current_user: schemas.UserPrincipal = Depends(deps.get_current_active_admin_user),
 ) -> Any:
     """
     Delete Movie.
     """
-    movie = crud.movie.get(db=db, id=id)
-    if not movie:
-        raise HTTPException(
-            status_code=404, detail=f"Movie not found for provided {id=}"
-        )
-    if movie.created_by_id != current_user.id:
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    return crud.movie.remove(db=db, id=id)
+    if not crud.movie.remove(db=db, id=id, created_by_id=current_user.id):
+        raise_for_missing_or_not_owned(db, id)
@@ -0,0 +1,150 @@
+from typing import Any, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic.types import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.api import deps
+from app.api.conditional import etag_matches, make_etag, not_modified
+from app.api.endpoints.movies import (
+    MovieListParams,
+    cached_or_not_modified,
+    catalogue_page,
+    catalogue_selection,
+    listing_version,
+    movie_etag,
+    movie_fields,
+    render_movie,
+    render_movies,
+    select_movies,
+    serves_fresh,
+    total_count_headers,
+)
+from app.cache.responses import MOVIES_DETAIL, MOVIES_LIST, response_cache
+from app.crud.pagination import PaginationError
+from config import settings
+
+# Async versions of the read endpoints in `movies.py`. They are mounted in
+# front of the sync ones when `settings.ASYNC_DB` is enabled, so DB I/O no
+# longer holds a threadpool worker for the whole request.
+router = APIRouter()
+
+
+@router.get("/", response_model=List[schemas.Movie])
+async def get_movies_async(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    params: MovieListParams = Depends(),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user_async),
+) -> Any:
+    """
+    List Movies.
+
+    Same parameters and behaviour as the sync listing.
+    """
+    key = response_cache.key(MOVIES_LIST, params.cache_key())
+    if response := cached_or_not_modified(key, if_none_match, accept_encoding):
+        return response
+
+    statement = params.apply_filters(crud.movie_async.get_base_query())
+    if params.search:
+        statement = await crud.movie_async.search(
+            db, statement, q=params.search, limit=params.search_limit()
+        )
+    total = estimate = None
+    version = listing_version() if (fresh := serves_fresh(db)) else None
+    fingerprint = None if version is None else (version,)
+    selection = catalogue_selection(params) if fresh else None
+    if selection:
+        method, total = params.count and "exact", selection.fingerprint[1]
+        fingerprint = fingerprint or selection.fingerprint
+    else:
+        if params.count in ("estimate", "auto"):
+            estimate = await crud.movie_async.count_estimate(db, statement)
+        method = params.count_method(estimate)
+        if fingerprint is None:
+            fingerprint = await crud.movie_async.fingerprint(db, statement)
+            total = fingerprint[1]
+    etag = make_etag(MOVIES_LIST, params.cache_key(), *fingerprint)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if total is None and method == "cached":
+        total = response_cache.get_json(params.count_key())
+    if total is None and method in ("exact", "cached"):
+        total = await crud.movie_async.count(db, statement)
+        if method == "cached" and fresh:
+            response_cache.set_json(
+                params.count_key(), total, ttl=settings.COUNT_CACHE_TTL_SECONDS
+            )
+    fast = settings.FAST_SERIALIZATION
+    statement = params.select(statement)
+
+    if params.search:
+        statement = statement.offset(params.offset).limit(params.limit)
+        result = await db.execute(statement)
+        items = result.all() if fast else result.scalars().all()
+        rendered = render_movies(items, etag=etag, fields=params.fields)
+    elif selection:
+        statement = params.select(crud.movie_async.get_base_query())
+        result = await db.execute(statement.filter(models.Movies.id.in_(selection.ids)))
+        items = result.all() if fast else result.scalars().all()
+        page = catalogue_page(items, selection, params.limit)
+        rendered = render_movies(
+            page.items, etag=etag, next_cursor=page.next_cursor, fields=params.fields
+        )
+    else:
+        try:
+            page = await crud.movie_async.paginate(
+                db,
+                statement,
+                offset=params.offset,
+                limit=params.limit,
+                cursor=params.cursor,
+                sort=params.sort,
+                scalars=not fast,
+            )
+        except PaginationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        rendered = render_movies(
+            page.items, etag=etag, next_cursor=page.next_cursor, fields=params.fields
+        )
+    rendered.headers.update(total_count_headers(method, total, estimate))
+    if fresh:
+        response_cache.set(key, rendered, accept_encoding)
+    return rendered.to_response(accept_encoding)
+
+
+@router.get("/{id}/", response_model=schemas.Movie)
+async def get_movie_async(
+    *,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    id: UUID,
+    fields: Optional[Tuple[str, ...]] = Depends(movie_fields),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user_async),
+) -> Any:
+    """
+    Get movie by ID.
+    """
+    key = response_cache.key(MOVIES_DETAIL, str(id))
+    if not fields and (response := cached_or_not_modified(key, if_none_match, accept_encoding)):
+        return response
+    if if_none_match and (updated_at := await crud.movie_async.get_updated_at(db, id=id)):
+        if etag_matches(if_none_match, etag := movie_etag(id, updated_at, fields)):
+            return not_modified(etag)
+
+    statement = crud.movie_async.get_base_query().filter(models.Movies.id == id)
+    result = await db.execute(select_movies(statement, fields, extra=("id", "updated_at")))
+    if item := result.first() if settings.FAST_SERIALIZATION else result.scalars().first():
+        rendered = render_movie(item, fields)
+        if not fields and serves_fresh(db):
+            response_cache.set(key, rendered, accept_encoding)
+        return rendered.to_response(accept_encoding)
+
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Movie not found for provided {id=}",
+    )
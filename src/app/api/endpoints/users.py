@@ -4,9 +4,9 @@ from fastapi import APIRouter, Body, Depends, HTTPException
 from sqlalchemy.orm import Session
 from starlette import status
 
-from app import crud, models, schemas
+from app import crud, schemas
 from app.api import deps
-from core import get_password_hash, verify_password, create_access_token
+from core import verify_password, create_access_token
 
 router = APIRouter()
 
@@ -37,7 +37,7 @@ def reset_password(
     db: Session = Depends(deps.get_db),
     old_password: str = Body(...),
     new_password: str = Body(...),
-    user: models.User = Depends(deps.get_current_user),
+    user: schemas.UserPrincipal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Only authenticated users can change their password.
@@ -46,13 +46,12 @@ def reset_password(
     We can use a more secure method like sending an email with a link to reset the password.
     But I believe that is out of the scope of this project.
     """
-    if not verify_password(old_password, user.hashed_password):
+    db_user = crud.user.get(db, id=user.id)
+    if not verify_password(old_password, db_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password",
         )
-    hashed_password = get_password_hash(new_password)
-    user.hashed_password = hashed_password
-    db.add(user)
-    db.commit()
+    # goes through `crud.user.update` so cached tokens of the user are dropped
+    crud.user.update(db, db_obj=db_user, obj={"password": new_password})
     return {"msg": "Password updated successfully"}
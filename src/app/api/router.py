@@ -1,8 +1,42 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from app.api.endpoints import movies, login, users
+from app.api.deps import rate_limit
+from app.api.endpoints import movie_stats, movies, movies_async, login, users
+from app.ratelimit import RateLimit
+from config import settings
+
+# Rate limits per router. Login, sign up and password resets run bcrypt, a
+# few requests per client are enough to keep a CPU busy, so they are keyed
+# by IP and kept tight. Reads are limited per user and route.
+login_limits = rate_limit(
+    RateLimit("login", limit=10, period=60, by=("ip",), algorithm="sliding_window"),
+)
+users_limits = rate_limit(
+    RateLimit("users", limit=5, period=60, by=("ip",), algorithm="sliding_window"),
+)
+movies_limits = rate_limit(
+    RateLimit("movies", limit=300, period=60, by=("user", "route")),
+)
 
 api_router = APIRouter()
-api_router.include_router(login.router, tags=["login"])
-api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(movies.router, prefix="/movies", tags=["movies"])
+api_router.include_router(login.router, tags=["login"], dependencies=[Depends(login_limits)])
+api_router.include_router(
+    users.router, prefix="/users", tags=["users"], dependencies=[Depends(users_limits)]
+)
+api_router.include_router(
+    movie_stats.router,
+    prefix="/movies/stats",
+    tags=["movies"],
+    dependencies=[Depends(movies_limits)],
+)
+if settings.ASYNC_DB:
+    # routes are matched in order, so these take over the sync read endpoints
+    api_router.include_router(
+        movies_async.router,
+        prefix="/movies",
+        tags=["movies"],
+        dependencies=[Depends(movies_limits)],
+    )
+api_router.include_router(
+    movies.router, prefix="/movies", tags=["movies"], dependencies=[Depends(movies_limits)]
+)
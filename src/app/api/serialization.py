@@ -0,0 +1,74 @@
+import datetime
+import json
+import uuid
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, create_model
+from sqlalchemy import Column
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact JSON of plain values, UUIDs and datetimes, the same output as
+    `jsonable_encoder` + `json.dumps` without walking the content first.
+
+    Uses orjson when it's installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(",", ":"), default=_default
+    ).encode()
+
+
+def schema_columns(
+    schema: Type[BaseModel], model: Any, fields: Optional[Sequence[str]] = None
+) -> Tuple[Column, ...]:
+    """The model columns behind `fields` of `schema`, all by default, in field order."""
+    return tuple(
+        getattr(model, name) for name in schema.__fields__ if fields is None or name in fields
+    )
+
+
+@lru_cache(maxsize=None)
+def partial_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    `schema` restricted to `fields`, created once per field set.
+
+    Fields keep their types, defaults and the `orm_mode` config.
+    """
+    definitions = {
+        name: (field.annotation, ... if field.required else field.default)
+        for name, field in schema.__fields__.items()
+        if name in fields
+    }
+    name = f"{schema.__name__}[{','.join(definitions)}]"
+    return create_model(name, __config__=schema.__config__, **definitions)
+
+
+def dump_rows(rows: Iterable[Any], fields: Optional[Sequence[str]] = None) -> bytes:
+    """JSON array of objects from the `Row`s of a column query, limited to `fields`."""
+    return dumps([_row_content(row, fields) for row in rows])
+
+
+def dump_row(row: Any, fields: Optional[Sequence[str]] = None) -> bytes:
+    return dumps(_row_content(row, fields))
+
+
+def _row_content(row: Any, fields: Optional[Sequence[str]]) -> dict:
+    content = row._asdict()
+    return content if fields is None else {name: content[name] for name in fields}
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from app.cache.lru import TTLCache
+from app.cache.resp import RespClient, RespError
+from app.metrics.registry import registry
+
+logger = logging.getLogger(__name__)
+
+cache_errors = registry.counter(
+    "cache_errors_total", "Cache server commands that failed.", ("command",)
+)
+
+
+class CacheBackend:
+    """Byte-string key/value store with expiring values and counters."""
+
+    # whether every worker and process sees the same values and counters
+    shared = False
+
+    @property
+    def healthy(self) -> bool:
+        """False while values and counters may be stale, readers should skip the cache."""
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def get_counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> Optional[int]:
+        """The incremented counter, None when it couldn't be incremented."""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU backend, invalidations don't reach other workers."""
+
+    def __init__(self, maxsize: int):
+        self._values = TTLCache(maxsize=maxsize)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._values.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._values.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self._values.pop(key)
+
+    def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self) -> None:
+        self._values.clear()
+        with self._lock:
+            self._counters.clear()
+
+
+class RedisBackend(CacheBackend):
+    """
+    Shared backend speaking the Redis protocol.
+
+    Cache errors are logged, counted and treated as misses so an unavailable
+    cache server never fails a request. A failed INCR loses an invalidation,
+    until it is re-sent the backend is unhealthy: reads miss and writes are
+    dropped rather than serving entries the counter should have outdated.
+    The INCR is retried once `retry_after` seconds passed since the failure.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, retry_after: float = 5.0):
+        self.client = RespClient(url)
+        self.retry_after = retry_after
+        # counters whose INCR failed, re-sent before the cache is used again
+        self._missed: Set[str] = set()
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self) -> bool:
+        if not self._missed:
+            return True
+        if time.monotonic() - self._failed_at < self.retry_after:
+            return False
+        with self._lock:
+            for key in list(self._missed):
+                if self._incr(key) is None:
+                    return False
+                self._missed.discard(key)
+        return True
+
+    def _failed(self, command: str, e: RespError) -> None:
+        logger.warning("Cache %s failed: %s", command, e)
+        cache_errors.labels(command).inc()
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.healthy:
+            return None
+        try:
+            return self.client.execute("GET", key)
+        except RespError as e:
+            self._failed("GET", e)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        if not self.healthy:
+            return
+        try:
+            self.client.execute("SET", key, value, "EX", ttl)
+        except RespError as e:
+            self._failed("SET", e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.execute("DEL", key)
+        except RespError as e:
+            self._failed("DEL", e)
+
+    def get_counter(self, key: str) -> int:
+        value = self.get(key)
+        return int(value) if value else 0
+
+    def incr(self, key: str) -> Optional[int]:
+        if (value := self._incr(key)) is None:
+            with self._lock:
+                self._missed.add(key)
+        return value
+
+    def _incr(self, key: str) -> Optional[int]:
+        try:
+            return self.client.execute("INCR", key)
+        except RespError as e:
+            self._failed("INCR", e)
+            self._failed_at = time.monotonic()
+            return None
+
+
+def get_backend(name: str, *, url: str, maxsize: int) -> Optional[CacheBackend]:
+    """Backend for a `*_BACKEND` setting, `None` when caching is disabled."""
+    if name == "memory":
+        return MemoryBackend(maxsize=maxsize)
+    if name == "redis":
+        return RedisBackend(url)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown cache backend {name!r}")
@@ -0,0 +1,94 @@
+import socket
+import threading
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Raised when the server is unreachable or replies with an error."""
+
+
+class RespClient:
+    """
+    Minimal client for the Redis serialization protocol (RESP).
+
+    Only what the caches need: plain commands with bulk string arguments.
+    Each thread keeps its own connection, which is dropped on any error and
+    re-opened by the next command. Works with Redis and anything speaking the
+    same protocol (KeyDB, Dragonfly, a local stand-in for tests).
+    """
+
+    def __init__(self, url: str, timeout: float = 0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def execute(self, *args: Any) -> Any:
+        conn = self._connection()
+        try:
+            conn.sendall(_encode(args))
+            return _read_reply(self._local.reader)
+        except (OSError, ValueError) as e:
+            self.close()
+            raise RespError(str(e)) from e
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+            finally:
+                self._local.conn = None
+                self._local.reader = None
+
+    def _connection(self) -> socket.socket:
+        if getattr(self._local, "conn", None) is not None:
+            return self._local.conn
+        try:
+            conn = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise RespError(str(e)) from e
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.conn = conn
+        self._local.reader = conn.makefile("rb")
+        if self.password:
+            self.execute("AUTH", self.password)
+        if self.db:
+            self.execute("SELECT", self.db)
+        return conn
+
+
+def _encode(args) -> bytes:
+    parts: List[bytes] = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _read_reply(reader) -> Optional[Any]:
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ValueError("Connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RespError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length == -1:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        return None if length == -1 else [_read_reply(reader) for _ in range(length)]
+    raise ValueError(f"Unexpected reply {line!r}")
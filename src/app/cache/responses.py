@@ -0,0 +1,201 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+from app.cache.backends import CacheBackend, get_backend
+from app.compression import available_encodings, compress, negotiate
+from config import settings
+
+MOVIES_LIST = "movies:list"
+MOVIES_DETAIL = "movies:detail"
+# set for DB_REPLICA_STICKY_SECONDS after a movie write
+MOVIES_WRITTEN = "movies:written"
+
+# part of every key, bump it when `CachedResponse.dumps` changes so workers
+# running the previous release don't read entries they can't parse
+FORMAT = 2
+
+
+class CachedResponse:
+    """
+    Rendered JSON body plus the headers to send with it.
+
+    Large bodies can also be kept compressed in `encoded`, one per content
+    coding, so responses served from the cache aren't compressed again.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+        encoded: Optional[Dict[str, bytes]] = None,
+    ):
+        self.body = body
+        self.headers = headers or {}
+        self.encoded = encoded or {}
+
+    @classmethod
+    def from_content(cls, content: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")
+        ).encode()
+        return cls(body, headers)
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        meta, _, data = raw.partition(b"\n")
+        meta = json.loads(meta)
+        # the body, then the encoded bodies in order
+        offset = len(data) - sum(length for _, length in meta["encoded"])
+        body, encoded = data[:offset], {}
+        for encoding, length in meta["encoded"]:
+            encoded[encoding] = data[offset:offset + length]
+            offset += length
+        return cls(body, meta["headers"], encoded)
+
+    def dumps(self) -> bytes:
+        meta = {
+            "headers": self.headers,
+            "encoded": [[encoding, len(body)] for encoding, body in self.encoded.items()],
+        }
+        return b"".join((json.dumps(meta).encode(), b"\n", self.body, *self.encoded.values()))
+
+    def precompress(self, accept_encoding: Optional[str] = None) -> bool:
+        """
+        Compress the body with the coding the client accepts, when it is large
+        enough to and isn't stored in that coding yet. Returns whether it was.
+        """
+        if len(self.body) < settings.COMPRESSION_MINIMUM_SIZE:
+            return False
+        encoding = negotiate(accept_encoding, available_encodings())
+        if encoding is None or encoding in self.encoded:
+            return False
+        self.encoded[encoding] = compress(self.body, encoding)
+        return True
+
+    def to_response(self, accept_encoding: Optional[str] = None) -> Response:
+        """The response, with an encoded body the client accepts if there is one."""
+        headers = {**self.headers, "Vary": "Accept-Encoding"}
+        if encoding := negotiate(accept_encoding, self.encoded):
+            headers["Content-Encoding"] = encoding
+            if (etag := headers.get("ETag")) and not etag.startswith("W/"):
+                # a strong ETag names the exact bytes, the codings only share a weak one
+                headers["ETag"] = f"W/{etag}"
+            return Response(self.encoded[encoding], media_type=self.media_type, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    Cache of rendered responses, keyed per namespace.
+
+    Every namespace has a version counter that is part of its keys, bumping
+    it invalidates all the namespace's entries at once without having to
+    find them. Single entries can still be dropped with `delete`.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def shared(self) -> bool:
+        return self.backend is not None and self.backend.shared and self.backend.healthy
+
+    @property
+    def healthy(self) -> bool:
+        """False while the namespace versions may have missed a write."""
+        return self.backend is None or self.backend.healthy
+
+    def version(self, namespace: str) -> int:
+        return self.backend.get_counter(f"{namespace}:version") if self.backend else 0
+
+    def key(self, namespace: str, params: Any) -> str:
+        digest = hashlib.sha1(
+            json.dumps(jsonable_encoder(params), sort_keys=True).encode()
+        ).hexdigest()
+        return f"{namespace}:f{FORMAT}:v{self.version(namespace)}:{digest}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.backend or (raw := self.backend.get(key)) is None:
+            return None
+        return CachedResponse.loads(raw)
+
+    def set(self, key: str, response: CachedResponse, accept_encoding: Optional[str] = None) -> None:
+        """
+        Store `response`, compressed too in the coding of `accept_encoding`
+        when compression is on. Other codings are added by `add_encoding`
+        once a client asks for them.
+        """
+        if self.backend:
+            if settings.COMPRESSION_ENABLED:
+                response.precompress(accept_encoding)
+            self.backend.set(key, response.dumps(), ttl=self.ttl)
+
+    def add_encoding(self, key: str, response: CachedResponse, accept_encoding: Optional[str]) -> None:
+        """Store a cached `response` compressed in a coding it was missing."""
+        if self.backend and settings.COMPRESSION_ENABLED and response.precompress(accept_encoding):
+            self.backend.set(key, response.dumps(), ttl=self.ttl)
+
+    def get_json(self, key: str) -> Any:
+        """A value stored with `set_json`, None when missing."""
+        if not self.backend or (raw := self.backend.get(key)) is None:
+            return None
+        return json.loads(raw)
+
+    def set_json(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        if self.backend:
+            raw = json.dumps(jsonable_encoder(value)).encode()
+            self.backend.set(key, raw, ttl=self.ttl if ttl is None else ttl)
+
+    def delete(self, key: str) -> None:
+        if self.backend:
+            self.backend.delete(key)
+
+    def recently_written(self) -> bool:
+        """
+        Whether movies were written within the last DB_REPLICA_STICKY_SECONDS,
+        replicas may not have caught up with the write yet.
+        """
+        if not self.healthy:
+            return True
+        return self.backend is not None and self.backend.get(MOVIES_WRITTEN) is not None
+
+    def bump(self, namespace: str) -> Optional[int]:
+        return self.backend.incr(f"{namespace}:version") if self.backend else None
+
+    def invalidate_movies(self, ids: Iterable[Any] = (), bulk: bool = False) -> Optional[int]:
+        """
+        Any movie write changes listings, updated/deleted ids their detail.
+        Returns the new listing version, None when it couldn't be bumped.
+        """
+        if not self.backend:
+            return None
+        if settings.SQLALCHEMY_REPLICA_URIS and settings.DB_REPLICA_STICKY_SECONDS > 0:
+            self.backend.set(MOVIES_WRITTEN, b"1", ttl=settings.DB_REPLICA_STICKY_SECONDS)
+        version = self.bump(MOVIES_LIST)
+        if bulk:
+            self.bump(MOVIES_DETAIL)
+            return version
+        for id_ in ids:
+            self.delete(self.key(MOVIES_DETAIL, str(id_)))
+        return version
+
+
+response_cache = ResponseCache(
+    get_backend(
+        settings.RESPONSE_CACHE_BACKEND,
+        url=settings.RESPONSE_CACHE_URL,
+        maxsize=settings.RESPONSE_CACHE_SIZE,
+    ),
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
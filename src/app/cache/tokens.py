@@ -0,0 +1,60 @@
+from typing import NamedTuple, Optional
+
+from pydantic.types import UUID
+
+from app.cache.backends import get_backend
+from app.cache.lru import TTLCache
+from app.schemas import UserPrincipal
+from config import settings
+
+
+class CachedPrincipal(NamedTuple):
+    principal: UserPrincipal
+    # the user's epoch when the principal was loaded
+    epoch: int
+
+
+# verified access token -> `CachedPrincipal`, see `deps.get_current_user`
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS
+)
+
+# per user counters bumped on every change of the user, on a shared backend
+# a change on one worker outdates the tokens cached by all of them
+epochs = get_backend(
+    settings.TOKEN_CACHE_BACKEND, url=settings.TOKEN_CACHE_URL, maxsize=settings.TOKEN_CACHE_SIZE
+)
+
+
+def _epoch_key(user_id: UUID) -> str:
+    return f"user:{user_id}:epoch"
+
+
+def user_epoch(user_id: UUID) -> int:
+    """Read it before loading the user, a change in between outdates the entry."""
+    return epochs.get_counter(_epoch_key(user_id)) if epochs else 0
+
+
+def get_principal(token: str) -> Optional[UserPrincipal]:
+    """The cached principal of `token`, None when missing or its user changed since."""
+    if (cached := token_cache.get(token)) is None:
+        return None
+    if epochs and not epochs.healthy:
+        # an invalidation may have been lost
+        return None
+    if cached.epoch != user_epoch(cached.principal.id):
+        token_cache.pop(token)
+        return None
+    return cached.principal
+
+
+def cache_principal(token: str, principal: UserPrincipal, *, epoch: int, ttl: float) -> None:
+    if not epochs or epochs.healthy:
+        token_cache.set(token, CachedPrincipal(principal, epoch), ttl=ttl)
+
+
+def invalidate_user(user_id: UUID) -> None:
+    """Forget every cached token of a user, call whenever the user changes."""
+    token_cache.discard_where(lambda cached: cached.principal.id == user_id)
+    if epochs:
+        epochs.incr(_epoch_key(user_id))
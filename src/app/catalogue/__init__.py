@@ -0,0 +1 @@
+from .snapshot import COLUMNS, CatalogueSnapshot, Selection, catalogue  # noqa
@@ -0,0 +1,343 @@
+import logging
+import operator
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from pydantic.types import UUID
+
+from config import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# columns a snapshot is built from, in this order
+COLUMNS = (
+    "id", "name", "director", "popularity", "imdb_score", "genre", "created_at", "updated_at"
+)
+
+COMPARISONS = {
+    "eq": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+class Selection(NamedTuple):
+    """A page of ids in sort order, plus one look-ahead id when there is a next page."""
+
+    ids: List[UUID]
+    keys: Tuple[str, ...]
+    descending: bool
+    fingerprint: Tuple[Optional[datetime], int]
+
+
+class _TextIndex:
+    """
+    Lowercased values joined into one string, a substring search is a
+    `str.find` loop over it and the offsets map hits back to rows.
+    """
+
+    def __init__(self, values: Sequence[str]):
+        self.blob = "\0".join(value.lower() for value in values)
+        lengths = np.fromiter(
+            (len(value) + 1 for value in values), dtype=np.int64, count=len(values)
+        )
+        self.starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(values) else lengths
+
+    def contains(self, needle: str) -> "np.ndarray":
+        """Rows whose value contains `needle`, case insensitively."""
+        if "\0" in needle or not len(self.starts):
+            return np.array([], dtype=np.int64)
+        if not needle:
+            return np.arange(len(self.starts))
+        needle = needle.lower()
+        rows = []
+        position = self.blob.find(needle)
+        while position >= 0:
+            row = int(np.searchsorted(self.starts, position, side="right")) - 1
+            rows.append(row)
+            if row + 1 >= len(self.starts):
+                break
+            position = self.blob.find(needle, int(self.starts[row + 1]))
+        return np.array(rows, dtype=np.int64)
+
+
+class _State:
+    """The arrays of one snapshot, replaced as a whole on refresh."""
+
+    def __init__(self, rows: List[Any], version: int):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.size = len(rows)
+        self.ids: List[UUID] = [row[0] for row in rows]
+        # UUIDs sort like Postgres orders them, by their bytes
+        self.sorted_ids = sorted(id_.int for id_ in self.ids)
+        rank = {value: position for position, value in enumerate(self.sorted_ids)}
+        self.columns: Dict[str, "np.ndarray"] = {
+            "id": np.fromiter((rank[id_.int] for id_ in self.ids), dtype=np.int64, count=self.size),
+            "popularity": np.array(
+                [np.nan if row[3] is None else row[3] for row in rows], dtype=np.float64
+            ),
+            "imdb_score": np.array([row[4] for row in rows], dtype=np.float64),
+            "created_at": np.array([row[6] for row in rows], dtype="datetime64[us]"),
+            "updated_at": np.array([row[7] for row in rows], dtype="datetime64[us]"),
+        }
+
+        # exact names map to their rows, substrings go through the text indexes
+        self.names: Dict[str, List[int]] = {}
+        for position, row in enumerate(rows):
+            self.names.setdefault(row[1], []).append(position)
+        self.text = {
+            "name": _TextIndex([row[1] for row in rows]),
+            "director": _TextIndex([row[2] for row in rows]),
+        }
+
+        # interned genres, one bit per genre in as many 64 bit words as needed
+        self.genres: Dict[str, int] = {}
+        for row in rows:
+            for genre in row[5]:
+                self.genres.setdefault(genre, len(self.genres))
+        self.genre_bits = np.zeros((self.size, max(1, -(-len(self.genres) // 64))), dtype=np.uint64)
+        for position, row in enumerate(rows):
+            for genre in row[5]:
+                bit = self.genres[genre]
+                self.genre_bits[position, bit // 64] |= np.uint64(1 << (bit % 64))
+
+        # row order of every sort, rows with a NULL key last like `NULLS LAST`
+        self.orders: Dict[Tuple[str, bool], "np.ndarray"] = {}
+
+    def order(self, key: str, descending: bool = False) -> "np.ndarray":
+        if (key, descending) not in self.orders:
+            ids = self.columns["id"]
+            if key == "id":
+                parts = [np.argsort(ids, kind="stable")]
+            else:
+                values = self.columns[key]
+                nulls = _is_null(values)
+                order = np.lexsort((ids, values))
+                null_rows = np.flatnonzero(nulls)
+                parts = [order[~nulls[order]], null_rows[np.argsort(ids[null_rows], kind="stable")]]
+            if descending:
+                parts = [part[::-1] for part in parts]
+            self.orders[(key, descending)] = np.concatenate(parts)
+        return self.orders[(key, descending)]
+
+    def genre_mask(self, genres: Sequence[str]) -> Optional["np.ndarray"]:
+        """The bit mask of `genres`, None if one of them doesn't occur."""
+        mask = np.zeros(self.genre_bits.shape[1], dtype=np.uint64)
+        for genre in genres:
+            if genre not in self.genres:
+                return None
+            bit = self.genres[genre]
+            mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def rows_mask(self, rows: Iterable[int]) -> "np.ndarray":
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.fromiter(rows, dtype=np.int64)] = True
+        return mask
+
+
+def _is_null(values: "np.ndarray") -> "np.ndarray":
+    return np.isnat(values) if values.dtype.kind == "M" else np.isnan(values)
+
+
+def _like_substring(pattern: str) -> Optional[str]:
+    """The substring of a `%...%` pattern, None if it has other wildcards."""
+    if len(pattern) < 2 or pattern[0] != "%" or pattern[-1] != "%":
+        return None
+    chars, escaped = [], False
+    for char in pattern[1:-1]:
+        if escaped:
+            chars.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in "%_":
+            return None
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+class CatalogueSnapshot:
+    """
+    In-process columnar copy of the movie catalogue.
+
+    Scores, popularity and timestamps are NumPy arrays, genres interned
+    bitsets and names and directors a substring index, so the listing
+    filters are evaluated with a few vectorized operations instead of a
+    query. Only the page of ids comes out of it, the rows themselves are
+    still loaded from Postgres.
+
+    A snapshot is tagged with the version of the movie listing cache it
+    was built at, any movie write bumps that version (or clears the
+    snapshot of the process that made it) and the next read starts a
+    rebuild with `refresh`. `max_age` bounds how stale it gets when writes
+    bypass the API, e.g. the import command.
+    """
+
+    def __init__(self, max_age: float = 60.0):
+        self.max_age = max_age
+        self._state: Optional[_State] = None
+        self._lock = threading.Lock()
+        # bumped by `invalidate`, a rebuild started before is thrown away
+        self._generation = 0
+        self._refreshing: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalogue")
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def is_current(self, version: int) -> bool:
+        state = self._state
+        return (
+            state is not None
+            and state.version == version
+            and time.monotonic() - state.built_at < self.max_age
+        )
+
+    def age(self) -> Optional[float]:
+        """Seconds since the snapshot was built, None when there is none."""
+        state = self._state
+        return None if state is None else time.monotonic() - state.built_at
+
+    def build(self, rows: Iterable[Any], version: int) -> None:
+        """Replace the snapshot with `rows` of `COLUMNS`, read at `version`."""
+        state = _State(list(rows), version)
+        with self._lock:
+            self._state = state
+
+    def refresh(self, load: Callable[[], Tuple[int, Iterable[Any]]]) -> Future:
+        """
+        Rebuild the snapshot on a background thread from `load`, which
+        returns the listing version and then the rows read after it.
+
+        Only one rebuild runs at a time, while it does the running one is
+        returned. Requests aren't held up, they go to SQL until it is done.
+        """
+        with self._lock:
+            if self._refreshing is None:
+                self._refreshing = self._executor.submit(self._rebuild, load, self._generation)
+            return self._refreshing
+
+    def _rebuild(self, load: Callable[[], Tuple[int, Iterable[Any]]], generation: int) -> None:
+        try:
+            version, rows = load()
+            state = _State(list(rows), version)
+            with self._lock:
+                # invalidated while loading, the rows may predate a write
+                if generation == self._generation:
+                    self._state = state
+        except Exception:
+            logger.exception("Rebuilding the catalogue snapshot failed")
+        finally:
+            with self._lock:
+                self._refreshing = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._state = None
+            self._generation += 1
+
+    def _mask(self, state: _State, condition: Tuple[str, str, Any]) -> Optional["np.ndarray"]:
+        field, op, value = condition
+        if field in ("imdb_score", "popularity", "created_at") and op in COMPARISONS:
+            values = state.columns[field]
+            if field == "created_at":
+                value = np.datetime64(value, "us")
+            return COMPARISONS[op](values, value)
+        if field == "genre" and op in ("in", "all"):
+            if op == "all":
+                mask = state.genre_mask(value)
+                if mask is None:
+                    return np.zeros(state.size, dtype=bool)
+                return ((state.genre_bits & mask) == mask).all(axis=1)
+            known = [genre for genre in value if genre in state.genres]
+            mask = state.genre_mask(known)
+            return (state.genre_bits & mask).any(axis=1)
+        if field == "name" and op == "eq":
+            return state.rows_mask(state.names.get(value, ()))
+        if field in state.text and op == "ilike":
+            if (needle := _like_substring(value)) is None:
+                return None
+            return state.rows_mask(state.text[field].contains(needle))
+        return None
+
+    def select(
+        self,
+        conditions: Iterable[Tuple[str, str, Any]],
+        *,
+        keys: Sequence[str],
+        descending: bool = False,
+        after: Optional[Sequence[Any]] = None,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> Optional[Selection]:
+        """
+        Ids of the page of movies matching `conditions` (see
+        `app.crud.filters.Condition`), sorted by `keys`
+        and starting after the decoded cursor values `after`, else at `offset`.
+
+        Returns None when a condition can't be evaluated from the snapshot,
+        the caller falls back to SQL then.
+        """
+        if (state := self._state) is None:
+            return None
+        mask = np.ones(state.size, dtype=bool)
+        for condition in conditions:
+            if (matched := self._mask(state, condition)) is None:
+                return None
+            mask &= matched
+
+        updated_at = state.columns["updated_at"][mask]
+        updated_at = updated_at[~np.isnat(updated_at)]
+        fingerprint = (updated_at.max().item() if len(updated_at) else None, int(mask.sum()))
+
+        if after is not None:
+            mask &= self._keyset_mask(state, keys, descending, after)
+        order = state.order(keys[0], descending)
+        order = order[mask[order]]
+        if after is None:
+            order = order[offset:]
+        ids = [state.ids[position] for position in order[: limit + 1]]
+        return Selection(ids=ids, keys=tuple(keys), descending=descending, fingerprint=fingerprint)
+
+    @staticmethod
+    def _keyset_mask(
+        state: _State, keys: Sequence[str], descending: bool, after: Sequence[Any]
+    ) -> "np.ndarray":
+        """Rows sorting after the cursor values, see `app.crud.pagination._after`."""
+        *values, id_ = after
+        ids = state.columns["id"]
+        if descending:
+            # rank of the last id below the cursor's
+            id_mask = ids <= bisect_left(state.sorted_ids, id_.int) - 1
+        else:
+            id_mask = ids >= bisect_right(state.sorted_ids, id_.int)
+        if not values:
+            return id_mask
+        column = state.columns[keys[0]]
+        nulls = _is_null(column)
+        value = values[0]
+        if value is None:
+            # NULLs come last, after a NULL cursor only NULLs further on
+            return nulls & id_mask
+        if column.dtype.kind == "M":
+            value = np.datetime64(value, "us")
+        before = column < value if descending else column > value
+        return before | ((column == value) & id_mask) | nulls
+
+
+catalogue = CatalogueSnapshot(max_age=settings.CATALOGUE_MAX_AGE_SECONDS)
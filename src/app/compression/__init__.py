@@ -0,0 +1,2 @@
+from .encoding import available_encodings, compress, compressible, negotiate  # noqa
+from .middleware import CompressionMiddleware  # noqa
@@ -0,0 +1,95 @@
+"""
+Content codings for responses: `Accept-Encoding` negotiation plus gzip and,
+when the `brotli` package is installed, brotli.
+"""
+import gzip
+import zlib
+from typing import Callable, Dict, Iterable, Optional
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# preferred first when a client accepts several with the same weight
+PREFERENCE = ("br", "gzip")
+
+# media types worth compressing, anything else (images, archives) already is
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def available_encodings() -> tuple:
+    return tuple(encoding for encoding in PREFERENCE if encoding != "br" or brotli is not None)
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding: Optional[str], offered: Iterable[str]) -> Optional[str]:
+    """
+    The coding of `offered` to respond with for an `Accept-Encoding` header,
+    None to send the body as is. Codings with `q=0` are refused, `*`
+    stands for any coding not listed.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in PREFERENCE:
+        if coding not in offered:
+            continue
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # no timestamp in the header, the same body always compresses the same
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental `compress` for bodies sent in several chunks."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._process: Callable[[bytes], bytes] = compressor.process
+            self._flush: Callable[[], bytes] = compressor.flush
+            self._finish: Callable[[], bytes] = compressor.finish
+        else:
+            compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._process = compressor.compress
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compressed output so far, flushed so the client can use it."""
+        return self._process(chunk) + self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
@@ -0,0 +1,94 @@
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.compression.encoding import (
+    StreamCompressor,
+    available_encodings,
+    compress,
+    compressible,
+    negotiate,
+)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with the best coding the
+    client accepts, brotli or gzip.
+
+    Bodies under `minimum_size` bytes are sent as they are, compression
+    would only cost time there. Responses that already have a
+    `Content-Encoding`, like the pre-compressed cached movie pages, pass
+    through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    """The `send` of one response, deciding on its first body chunk."""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[dict] = None
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def __call__(self, message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not compressible(headers.get("content-type")):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                # held back until the first chunk tells whether to compress
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            body = self.compressor.compress(body)
+            if not more_body:
+                body += self.compressor.finish()
+            await self.send({**message, "body": body})
+            return
+
+        start, self.start = self.start, None
+        if not more_body and len(body) < self.minimum_size:
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=list(start["headers"]))
+        headers["Content-Encoding"] = self.encoding
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            # streamed, the compressed length isn't known up front
+            del headers["Content-Length"]
+            self.compressor = StreamCompressor(self.encoding)
+            body = self.compressor.compress(body)
+        else:
+            body = compress(body, self.encoding)
+            headers["Content-Length"] = str(len(body))
+        await self.send({**start, "headers": headers.raw})
+        await self.send({**message, "body": body})
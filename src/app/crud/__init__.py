@@ -1,2 +1,3 @@
-from .crud_movies import movie
-from .crud_user import user
+from .crud_movies import movie, movie_async
+from .crud_stats import stats
+from .crud_user import user, user_async
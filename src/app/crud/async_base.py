@@ -0,0 +1,134 @@
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, Union
+
+from pydantic.types import UUID
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.crud.base import (
+    CreateSchemaType,
+    CRUDBase,
+    ModelType,
+    UpdateSchemaType,
+    _as_dict,
+    model_columns,
+    returned_entity,
+)
+from app.crud.pagination import Page, apply_keyset, build_page, parse_sort
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    sort_fields: Tuple[str, ...] = ("created_at", "id")
+    default_sort: str = "created_at"
+
+    def __init__(self, model: Type[ModelType]):
+        """
+        Async counterpart of `CRUDBase` working on an `AsyncSession`.
+
+        **Parameters**
+
+        * `model`: A SQLAlchemy model class
+        """
+        self.model = model
+
+    def get_base_query(self) -> Select:
+        return select(self.model)
+
+    async def get(self, db: AsyncSession, id: UUID) -> Optional[ModelType]:
+        result = await db.execute(select(self.model).filter(self.model.id == id))
+        return result.scalars().first()
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        *,
+        offset: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+    ) -> List[ModelType]:
+        page = await self.paginate(
+            db, select(self.model), offset=offset, limit=limit, cursor=cursor, sort=sort
+        )
+        return page.items
+
+    async def paginate(
+        self,
+        db: AsyncSession,
+        statement: Select,
+        *,
+        offset: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+        scalars: bool = True,
+    ) -> Page:
+        """
+        Same as `CRUDBase.paginate` for a `Select` statement, pass
+        `scalars=False` when it selects columns instead of an entity.
+        """
+        keys, descending = parse_sort(sort or self.default_sort, self.sort_fields)
+        statement = apply_keyset(
+            statement,
+            self.model,
+            keys=keys,
+            descending=descending,
+            cursor=cursor,
+            offset=offset,
+            limit=limit,
+        )
+        result = await db.execute(statement)
+        rows = result.scalars().all() if scalars else result.all()
+        return build_page(rows, keys=keys, descending=descending, limit=limit)
+
+    clean_values = CRUDBase.clean_values
+    _where = CRUDBase._where
+
+    async def execute_returning(self, db: AsyncSession, statement) -> List[ModelType]:
+        """See `CRUDBase.execute_returning`."""
+        columns = model_columns(self.model)
+        rows = (await db.execute(statement.returning(*columns.returning))).all()
+        return [
+            returned_entity(db.sync_session, self.model, columns.returning_keys, row) for row in rows
+        ]
+
+    async def create(
+        self, db: AsyncSession, *, obj: Union[CreateSchemaType, Dict[str, Any]], **values: Any
+    ) -> ModelType:
+        data = self.clean_values({**_as_dict(obj), **values})
+        db_obj, = await self.execute_returning(db, insert(self.model).values(data))
+        await db.commit()
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        data: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Optional[ModelType]:
+        return await self.update_by_id(db, id=db_obj.id, data=data)
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: UUID,
+        data: Union[UpdateSchemaType, Dict[str, Any]],
+        **filter_by: Any,
+    ) -> Optional[ModelType]:
+        where = self._where(id, filter_by)
+        data = self.clean_values(_as_dict(data, exclude_unset=True))
+        if not data:
+            result = await db.execute(select(self.model).filter(*where))
+            return result.scalars().first()
+        statement = update(self.model).where(*where).values(data)
+        db_objs = await self.execute_returning(db, statement)
+        await db.commit()
+        return db_objs[0] if db_objs else None
+
+    async def remove(self, db: AsyncSession, *, id: UUID, **filter_by: Any) -> Optional[UUID]:
+        statement = delete(self.model).where(*self._where(id, filter_by))
+        deleted = (await db.execute(statement.returning(self.model.id))).scalar()
+        await db.commit()
+        return deleted
@@ -1,10 +1,25 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from functools import lru_cache
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
-from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from pydantic.types import UUID
-from sqlalchemy.orm import Session, Query
+from sqlalchemy import Column, delete, insert, inspect, update
+from sqlalchemy.orm import Session, Query, make_transient_to_detached
+from sqlalchemy.orm.attributes import instance_state, set_committed_value
 
+from app.crud.pagination import Page, apply_keyset, build_page, parse_sort
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -13,6 +28,11 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # columns that can be used as keyset sort keys, each backed by a
+    # composite `(<column>, id)` index
+    sort_fields: Tuple[str, ...] = ("created_at", "id")
+    default_sort: str = "created_at"
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -24,20 +44,88 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    def clean_values(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Values of `data` that map to columns, ready for a Core statement.
+
+        Subclasses normalize values here, ORM validators don't run for
+        INSERT/UPDATE statements.
+        """
+        names = model_columns(self.model).names
+        return {key: value for key, value in data.items() if key in names}
+
+    def execute_returning(self, db: Session, statement) -> List[ModelType]:
+        """
+        Execute an INSERT/UPDATE and build detached entities from the rows it
+        returns.
+
+        They aren't in the session, so the commit doesn't expire them and
+        serializing them afterwards doesn't need another SELECT.
+        """
+        columns = model_columns(self.model)
+        rows = db.execute(statement.returning(*columns.returning)).all()
+        return [returned_entity(db, self.model, columns.returning_keys, row) for row in rows]
+
+    def _where(self, id: UUID, filter_by: Dict[str, Any]) -> List[Any]:
+        return [self.model.id == id] + [
+            getattr(self.model, key) == value for key, value in filter_by.items()
+        ]
+
     def get(self, db: Session, id: UUID) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
 
     def get_multi(
-        self, db: Session, *, offset: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        offset: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
     ) -> List[ModelType]:
-        return db.query(self.model).offset(offset).limit(limit).all()
+        return self.paginate(
+            db.query(self.model), offset=offset, limit=limit, cursor=cursor, sort=sort
+        ).items
+
+    def paginate(
+        self,
+        query: Query,
+        *,
+        offset: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+    ) -> Page:
+        """
+        Page through `query` ordered by a stable `(<sort>, id)` keyset.
+
+        When `cursor` is given the page starts right after the row it encodes,
+        so the cost of a page doesn't depend on how deep it is. `offset` is
+        still honoured for the first page, but the returned `next_cursor`
+        should be used for the following ones.
+        """
+        keys, descending = parse_sort(sort or self.default_sort, self.sort_fields)
+        query = apply_keyset(
+            query,
+            self.model,
+            keys=keys,
+            descending=descending,
+            cursor=cursor,
+            offset=offset,
+            limit=limit,
+        )
+        return build_page(query.all(), keys=keys, descending=descending, limit=limit)
 
-    def create(self, db: Session, *, obj: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj)
-        db_obj = self.model(**obj_in_data)  # type: ignore
-        db.add(db_obj)
+    def exists(self, db: Session, *, id: UUID) -> bool:
+        return db.query(self.model.id).filter(self.model.id == id).first() is not None
+
+    def create(
+        self, db: Session, *, obj: Union[CreateSchemaType, Dict[str, Any]], **values: Any
+    ) -> ModelType:
+        """`INSERT ... RETURNING`, `values` are extra columns like the owner."""
+        data = self.clean_values({**_as_dict(obj), **values})
+        db_obj, = self.execute_returning(db, insert(self.model).values(data))
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
     def update(
@@ -46,19 +134,79 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         *,
         db_obj: ModelType,
         data: Union[UpdateSchemaType, Dict[str, Any]]
-    ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        update_data = data if isinstance(data, dict) else data.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+    ) -> Optional[ModelType]:
+        """Update `db_obj`'s row, None when it was deleted meanwhile."""
+        return self.update_by_id(db, id=db_obj.id, data=data)
+
+    def update_by_id(
+        self,
+        db: Session,
+        *,
+        id: UUID,
+        data: Union[UpdateSchemaType, Dict[str, Any]],
+        **filter_by: Any,
+    ) -> Optional[ModelType]:
+        """
+        `UPDATE ... WHERE id = :id RETURNING`, the row is not loaded first.
+
+        `filter_by` adds conditions, e.g. `created_by_id=user.id` to only
+        update owned rows. Returns None when no row matched.
+        """
+        where = self._where(id, filter_by)
+        data = self.clean_values(_as_dict(data, exclude_unset=True))
+        if not data:
+            return db.query(self.model).filter(*where).first()
+        db_objs = self.execute_returning(db, update(self.model).where(*where).values(data))
         db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return db_objs[0] if db_objs else None
 
-    def remove(self, db: Session, *, id: UUID) -> None:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
+    def remove(self, db: Session, *, id: UUID, **filter_by: Any) -> Optional[UUID]:
+        """
+        `DELETE ... WHERE id = :id RETURNING id`, with the same `filter_by`
+        as `update_by_id`. Returns the id or None when no row matched.
+        """
+        statement = delete(self.model).where(*self._where(id, filter_by))
+        deleted = db.execute(statement.returning(self.model.id)).scalar()
         db.commit()
-        return
+        return deleted
+
+
+class ModelColumns(NamedTuple):
+    names: FrozenSet[str]
+    returning: Tuple[Column, ...]
+    returning_keys: Tuple[str, ...]
+
+
+@lru_cache(maxsize=None)
+def model_columns(model: Type[Base]) -> ModelColumns:
+    """
+    Column metadata of a model: the writable columns, computed ones are
+    left out, and the columns to return, deferred ones are left out.
+    """
+    props = inspect(model).column_attrs
+    returned = [prop for prop in props if not prop.deferred]
+    return ModelColumns(
+        names=frozenset(prop.key for prop in props if prop.columns[0].computed is None),
+        returning=tuple(prop.columns[0] for prop in returned),
+        returning_keys=tuple(prop.key for prop in returned),
+    )
+
+
+def returned_entity(db: Session, model: Type[ModelType], keys: Tuple[str, ...], row: Any) -> ModelType:
+    """
+    Detached instance of `model` loaded from a RETURNING `row`.
+
+    An instance of the same row already in the session is expired, so it
+    doesn't keep serving the values from before the write.
+    """
+    db_obj = model.__mapper__.class_manager.new_instance()
+    for key, value in zip(keys, row):
+        set_committed_value(db_obj, key, value)
+    make_transient_to_detached(db_obj)
+    if (existing := db.identity_map.get(instance_state(db_obj).key)) is not None:
+        db.expire(existing)
+    return db_obj
+
+
+def _as_dict(data: Union[BaseModel, Dict[str, Any]], exclude_unset: bool = False) -> Dict[str, Any]:
+    return dict(data) if isinstance(data, dict) else data.dict(exclude_unset=exclude_unset)
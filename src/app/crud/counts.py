@@ -0,0 +1,38 @@
+"""
+Row count estimates from the Postgres planner.
+
+An unfiltered table is estimated from `pg_class.reltuples`, anything else
+from the row estimate of the top node of `EXPLAIN`. Both are metadata reads
+that cost the same however many rows match.
+"""
+import json
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+COUNT_STRATEGIES = ("exact", "estimate", "cached", "auto")
+
+RELTUPLES = text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)")
+
+
+class explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON)` of a select, the statement isn't executed."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Any):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element: explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def plan_rows(plan: Any) -> int:
+    """Estimated rows of an `EXPLAIN (FORMAT JSON)` result, json may come as text."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
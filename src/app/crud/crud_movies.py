@@ -1,35 +1,277 @@
-from typing import Any, List, Dict, Union
+import asyncio
+import csv
+import io
+import uuid
+from datetime import datetime
+from typing import Any, Iterable, List, Dict, Optional, Tuple, Union
 
-from click import UUID
+from pydantic.types import UUID
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    any_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    false,
+    func,
+    insert,
+    select,
+    text,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, Query
+from sqlalchemy.sql import Select
 
+from app.cache.responses import MOVIES_LIST, response_cache
+from app.catalogue import COLUMNS as CATALOGUE_COLUMNS, catalogue
+from app.crud.async_base import AsyncCRUDBase
 from app.crud.base import CRUDBase
-from app.models.movies import Movies
-from app.schemas.movies import MovieCreate, MovieUpdate
+from app.crud.counts import RELTUPLES, explain, plan_rows
+from app.crud.filters import (
+    LIST_OPERATORS,
+    Condition,
+    FilterField,
+    compile_filters,
+    condition,
+    parse_filters,
+)
+from app.models.movies import Movies, normalize_genres
+from app.schemas.movies import MovieBulkUpdateItem, MovieCreate, MovieUpdate
+from app.search import search_index, tokenize
+from config import settings
 
 
-class CRUDMovie(CRUDBase[Movies, MovieCreate, MovieUpdate]):
+# per-connection staging table of `CRUDMovie.upsert_many`, rows are merged
+# into `movies` on the natural key (name, director)
+movies_import = Table(
+    "movies_import",
+    MetaData(),
+    Column("seq", Integer),
+    Column("id", PG_UUID(as_uuid=True)),
+    Column("name", String),
+    Column("director", String),
+    Column("popularity", Float),
+    Column("imdb_score", Float),
+    Column("genre", ARRAY(String)),
+    prefixes=["TEMPORARY"],
+)
+
+# the last row wins when a batch repeats a natural key
+_STAGED = """
+    SELECT DISTINCT ON (name, director) *
+    FROM movies_import
+    ORDER BY name, director, seq DESC
+"""
+
+_MERGE_UPDATE = text(f"""
+    UPDATE movies AS m
+    SET popularity = s.popularity, imdb_score = s.imdb_score, genre = s.genre, updated_at = now()
+    FROM ({_STAGED}) AS s
+    WHERE m.name = s.name AND m.director = s.director
+      AND (m.popularity, m.imdb_score, m.genre) IS DISTINCT FROM (s.popularity, s.imdb_score, s.genre)
+""")
+
+_MERGE_INSERT = text(f"""
+    INSERT INTO movies (id, name, director, popularity, imdb_score, genre, created_by_id)
+    SELECT s.id, s.name, s.director, s.popularity, s.imdb_score, s.genre, :created_by_id
+    FROM ({_STAGED}) AS s
+    WHERE NOT EXISTS (SELECT 1 FROM movies AS m WHERE m.name = s.name AND m.director = s.director)
+""")
+
+
+class BulkWriteError(ValueError):
+    """Raised when some movies of a bulk write don't exist or aren't owned."""
+
+    def __init__(self, ids: Iterable[UUID]):
+        self.ids = sorted(ids, key=str)
+        super().__init__(f"Movies not found or not owned: {', '.join(map(str, self.ids))}")
+
+
+class MovieMixin:
+    """Statement building and write hooks shared by the sync and async CRUD."""
+
+    sort_fields = ("created_at", "imdb_score", "popularity", "id")
+    # every operator here is served by an index of the column, see `Movies`
+    filter_fields = {
+        "name": FilterField("text", ("eq", "ilike")),
+        "director": FilterField("text", ("ilike",)),
+        "imdb_score": FilterField("number", ("eq", "gt", "gte", "lt", "lte")),
+        "popularity": FilterField("number", ("eq", "gt", "gte", "lt", "lte")),
+        "genre": FilterField("array", ("in", "all")),
+        "created_at": FilterField("datetime", ("gt", "gte", "lt", "lte")),
+    }
+    # `filter` keys and the conditions they stand for
+    filter_aliases = {
+        "name": ("name", "ilike"),
+        "director": ("director", "ilike"),
+        "genre": ("genre", "all"),
+        "genre__all": ("genre", "all"),
+        "genre__any": ("genre", "in"),
+        "imdb_score": ("imdb_score", "eq"),
+        "imdb_score__gte": ("imdb_score", "gte"),
+        "imdb_score__lte": ("imdb_score", "lte"),
+        "popularity": ("popularity", "eq"),
+        "popularity__gte": ("popularity", "gte"),
+        "popularity__lte": ("popularity", "lte"),
+    }
+
+    def parse_filters(self, params: Iterable[Tuple[str, str]]) -> Tuple[Condition, ...]:
+        """Parse `field[op]=value` query parameters, raises `FilterError`."""
+        return parse_filters(params, self.filter_fields)
+
+    def filter_condition(self, field: str, op: str, value: Any) -> Condition:
+        """Validate a single condition, raises `FilterError`."""
+        return condition(self.filter_fields, field, op, value)
+
+    def apply_filters(self, statement, conditions: Iterable[Condition]):
+        """Filter a `Query` or `Select` of movies by all `conditions` at once."""
+        if not (conditions := tuple(conditions)):
+            return statement
+        return statement.filter(compile_filters(self.model, conditions))
+
+    def filter(self, base_query: Query, *, q: Dict[str, Any]) -> Query:
+        """
+        Filter movies by a dict like `{"name": "nolan", "imdb_score__gte": 8}`.
+
+        Genres are matched with the array operators `@>` (`genre`,
+        `genre__all`) and `&&` (`genre__any`) so they can use the GIN index.
+        :param base_query:
+        :param q:
+        :return:
+        """
+        conditions = []
+        for key, value in q.items():
+            field, op = self.filter_aliases[key]
+            if key == "genre":
+                value = [value]
+            if op == "ilike":
+                value = f"%{value}%"
+            elif op in LIST_OPERATORS:
+                value = _parse_genres(value)
+            conditions.append(Condition(field, op, value))
+        return self.apply_filters(base_query, conditions)
+
+    def catalogue_statement(self) -> Select:
+        """The columns `app.catalogue` snapshots are built from."""
+        return select(*(getattr(self.model, name) for name in CATALOGUE_COLUMNS))
+
+    def search_statement(
+        self, base_query, *, q: str, dialect: str, ranked: Optional[List[UUID]] = None
+    ):
+        """
+        Full-text search on name and director, ordered by relevance.
+
+        Every word in `q` must match, as a prefix, a word of the name or the
+        director; name matches rank higher. Uses the `search_vector` column on
+        Postgres. Otherwise `ranked` must be the ids returned by the in-process
+        `search_index`, in order.
+        """
+        tokens = tokenize(q)
+        if not tokens:
+            return base_query.filter(false())
+
+        if self.search_backend(dialect) == "postgres":
+            ts_query = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in tokens))
+            rank = func.ts_rank_cd(self.model.search_vector, ts_query)
+            return base_query.filter(self.model.search_vector.op("@@")(ts_query)).order_by(
+                rank.desc(), self.model.id
+            )
+
+        if not ranked:
+            return base_query.filter(false())
+        position = case({id_: pos for pos, id_ in enumerate(ranked)}, value=self.model.id)
+        return base_query.filter(self.model.id.in_(ranked)).order_by(position)
+
+    def search_backend(self, dialect: str) -> str:
+        if settings.SEARCH_BACKEND != "auto":
+            return settings.SEARCH_BACKEND
+        return "postgres" if dialect == "postgresql" else "memory"
+
+    def clean_values(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        data = super().clean_values(data)
+        if data.get("genre") is not None:
+            data["genre"] = normalize_genres(data["genre"])
+        return data
+
+    def _on_change(
+        self,
+        *,
+        upserted: Iterable[Movies] = (),
+        deleted: Iterable[UUID] = (),
+        bulk: bool = False,
+    ) -> None:
+        """
+        Hook called after movies were written.
+
+        `bulk` means rows changed without being tracked individually, so
+        derived state has to be rebuilt instead of patched.
+        """
+        catalogue.invalidate()
+        if bulk:
+            search_index.clear()
+            response_cache.invalidate_movies(bulk=True)
+            return
+        upserted, deleted = list(upserted), list(deleted)
+        for db_obj in upserted:
+            search_index.add(db_obj.id, db_obj.name, db_obj.director)
+        for id_ in deleted:
+            search_index.remove(id_)
+        search_index.advance(
+            response_cache.invalidate_movies([db_obj.id for db_obj in upserted] + deleted)
+        )
+
+
+class CRUDMovie(MovieMixin, CRUDBase[Movies, MovieCreate, MovieUpdate]):
+
     def create_with_owner(
-        self, db: Session, *, obj: Union[MovieCreate], created_by_id: int
+        self, db: Session, *, obj: Union[MovieCreate], created_by_id: UUID
     ) -> Movies:
-        obj_data = jsonable_encoder(obj)
-        db_obj = self.model(**obj_data, created_by_id=created_by_id)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        db_obj = self.create(db, obj=obj, created_by_id=created_by_id)
+        self._on_change(upserted=[db_obj])
         return db_obj
 
+    def update_by_id(
+        self,
+        db: Session,
+        *,
+        id: UUID,
+        data: Union[MovieUpdate, Dict[str, Any]],
+        **filter_by: Any,
+    ) -> Optional[Movies]:
+        db_obj = super().update_by_id(db, id=id, data=data, **filter_by)
+        if db_obj:
+            self._on_change(upserted=[db_obj])
+        return db_obj
+
+    def remove(self, db: Session, *, id: UUID, **filter_by: Any) -> Optional[UUID]:
+        if deleted := super().remove(db, id=id, **filter_by):
+            self._on_change(deleted=[deleted])
+        return deleted
+
     def get_multi_by_owner(
-        self, db: Session, *, created_by_id: UUID, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        created_by_id: UUID,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
     ) -> List[Movies]:
-        return (
-            db.query(self.model)
-            .filter(Movies.created_by_id == created_by_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        query = db.query(self.model).filter(Movies.created_by_id == created_by_id)
+        return self.paginate(
+            query, offset=skip, limit=limit, cursor=cursor, sort=sort
+        ).items
 
     def get_base_query(self, db: Session) -> Query:
         return db.query(self.model)
@@ -42,48 +284,294 @@ class CRUDMovie(CRUDBase[Movies, MovieCreate, MovieUpdate]):
         db_objs = [self.model(**obj_data) for obj_data in objs_data]
         db.add_all(db_objs)
         db.commit()
+        self._on_change(bulk=True)
         return len(db_objs)
 
-    def bulk_delete(self, db: Session) -> int:
-        return db.query(self.model).delete()
+    def create_many(
+        self, db: Session, *, objs: List[MovieCreate], created_by_id: UUID
+    ) -> List[Movies]:
+        """Create movies with a single multi-row `INSERT ... RETURNING`."""
+        rows = [
+            self.clean_values({**obj.dict(), "id": uuid.uuid4(), "created_by_id": created_by_id})
+            for obj in objs
+        ]
+        db_objs = self.execute_returning(db, insert(self.model).values(rows))
+        db.commit()
+        self._on_change(upserted=db_objs)
+        return db_objs
 
-    def filter(self, base_query: Query, *, q: Dict[str, Any]) -> Query:
+    def update_many(
+        self, db: Session, *, items: List[MovieBulkUpdateItem], created_by_id: UUID
+    ) -> List[Movies]:
         """
-        Filter movies by query parameters.
-        :param base_query:
-        :param q:
-        :return:
+        Update movies owned by `created_by_id` with `UPDATE ... FROM (VALUES ...)`.
+
+        Items are grouped by the fields they set, one statement per group.
+        Nothing is written when any movie doesn't exist or isn't owned, a
+        `BulkWriteError` lists those instead.
         """
-        if "name" in q:
-            base_query = base_query.filter(self.model.name.ilike(f"%{q['name']}%"))
-        if "genre" in q:
-            base_query = base_query.filter(self.model.genre.contains([q["genre"]]))
-        if "director" in q:
-            base_query = base_query.filter(
-                self.model.director.ilike(f"%{q['director']}%")
-            )
-        if "imdb_score" in q:
-            base_query = base_query.filter(self.model.imdb_score == q["imdb_score"])
-        if "imdb_score__gte" in q:
-            base_query = base_query.filter(
-                self.model.imdb_score >= q["imdb_score__gte"]
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for item in items:
+            data = self.clean_values(item.dict(exclude_unset=True))
+            fields = tuple(sorted(key for key in data if key != "id"))
+            groups.setdefault(fields, []).append(data)
+
+        db_objs = []
+        for fields, rows in groups.items():
+            columns = [self.model.__table__.c[name] for name in ("id", *fields)]
+            data = values(*[Column(c.name, c.type) for c in columns], name="data").data(
+                [tuple(row[c.name] for c in columns) for row in rows]
             )
-        if "imdb_score__lte" in q:
-            base_query = base_query.filter(
-                self.model.imdb_score <= q["imdb_score__lte"]
+            # VALUES literals are untyped, cast them to the column types
+            statement = update(self.model).where(
+                self.model.id == cast(data.c.id, self.model.id.type),
+                self.model.created_by_id == created_by_id,
             )
-        if "popularity" in q:
-            base_query = base_query.filter(self.model.popularity == q["popularity"])
-        if "popularity__gte" in q:
-            base_query = base_query.filter(
-                self.model.popularity >= q["popularity__gte"]
+            if fields:
+                assignments = {c.name: cast(data.c[c.name], c.type) for c in columns[1:]}
+                statement = statement.values({**assignments, "updated_at": func.now()})
+            else:
+                statement = statement.values(id=self.model.id)
+            db_objs += self.execute_returning(db, statement)
+
+        missing = {item.id for item in items} - {db_obj.id for db_obj in db_objs}
+        if missing:
+            db.rollback()
+            raise BulkWriteError(missing)
+        db.commit()
+        self._on_change(upserted=db_objs)
+        return db_objs
+
+    def remove_many(self, db: Session, *, ids: List[UUID], created_by_id: UUID) -> List[UUID]:
+        """
+        Delete movies owned by `created_by_id` with `DELETE ... WHERE id = ANY(:ids)`.
+
+        Like `update_many` it is all or nothing.
+        """
+        ids_param = bindparam("ids", list(ids), type_=ARRAY(PG_UUID(as_uuid=True)))
+        statement = (
+            delete(self.model)
+            .where(
+                self.model.id == any_(ids_param),
+                self.model.created_by_id == created_by_id,
             )
-        if "popularity__lte" in q:
-            base_query = base_query.filter(
-                self.model.popularity <= q["popularity__lte"]
+            .returning(self.model.id)
+            # the ORM can't evaluate `= ANY(...)` against the session in Python
+            .execution_options(synchronize_session=False)
+        )
+        deleted = db.execute(statement).scalars().all()
+        missing = set(ids) - set(deleted)
+        if missing:
+            db.rollback()
+            raise BulkWriteError(missing)
+        db.commit()
+        self._on_change(deleted=deleted)
+        return deleted
+
+    def upsert_many(
+        self,
+        db: Session,
+        *,
+        rows: List[Dict[str, Any]],
+        created_by_id: UUID,
+        copy: bool = True,
+    ) -> Tuple[int, int]:
+        """
+        Insert or update movies on their natural key `(name, director)`.
+
+        `rows` are loaded into a temporary staging table, with `COPY` when the
+        driver supports it and `executemany` otherwise, then merged with one
+        UPDATE and one INSERT. Unchanged movies are left alone so their
+        `updated_at`, and ETags, stay the same. Commits and returns
+        `(inserted, updated)`.
+        """
+        connection = db.connection()
+        movies_import.create(connection, checkfirst=True)
+        staged = [
+            {**self.clean_values(row), "seq": seq, "id": uuid.uuid4()}
+            for seq, row in enumerate(rows)
+        ]
+        if copy and connection.dialect.driver == "psycopg2":
+            _copy_rows(connection, movies_import, staged)
+        else:
+            db.execute(movies_import.insert(), staged)
+        updated = db.execute(_MERGE_UPDATE).rowcount
+        inserted = db.execute(_MERGE_INSERT, {"created_by_id": created_by_id}).rowcount
+        db.execute(movies_import.delete())
+        db.commit()
+        self._on_change(bulk=True)
+        return inserted, updated
+
+    def bulk_delete(self, db: Session) -> int:
+        count = db.query(self.model).delete()
+        # invalidated once committed, a reader could re-cache the old rows otherwise
+        db.commit()
+        self._on_change(bulk=True)
+        return count
+
+    def get_updated_at(self, db: Session, *, id: UUID) -> Optional[datetime]:
+        """Only the version column of a movie, to answer conditional requests."""
+        return db.query(self.model.updated_at).filter(self.model.id == id).scalar()
+
+    def fingerprint(self, query: Query) -> Tuple[Optional[datetime], int]:
+        """
+        `(max(updated_at), count)` of the rows matched by `query`.
+
+        Any insert, update or delete among them changes it, so it identifies a
+        version of the result set without loading it.
+        """
+        return query.order_by(None).with_entities(
+            func.max(self.model.updated_at), func.count(self.model.id)
+        ).one()
+
+    def count(self, query: Query) -> int:
+        """Exact count of the rows matched by `query`."""
+        return query.order_by(None).count()
+
+    def count_estimate(self, db: Session, query: Query) -> int:
+        """
+        Planner estimate of the rows matched by `query`, see `app.crud.counts`.
+
+        Other databases get an exact count.
+        """
+        query = query.order_by(None)
+        if db.get_bind().dialect.name != "postgresql":
+            return self.count(query)
+        statement = query.statement
+        if statement.whereclause is None:
+            estimate = db.execute(RELTUPLES, {"table": self.model.__tablename__}).scalar()
+            # -1 or NULL until the table is first analyzed
+            if estimate is not None and estimate >= 0:
+                return estimate
+        return plan_rows(db.execute(explain(statement)).scalar())
+
+    def search(
+        self, db: Session, base_query: Query, *, q: str, limit: Optional[int] = None
+    ) -> Query:
+        """
+        Order `base_query` by relevance for `q`, see `search_statement`.
+
+        With the in-process index only the `limit` best matches are
+        considered, pass it when nothing else filters them.
+        """
+        dialect = db.get_bind().dialect.name
+        ranked = None
+        if self.search_backend(dialect) == "memory":
+            search_index.refresh(
+                response_cache.version(MOVIES_LIST),
+                lambda: db.query(self.model.id, self.model.name, self.model.director).all(),
             )
+            ranked = [id_ for id_, _ in search_index.search(q, limit=limit)]
+        return self.search_statement(base_query, q=q, dialect=dialect, ranked=ranked)
+
+
+class AsyncCRUDMovie(MovieMixin, AsyncCRUDBase[Movies, MovieCreate, MovieUpdate]):
+    async def create_with_owner(
+        self, db: AsyncSession, *, obj: MovieCreate, created_by_id: UUID
+    ) -> Movies:
+        db_obj = await self.create(db, obj=obj, created_by_id=created_by_id)
+        self._on_change(upserted=[db_obj])
+        return db_obj
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: UUID,
+        data: Union[MovieUpdate, Dict[str, Any]],
+        **filter_by: Any,
+    ) -> Optional[Movies]:
+        db_obj = await super().update_by_id(db, id=id, data=data, **filter_by)
+        if db_obj:
+            self._on_change(upserted=[db_obj])
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: UUID, **filter_by: Any) -> Optional[UUID]:
+        if deleted := await super().remove(db, id=id, **filter_by):
+            self._on_change(deleted=[deleted])
+        return deleted
+
+    async def get_updated_at(self, db: AsyncSession, *, id: UUID) -> Optional[datetime]:
+        result = await db.execute(
+            select(self.model.updated_at).filter(self.model.id == id)
+        )
+        return result.scalar()
+
+    async def fingerprint(
+        self, db: AsyncSession, statement: Select
+    ) -> Tuple[Optional[datetime], int]:
+        statement = statement.order_by(None).with_only_columns(
+            func.max(self.model.updated_at), func.count(self.model.id)
+        )
+        return (await db.execute(statement)).one()
+
+    async def count(self, db: AsyncSession, statement: Select) -> int:
+        counted = select(func.count()).select_from(statement.order_by(None).subquery())
+        return (await db.execute(counted)).scalar_one()
+
+    async def count_estimate(self, db: AsyncSession, statement: Select) -> int:
+        statement = statement.order_by(None)
+        if db.bind.dialect.name != "postgresql":
+            return await self.count(db, statement)
+        if statement.whereclause is None:
+            result = await db.execute(RELTUPLES, {"table": self.model.__tablename__})
+            if (estimate := result.scalar()) is not None and estimate >= 0:
+                return estimate
+        return plan_rows((await db.execute(explain(statement))).scalar())
+
+    async def search(
+        self, db: AsyncSession, statement: Select, *, q: str, limit: Optional[int] = None
+    ) -> Select:
+        """Order `statement` by relevance for `q`, see `search_statement`."""
+        dialect = db.bind.dialect.name
+        ranked = None
+        if self.search_backend(dialect) == "memory":
+            version = response_cache.version(MOVIES_LIST)
+            if not search_index.is_current(version):
+                rows = await db.execute(
+                    select(self.model.id, self.model.name, self.model.director)
+                )
+                # indexing is CPU bound, it runs off the event loop
+                await asyncio.get_running_loop().run_in_executor(
+                    None, search_index.build, rows.all(), version
+                )
+            ranked = [id_ for id_, _ in search_index.search(q, limit=limit)]
+        return self.search_statement(statement, q=q, dialect=dialect, ranked=ranked)
+
+
+def _copy_rows(connection, table: Table, rows: List[Dict[str, Any]]) -> None:
+    """`COPY table FROM STDIN` the rows through the psycopg2 cursor."""
+    columns = [column.name for column in table.columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([_copy_value(row.get(column)) for column in columns])
+    buffer.seek(0)
+    # the csv module quotes None as "", read it back as NULL where "" isn't valid
+    nullable = [column.name for column in table.columns if not isinstance(column.type, String)]
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NULL ({', '.join(nullable)}))",
+            buffer,
+        )
+
+
+def _copy_value(value: Any) -> Any:
+    if isinstance(value, list):
+        escaped = (item.replace("\\", "\\\\").replace('"', '\\"') for item in value)
+        return "{" + ",".join(f'"{item}"' for item in escaped) + "}"
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
 
-        return base_query
+def _parse_genres(value: Union[str, List[str]]) -> List[str]:
+    """Accept a list of genres or a comma separated string."""
+    if isinstance(value, str):
+        value = value.split(",")
+    return normalize_genres(value)
 
 
 movie: CRUDMovie = CRUDMovie(Movies)
+movie_async: AsyncCRUDMovie = AsyncCRUDMovie(Movies)
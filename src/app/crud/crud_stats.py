@@ -0,0 +1,93 @@
+from typing import List, Optional
+
+from sqlalchemy import Table, func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.models import Movies
+from app.models.stats import movie_director_stats, movie_genre_stats, movie_genres
+
+
+class CRUDStats:
+    """
+    Reads of the movie aggregates, see `app.models.stats`.
+
+    They are maintained by a trigger, so there are no write methods. Every
+    read is a primary key lookup or an index range scan, orderings are the
+    backward scan of an index, hence the descending tie-breakers.
+    """
+
+    # columns the director ranking can be ordered by, each has an index
+    director_sort_fields = ("movie_count", "avg_imdb_score")
+
+    @staticmethod
+    def _columns(table: Table, key: str):
+        popularity = table.c.popularity_sum / func.nullif(table.c.popularity_count, 0)
+        return (
+            table.c[key],
+            table.c.movie_count,
+            table.c.avg_imdb_score,
+            popularity.label("avg_popularity"),
+        )
+
+    def genres(self, db: Session, *, offset: int = 0, limit: int = 100) -> List[Row]:
+        """Genres with the most movies first."""
+        table = movie_genre_stats
+        statement = (
+            select(*self._columns(table, "genre"))
+            .order_by(table.c.movie_count.desc(), table.c.genre.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        return db.execute(statement).all()
+
+    def genre(self, db: Session, *, genre: str) -> Optional[Row]:
+        table = movie_genre_stats
+        statement = select(*self._columns(table, "genre")).filter(table.c.genre == genre)
+        return db.execute(statement).first()
+
+    def directors(
+        self,
+        db: Session,
+        *,
+        sort: str = "movie_count",
+        min_movies: int = 1,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> List[Row]:
+        """Directors ranked by `sort`, descending."""
+        if sort not in self.director_sort_fields:
+            raise ValueError(f"Unsupported sort field {sort!r}")
+        table = movie_director_stats
+        statement = (
+            select(*self._columns(table, "director"))
+            .filter(table.c.movie_count >= min_movies)
+            .order_by(table.c[sort].desc(), table.c.director.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        return db.execute(statement).all()
+
+    def director(self, db: Session, *, director: str) -> Optional[Row]:
+        table = movie_director_stats
+        statement = select(*self._columns(table, "director")).filter(table.c.director == director)
+        return db.execute(statement).first()
+
+    def top_rated(self, db: Session, *, genre: str, limit: int = 50) -> List[Movies]:
+        """The best scored movies of a genre, walking `movie_genres` by score."""
+        top = (
+            select(movie_genres.c.movie_id, movie_genres.c.imdb_score)
+            .filter(movie_genres.c.genre == genre)
+            .order_by(movie_genres.c.imdb_score.desc(), movie_genres.c.movie_id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        return (
+            db.query(Movies)
+            .join(top, Movies.id == top.c.movie_id)
+            .order_by(top.c.imdb_score.desc(), Movies.id.desc())
+            .all()
+        )
+
+
+stats = CRUDStats()
@@ -1,11 +1,20 @@
 from typing import Any, Dict, Optional, Union
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.cache.tokens import invalidate_user
+from app.crud.async_base import AsyncCRUDBase
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from core import get_password_hash, verify_password
+from core import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_password,
+    verify_password_async,
+)
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -13,27 +22,25 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return db.query(User).filter(User.email == email).first()
 
     def create(self, db: Session, *, obj: UserCreate, is_admin: bool = False, is_active: bool = True) -> User:
-        db_obj = User(
-            email=obj.email,
+        return super().create(
+            db,
+            obj=obj,
             hashed_password=get_password_hash(obj.password),
-            full_name=obj.full_name,
             is_admin=is_admin,
-            is_active=is_active
+            is_active=is_active,
         )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
 
     def update(
         self, db: Session, *, db_obj: User, obj: Union[UserUpdate, Dict[str, Any]]
-    ) -> User:
+    ) -> Optional[User]:
         update_data = obj if isinstance(obj, dict) else obj.dict(exclude_unset=True)
-        if update_data["password"]:
+        if update_data.get("password"):
             hashed_password = get_password_hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
-        return super().update(db, db_obj=db_obj, data=update_data)
+        updated = super().update(db, db_obj=db_obj, data=update_data)
+        invalidate_user(db_obj.id)
+        return updated
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         if _user := self.get_by_email(db, email=email):
@@ -47,4 +54,43 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return self.is_active(_user) and _user.is_admin
 
 
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        result = await db.execute(select(User).filter(User.email == email))
+        return result.scalars().first()
+
+    async def create(
+        self, db: AsyncSession, *, obj: UserCreate, is_admin: bool = False, is_active: bool = True
+    ) -> User:
+        return await super().create(
+            db,
+            obj=obj,
+            hashed_password=await get_password_hash_async(obj.password),
+            is_admin=is_admin,
+            is_active=is_active,
+        )
+
+    async def update(
+        self, db: AsyncSession, *, db_obj: User, obj: Union[UserUpdate, Dict[str, Any]]
+    ) -> Optional[User]:
+        update_data = obj if isinstance(obj, dict) else obj.dict(exclude_unset=True)
+        if update_data.get("password"):
+            hashed_password = await get_password_hash_async(update_data["password"])
+            del update_data["password"]
+            update_data["hashed_password"] = hashed_password
+        updated = await super().update(db, db_obj=db_obj, data=update_data)
+        invalidate_user(db_obj.id)
+        return updated
+
+    async def authenticate(self, db: AsyncSession, *, email: str, password: str) -> Optional[User]:
+        if _user := await self.get_by_email(db, email=email):
+            verified = await verify_password_async(password, _user.hashed_password)
+            return _user if verified else None
+        return None
+
+    is_active = CRUDUser.is_active
+    is_admin = CRUDUser.is_admin
+
+
 user: CRUDUser = CRUDUser(User)
+user_async: AsyncCRUDUser = AsyncCRUDUser(User)
@@ -0,0 +1,141 @@
+"""
+Typed query string filters, e.g. `imdb_score[gte]=8&genre[in]=Drama,Action`.
+
+Parameters are parsed into `Condition`s that are checked against a
+whitelist of fields and the operators their indexes support, then compiled
+into a single SQLAlchemy expression. The expression only depends on the
+filter shape, the (field, operator) pairs, so it is built once per shape and
+the values are bound into a copy of it.
+"""
+import math
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Mapping, NamedTuple, Tuple
+
+from sqlalchemy import String, and_, bindparam
+
+from app.models.movies import normalize_genres
+
+# the trigram indexes can't narrow down shorter patterns
+MIN_PATTERN_LENGTH = 3
+MAX_LIST_VALUES = 50
+
+_PARAM = re.compile(r"^(?P<field>\w+)(?:\[(?P<op>\w+)\])?$")
+
+
+class FilterError(ValueError):
+    """Raised for an unknown field or operator, or an invalid value."""
+
+
+class FilterField(NamedTuple):
+    """A filterable column, its value kind and the operators its indexes serve."""
+
+    kind: str
+    ops: Tuple[str, ...]
+
+
+class Condition(NamedTuple):
+    field: str
+    op: str
+    value: Any
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# (column, bound parameter) -> clause
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    "eq": lambda column, param: column == param,
+    "gt": lambda column, param: column > param,
+    "gte": lambda column, param: column >= param,
+    "lt": lambda column, param: column < param,
+    "lte": lambda column, param: column <= param,
+    "ilike": lambda column, param: column.ilike(param, escape="\\"),
+    # array columns, `&&` and `@>` can use a GIN index
+    "in": lambda column, param: column.overlap(param),
+    "all": lambda column, param: column.contains(param),
+}
+
+LIST_OPERATORS = frozenset({"in", "all"})
+
+
+def _coerce(field: FilterField, op: str, raw: Any) -> Any:
+    if op in LIST_OPERATORS:
+        values = normalize_genres(raw.split(",") if isinstance(raw, str) else raw)
+        if not 0 < len(values) <= MAX_LIST_VALUES:
+            raise FilterError(f"Expected 1 to {MAX_LIST_VALUES} comma separated values")
+        return values
+    if field.kind == "number":
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            value = math.nan
+        if not math.isfinite(value):
+            raise FilterError(f"Expected a number, got {raw!r}")
+        return value
+    if field.kind == "datetime":
+        try:
+            return raw if isinstance(raw, datetime) else datetime.fromisoformat(raw)
+        except (TypeError, ValueError):
+            raise FilterError(f"Expected an ISO 8601 datetime, got {raw!r}")
+    return str(raw)
+
+
+def condition(fields: Mapping[str, FilterField], field: str, op: str, raw: Any) -> Condition:
+    """Validate one condition, coercing `raw` to the field's kind."""
+    if field not in fields:
+        raise FilterError(f"Unknown filter field {field!r}, expected one of {sorted(fields)}")
+    spec = fields[field]
+    if op not in spec.ops:
+        raise FilterError(f"Unsupported operator {op!r} for {field!r}, expected one of {list(spec.ops)}")
+    value = _coerce(spec, op, raw)
+    if op == "ilike":
+        if len(value.strip()) < MIN_PATTERN_LENGTH:
+            raise FilterError(f"{field}[ilike] needs at least {MIN_PATTERN_LENGTH} characters")
+        value = f"%{_escape_like(value)}%"
+    return Condition(field, op, value)
+
+
+def parse_filters(
+    params: Iterable[Tuple[str, str]], fields: Mapping[str, FilterField]
+) -> Tuple[Condition, ...]:
+    """
+    Parse `field[op]=value` query parameters, a bare `field=value` means
+    `field[eq]`.
+
+    Bare names that aren't filter fields are other parameters and are
+    skipped, bracketed ones have to be valid. Conditions are returned in a
+    canonical order, each (field, operator) pair can be given once.
+    """
+    conditions = {}
+    for key, raw in params:
+        if not (match := _PARAM.match(key)):
+            continue
+        field, op = match.group("field"), match.group("op")
+        if op is None:
+            if field not in fields:
+                continue
+            op = "eq"
+        if (field, op) in conditions:
+            raise FilterError(f"{field}[{op}] is given more than once")
+        conditions[field, op] = condition(fields, field, op, raw)
+    return tuple(conditions[shape] for shape in sorted(conditions))
+
+
+@lru_cache(maxsize=256)
+def _plan(model: Any, shape: Tuple[Tuple[str, str], ...]) -> Any:
+    clauses = []
+    for position, (field, op) in enumerate(shape):
+        column = getattr(model, field)
+        type_ = String() if op == "ilike" else column.type
+        clauses.append(OPERATORS[op](column, bindparam(f"filter_{position}", type_=type_)))
+    return and_(*clauses)
+
+
+def compile_filters(model: Any, conditions: Iterable[Condition]) -> Any:
+    """One expression for all `conditions` of `model`, AND-ed together."""
+    conditions = sorted(conditions, key=lambda c: (c.field, c.op))
+    plan = _plan(model, tuple((c.field, c.op) for c in conditions))
+    return plan.params({f"filter_{i}": c.value for i, c in enumerate(conditions)})
@@ -0,0 +1,139 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, Float, and_, or_, tuple_
+from sqlalchemy.dialects.postgresql import UUID
+
+
+class PaginationError(ValueError):
+    """Raised for an unsupported sort or a cursor that can't be decoded."""
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def parse_sort(sort: str, allowed: Sequence[str]) -> Tuple[Tuple[str, ...], bool]:
+    """
+    Parse a sort expression like `-imdb_score` into keyset sort keys.
+
+    The primary key is always appended as a tie-breaker, so every sort is total
+    and matches one of the composite `(<column>, id)` indexes.
+    """
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in allowed:
+        raise PaginationError(f"Unsupported sort field {field!r}")
+    keys = (field,) if field == "id" else (field, "id")
+    return keys, descending
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, UUID):
+        return uuid.UUID(value)
+    if isinstance(column.type, Float):
+        return float(value)
+    return value
+
+
+def encode_cursor(obj: Any, keys: Sequence[str], descending: bool = False) -> str:
+    """Encode the sort key values of `obj` into an opaque, url-safe cursor."""
+    payload = {
+        "k": list(keys),
+        "d": descending,
+        "v": [_encode_value(getattr(obj, key)) for key in keys],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(model, cursor: str, keys: Sequence[str], descending: bool = False) -> List[Any]:
+    """Decode a cursor produced by `encode_cursor` for the given sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload["k"] != list(keys) or payload["d"] != descending or len(payload["v"]) != len(keys):
+            raise PaginationError("Cursor does not match the requested sort")
+        columns = [getattr(model, key) for key in keys]
+        return [_decode_value(col, value) for col, value in zip(columns, payload["v"])]
+    except PaginationError:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise PaginationError("Invalid cursor") from e
+
+
+def apply_keyset(
+    statement,
+    model,
+    *,
+    keys: Sequence[str],
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 100,
+):
+    """
+    Order `statement` by the keyset and seek past `cursor`.
+
+    Works with both `Query` and `Select` objects. One extra row is fetched so
+    `build_page` can tell whether there is a next page. Rows with a NULL in a
+    nullable sort column come last, in either direction.
+    """
+    columns = [getattr(model, key) for key in keys]
+    nullable = [model.__table__.c[key].nullable for key in keys]
+    if cursor:
+        values = decode_cursor(model, cursor, keys, descending)
+        statement = statement.filter(_after(columns, values, descending, nullable[0]))
+    order = []
+    for column, is_nullable in zip(columns, nullable):
+        column = column.desc() if descending else column.asc()
+        order.append(column.nullslast() if is_nullable else column)
+    # ordered before the offset, `Query` refuses order_by after offset/limit
+    statement = statement.order_by(*order)
+    if not cursor and offset:
+        statement = statement.offset(offset)
+    return statement.limit(limit + 1)
+
+
+def _after(columns: Sequence[Any], values: Sequence[Any], descending: bool, nullable: bool):
+    """
+    Rows sorting after the cursor `values`, a row-value comparison that can
+    seek in the `(<column>, id)` index.
+
+    Only the first key can be nullable, the others are the primary key. NULLs
+    sort last, so they follow any value and among each other by the rest.
+    """
+    lhs, rhs = tuple_(*columns), tuple_(*values)
+    after = lhs < rhs if descending else lhs > rhs
+    if not nullable or len(columns) == 1:
+        return after
+    column, rest, rest_values = columns[0], tuple_(*columns[1:]), tuple_(*values[1:])
+    if values[0] is None:
+        return and_(column.is_(None), rest < rest_values if descending else rest > rest_values)
+    return or_(after, column.is_(None))
+
+
+def build_page(
+    rows: List[Any], *, keys: Sequence[str], descending: bool = False, limit: int = 100
+) -> Page:
+    """Trim the look-ahead row and compute the cursor for the next page."""
+    if len(rows) <= limit:
+        return Page(items=rows, next_cursor=None)
+    items = rows[:limit]
+    return Page(items=items, next_cursor=encode_cursor(items[-1], keys, descending))
@@ -3,3 +3,4 @@
 from app.db.base_class import Base  # noqa
 from app.models.movies import Movies  # noqa
 from app.models.user import User  # noqa
+from app.models.stats import movie_director_stats, movie_genre_stats, movie_genres  # noqa
@@ -13,4 +13,10 @@ class Base:
 
     id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), server_onupdate=func.now())
+    # `onupdate` makes ORM updates bump it, ETags are derived from it
+    updated_at = Column(
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+        server_onupdate=func.now(),
+    )
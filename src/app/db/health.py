@@ -0,0 +1,125 @@
+"""
+Database checks behind the readiness endpoint.
+
+Load balancers poll readiness every few seconds on every worker, so the
+`SELECT 1` probe is cached for a short while and runs on its own thread: a
+database that doesn't answer makes the probe time out instead of holding a
+request thread, and only one probe is ever in flight.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
+
+class ProbeResult(NamedTuple):
+    ok: bool
+    latency_seconds: Optional[float]
+    revision: Optional[str]
+    error: Optional[str]
+    checked_at: float
+
+
+@lru_cache()
+def migration_head() -> Optional[str]:
+    """The head revision of the migrations shipped with this code."""
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+class DatabaseProbe:
+    """Cached `SELECT 1` against `engine`, also reading the migration revision."""
+
+    def __init__(self, engine: Engine, ttl: float, timeout: float):
+        self.engine = engine
+        self.ttl = ttl
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-probe")
+        self._lock = threading.Lock()
+        self._result: Optional[ProbeResult] = None
+        self._running: Optional[Future] = None
+
+    def _probe(self) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                revision = MigrationContext.configure(connection).get_current_revision()
+        except Exception as e:
+            return ProbeResult(False, None, None, f"{type(e).__name__}: {e}", time.monotonic())
+        return ProbeResult(True, time.perf_counter() - started, revision, None, time.monotonic())
+
+    def _store(self, future: Future) -> None:
+        with self._lock:
+            if self._running is future:
+                self._result = future.result()
+                self._running = None
+
+    def result(self) -> Optional[ProbeResult]:
+        """The last result while it is fresh, None when a probe is due."""
+        result = self._result
+        if result is not None and time.monotonic() - result.checked_at < self.ttl:
+            return result
+        return None
+
+    def submit(self) -> Future:
+        """The running probe, or a new one."""
+        with self._lock:
+            future = self._running
+            if future is None:
+                future = self._running = self._executor.submit(self._probe)
+        # outside the lock, the callback runs right away if the probe is done
+        future.add_done_callback(self._store)
+        return future
+
+    def check(self) -> ProbeResult:
+        if (result := self.result()) is not None:
+            return result
+        try:
+            return self.submit().result(timeout=self.timeout)
+        except FutureTimeoutError:
+            return self._timed_out()
+
+    async def check_async(self) -> ProbeResult:
+        """`check` without blocking the event loop."""
+        if (result := self.result()) is not None:
+            return result
+        future = asyncio.wrap_future(self.submit())
+        try:
+            # shielded, a timeout leaves the probe running for the next check
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return self._timed_out()
+
+    def _timed_out(self) -> ProbeResult:
+        error = f"No answer within {self.timeout:g}s"
+        return ProbeResult(False, None, None, error, time.monotonic())
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._result = None
+
+
+def pool_available(figures: Dict[str, Any]) -> Dict[str, Any]:
+    """Whether a connection can be checked out without waiting, from `status_dict`."""
+    # a negative max_overflow doesn't limit the connections
+    capacity = figures["size"] + figures["max_overflow"] if figures["max_overflow"] >= 0 else None
+    return {
+        "ok": capacity is None or figures["checked_out"] < capacity,
+        "checked_out": figures["checked_out"],
+        "capacity": capacity,
+        "timeouts": figures["timeouts"],
+    }
@@ -0,0 +1,227 @@
+"""
+Streaming movie import.
+
+Records are parsed incrementally from JSON (a top level array), JSON lines or
+TSV files and upserted in batches with `crud.movie.upsert_many`, so memory
+use depends on the batch size and not on the size of the input.
+
+Records carry the fields of `MovieCreate`: `name`, `director`, `imdb_score`,
+`popularity` and `genre`. TSV files name them in their header line, with
+`genre` comma separated and `\\N` for a missing value.
+"""
+import csv
+import json
+import logging
+import os
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from pydantic import ValidationError
+from pydantic.types import UUID
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.schemas import MovieCreate
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "jsonl", "tsv")
+
+# alternative field names, the fixture file has `99popularity`
+FIELD_ALIASES = {"99popularity": "popularity"}
+
+# missing values in TSV files, as Postgres' COPY writes them
+TSV_NULL = "\\N"
+
+# characters of an array item to read before giving up on decoding it, a
+# corrupt item would otherwise buffer the rest of the file
+MAX_ITEM_SIZE = 1024 * 1024
+
+
+class ImportStats(NamedTuple):
+    records: int
+    inserted: int
+    updated: int
+    skipped: int
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lstrip(".").lower()
+    if suffix == "ndjson":
+        return "jsonl"
+    if suffix in FORMATS:
+        return suffix
+    raise ValueError(f"Can't detect the format of {path}, pass one of {FORMATS}")
+
+
+def iter_json_array(
+    fp: IO[str], chunk_size: int = 64 * 1024, max_item_size: int = MAX_ITEM_SIZE
+) -> Iterator[Any]:
+    """
+    Yield the items of a top level JSON array one at a time.
+
+    Only the current item and one read chunk are held in memory. An item
+    that doesn't decode within `max_item_size` characters raises a
+    `ValueError`.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    index = 0
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != "[":
+                raise ValueError("Expected a JSON array")
+            buffer = buffer[1:].lstrip()
+            started = True
+        if started and buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if started and buffer.startswith("]"):
+            return
+        if started and buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise
+                if len(buffer) > max_item_size:
+                    raise ValueError(
+                        f"Item {index} of the JSON array isn't valid within {max_item_size} characters"
+                    ) from e
+            else:
+                # a number could continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield item
+                    index += 1
+                    buffer = buffer[end:]
+                    continue
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_jsonl(fp: IO[str]) -> Iterator[Any]:
+    for line in fp:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_tsv(fp: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Rows of a TSV file with a header line, `genre` is comma separated."""
+    for row in csv.DictReader(fp, delimiter="\t", quoting=csv.QUOTE_NONE):
+        record = {key: None if value == TSV_NULL else value for key, value in row.items()}
+        if record.get("genre") is not None:
+            record["genre"] = record["genre"].split(",")
+        yield record
+
+
+def iter_records(fp: IO[str], fmt: str) -> Iterator[Any]:
+    if fmt == "json":
+        return iter_json_array(fp)
+    if fmt == "jsonl":
+        return iter_jsonl(fp)
+    if fmt == "tsv":
+        return iter_tsv(fp)
+    raise ValueError(f"Unsupported format {fmt!r}, expected one of {FORMATS}")
+
+
+def to_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a parsed record into the columns of `upsert_many`."""
+    if not isinstance(record, dict):
+        raise TypeError(f"Expected an object, got {type(record).__name__}")
+    data = {FIELD_ALIASES.get(key, key): value for key, value in record.items()}
+    return MovieCreate(**data).dict()
+
+
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Checkpoint:
+    """
+    Number of records of a source that are already imported.
+
+    It is written after every committed batch, a run with the same
+    checkpoint file skips that many records. The source size is recorded so
+    a checkpoint isn't applied to a different file.
+    """
+
+    def __init__(self, path: Optional[Path], source: Path):
+        self.path = path
+        self.source = str(source.resolve())
+        self.size = source.stat().st_size
+
+    def load(self) -> int:
+        if not self.path or not self.path.exists():
+            return 0
+        state = json.loads(self.path.read_text())
+        if state.get("source") != self.source or state.get("size") != self.size:
+            logger.warning("Ignoring checkpoint %s, it belongs to another source", self.path)
+            return 0
+        return state["records"]
+
+    def save(self, records: int) -> None:
+        if not self.path:
+            return
+        state = {"source": self.source, "size": self.size, "records": records}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        if self.path and self.path.exists():
+            self.path.unlink()
+
+
+def import_movies(
+    db: Session,
+    path: Path,
+    *,
+    created_by_id: UUID,
+    fmt: Optional[str] = None,
+    batch_size: int = 5_000,
+    checkpoint_path: Optional[Path] = None,
+    copy: bool = True,
+) -> ImportStats:
+    """
+    Upsert the movies of `path` on their natural key `(name, director)`.
+
+    Invalid records are logged and skipped. Re-importing a batch is
+    harmless, so a crash between a commit and the checkpoint write only
+    repeats that batch.
+    """
+    fmt = fmt or detect_format(path)
+    checkpoint = Checkpoint(checkpoint_path, path)
+    done = checkpoint.load()
+    if done:
+        logger.info("Resuming %s after %d records", path, done)
+
+    records, inserted, updated, skipped = done, 0, 0, 0
+    with open(path, newline="" if fmt == "tsv" else None) as fp:
+        for batch in batched(islice(iter_records(fp, fmt), done, None), batch_size):
+            rows = []
+            for offset, record in enumerate(batch, start=records + 1):
+                try:
+                    rows.append(to_row(record))
+                except (ValidationError, TypeError) as e:
+                    skipped += 1
+                    logger.warning("Skipping record %d: %s", offset, e)
+            if rows:
+                batch_inserted, batch_updated = crud.movie.upsert_many(
+                    db, rows=rows, created_by_id=created_by_id, copy=copy
+                )
+                inserted += batch_inserted
+                updated += batch_updated
+            records += len(batch)
+            checkpoint.save(records)
+            logger.info("Imported %d records", records)
+
+    checkpoint.clear()
+    return ImportStats(records=records, inserted=inserted, updated=updated, skipped=skipped)
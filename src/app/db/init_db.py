@@ -2,8 +2,8 @@ from sqlalchemy.orm import Session
 
 from app import crud, schemas
 from app.db import base  # noqa
-from app.models import Movies
-from config import settings
+from app.db.importer import import_movies
+from config import BASE_DIR, settings
 
 
 def init_db(db: Session) -> None:
@@ -22,25 +22,10 @@ def init_db(db: Session) -> None:
             user = crud.user.create(db, obj=user)
 
         # create movies
-        movies = parse_fixture_file("imdb.json")
-        movie_objs = [
-            Movies(
-                name=movie["name"],
-                director=movie["director"],
-                popularity=movie["99popularity"],
-                imdb_score=movie["imdb_score"],
-                genre=movie["genre"],
-                created_by_id=str(user.id),
-            )
-            for movie in movies
-        ]
-        count = crud.movie.bulk_insert(db, objs=movie_objs)
-        print(f"Created {count} movies")
-
-
-def parse_fixture_file(file_name):
-    import json
-    from config import BASE_DIR
-
-    with open(BASE_DIR / "fixtures" / file_name) as f:
-        return json.load(f)
+        stats = import_movies(
+            db,
+            BASE_DIR / "fixtures" / "imdb.json",
+            created_by_id=user.id,
+            batch_size=settings.IMPORT_BATCH_SIZE,
+        )
+        print(f"Created {stats.inserted} movies")
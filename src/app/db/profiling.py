@@ -0,0 +1,157 @@
+"""
+SQL statement profiling built on engine events.
+
+Every statement run on an instrumented engine is timed and recorded twice:
+in the `QueryProfile` of the current request, which `ProfilingMiddleware`
+sends back in a `Server-Timing` header, and in the process wide
+`QueryStats` that the metrics endpoint reports.
+"""
+import threading
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+# distinct statements tracked by `QueryStats`, later ones only count in the totals
+MAX_TRACKED_STATEMENTS = 500
+
+
+class QueryProfile:
+    """Statement count, time and slowest statements of one request."""
+
+    def __init__(self, keep_slowest: int = 3):
+        self.keep_slowest = keep_slowest
+        self.statements = 0
+        self.seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.statements += 1
+        self.seconds += seconds
+        if len(self.slowest) < self.keep_slowest or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[self.keep_slowest:]
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value, durations in milliseconds."""
+        timing = f'db;desc="{self.statements} queries";dur={self.seconds * 1000:.2f}'
+        if self.slowest:
+            timing += f", db-slowest;dur={self.slowest[0][0] * 1000:.2f}"
+        return timing
+
+
+class QueryStats:
+    """Totals and per-statement timings since the process started."""
+
+    def __init__(self, keep_slowest: int = 10):
+        self.keep_slowest = keep_slowest
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.seconds = 0.0
+        # statement -> [count, total seconds, max seconds]
+        self._by_statement: Dict[str, List[float]] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.statements += 1
+            self.seconds += seconds
+            entry = self._by_statement.get(statement)
+            if entry is None:
+                if len(self._by_statement) >= MAX_TRACKED_STATEMENTS:
+                    return
+                entry = self._by_statement[statement] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """The statements with the longest single execution."""
+        with self._lock:
+            entries = sorted(self._by_statement.items(), key=lambda item: item[1][2], reverse=True)
+            return [
+                {
+                    "statement": statement,
+                    "count": int(count),
+                    "seconds_total": total,
+                    "seconds_max": longest,
+                }
+                for statement, (count, total, longest) in entries[: self.keep_slowest]
+            ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = {"statements": self.statements, "seconds_total": self.seconds}
+        return {**totals, "slowest": self.slowest()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.statements = 0
+            self.seconds = 0.0
+            self._by_statement.clear()
+
+
+query_stats = QueryStats(keep_slowest=settings.SQL_SLOWEST_STATEMENTS)
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    seconds = perf_counter() - conn.info["query_started"].pop()
+    query_stats.record(statement, seconds)
+    if (profile := current_profile.get()) is not None:
+        profile.record(statement, seconds)
+
+
+def _handle_error(context) -> None:
+    # the statement failed, `after_cursor_execute` won't pop its start time
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def instrument(engine: Engine) -> Engine:
+    """Record the statements of `engine`, pass `sync_engine` for an async one."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware giving every request a `QueryProfile` and sending it
+    back in a `Server-Timing` header.
+
+    Sync endpoints and dependencies run in the threadpool with a copy of
+    the request context, so they record into the same profile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
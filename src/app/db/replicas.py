@@ -0,0 +1,87 @@
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from app.cache.lru import TTLCache
+
+BALANCING_STRATEGIES = ("round_robin", "least_connections")
+
+
+class ReplicaRouter:
+    """
+    Picks the read replica a session goes to.
+
+    `round_robin` cycles through the replicas, `least_connections` picks the
+    one with the fewest sessions open from this process. Sessions are
+    counted rather than pool connections, so it works with any pool class.
+    """
+
+    def __init__(self, size: int, strategy: str = "round_robin"):
+        if strategy not in BALANCING_STRATEGIES:
+            raise ValueError(
+                f"Unknown balancing strategy {strategy!r}, expected one of {BALANCING_STRATEGIES}"
+            )
+        self.strategy = strategy
+        self.in_use: List[int] = [0] * size
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.in_use)
+
+    def acquire(self) -> int:
+        with self._lock:
+            if self.strategy == "least_connections":
+                # ties go round robin so idle replicas share the load
+                start = next(self._next)
+                order = [(start + i) % len(self.in_use) for i in range(len(self.in_use))]
+                index = min(order, key=self.in_use.__getitem__)
+            else:
+                index = next(self._next) % len(self.in_use)
+            self.in_use[index] += 1
+            return index
+
+    def release(self, index: int) -> None:
+        with self._lock:
+            self.in_use[index] -= 1
+
+    @contextmanager
+    def choose(self) -> Iterator[int]:
+        """Index of the replica to use while the block runs."""
+        index = self.acquire()
+        try:
+            yield index
+        finally:
+            self.release(index)
+
+
+class PrimaryPins:
+    """
+    Clients that wrote recently, their reads go to the primary for a while
+    so they see their own writes despite replication lag.
+
+    Clients are told apart by their `Authorization` header. Pins are per
+    process, like the memory response cache.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self._pins = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _key(authorization: Optional[str]) -> Optional[str]:
+        if not authorization:
+            return None
+        return hashlib.sha1(authorization.encode()).hexdigest()
+
+    def pin(self, authorization: Optional[str]) -> None:
+        if key := self._key(authorization):
+            self._pins.set(key, True)
+
+    def pinned(self, authorization: Optional[str]) -> bool:
+        key = self._key(authorization)
+        return key is not None and key in self._pins
+
+    def clear(self) -> None:
+        self._pins.clear()
@@ -1,12 +1,104 @@
+from typing import Any, Dict
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database
 
-from config import settings
+from app.db.pool import InstrumentedQueuePool
+from app.db.profiling import instrument
+from app.db.replicas import PrimaryPins, ReplicaRouter
+from config import settings, to_async_uri
+
+
+def pool_options() -> Dict[str, Any]:
+    """Pool sizing shared by the sync and async engines."""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def connect_args() -> Dict[str, Any]:
+    if not settings.DB_STATEMENT_TIMEOUT_MS:
+        return {}
+    return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+
+
+def make_engine(uri: str) -> Engine:
+    """
+    An engine with the configured pool and statement timeout, other
+    databases (e.g. SQLite files standing in for replicas) get the defaults.
+    """
+    if make_url(uri).get_backend_name() != "postgresql":
+        return create_engine(uri)
+    return create_engine(
+        uri,
+        poolclass=InstrumentedQueuePool,
+        connect_args=connect_args(),
+        **pool_options(),
+    )
+
 
+def make_async_engine(uri: str) -> AsyncEngine:
+    """Async counterpart of `make_engine`."""
+    if make_url(uri).get_backend_name() != "postgresql":
+        return create_async_engine(uri)
+    return create_async_engine(
+        uri,
+        connect_args=(
+            {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+            if settings.DB_STATEMENT_TIMEOUT_MS
+            else {}
+        ),
+        **pool_options(),
+    )
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-if not database_exists(engine.url):
-    create_database(engine.url)
+
+engine = make_engine(settings.SQLALCHEMY_DATABASE_URI)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# async engine, only created when the async mode is enabled since it needs asyncpg
+async_engine = (
+    make_async_engine(settings.SQLALCHEMY_ASYNC_DATABASE_URI) if settings.ASYNC_DB else None
+)
+AsyncSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_engine,
+    class_=AsyncSession,
+)
+
+# read replicas, sessions are bound to the one `replica_router` picks
+replica_engines = [make_engine(uri) for uri in settings.SQLALCHEMY_REPLICA_URIS]
+async_replica_engines = (
+    [make_async_engine(to_async_uri(uri)) for uri in settings.SQLALCHEMY_REPLICA_URIS]
+    if settings.ASYNC_DB
+    else []
+)
+replica_router = ReplicaRouter(len(replica_engines), settings.DB_REPLICA_BALANCING)
+primary_pins = PrimaryPins(ttl=settings.DB_REPLICA_STICKY_SECONDS)
+
+if settings.SQL_PROFILING:
+    for profiled in (engine, *replica_engines):
+        instrument(profiled)
+    for profiled in (async_engine, *async_replica_engines):
+        if profiled is not None:
+            instrument(profiled.sync_engine)
+
+
+def ensure_database() -> None:
+    """Create the database if it doesn't exist yet, run by `check_db.py` on boot."""
+    if not database_exists(engine.url):
+        create_database(engine.url)
+
+
+def pool_status() -> Dict[str, Any]:
+    """Occupancy and checkout wait times of the sync engine's pool."""
+    return engine.pool.status_dict()
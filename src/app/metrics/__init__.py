@@ -0,0 +1,11 @@
+from .registry import (  # noqa
+    CONTENT_TYPE,
+    Counter,
+    Family,
+    Gauge,
+    Histogram,
+    Registry,
+    Sample,
+    registry,
+)
+from .http import MetricsMiddleware  # noqa
@@ -0,0 +1,88 @@
+"""Figures kept by other modules, read when `/metrics` is scraped."""
+from typing import Any, Dict, Iterable, List
+
+from app.db.profiling import query_stats
+from app.db.session import engine
+from app.metrics.registry import Family, Sample, registry
+from core import password_hasher
+
+# longest statement text exported as a label
+MAX_STATEMENT_LENGTH = 200
+
+
+def _families(prefix: str, stats: Dict[str, Any], fields: Dict[str, tuple]) -> List[Family]:
+    """`fields` maps a key of `stats` to the type and help of its metric."""
+    families = []
+    for key, (name, type_, documentation) in fields.items():
+        if key in stats:
+            name = f"{prefix}_{name}"
+            families.append(Family(name, type_, documentation, [Sample(name, {}, stats[key])]))
+    return families
+
+
+POOL_FIELDS = {
+    "size": ("size", "gauge", "Connections the pool keeps open."),
+    "checked_out": ("checked_out", "gauge", "Connections in use."),
+    "overflow": ("overflow", "gauge", "Connections open beyond the pool size."),
+    "max_overflow": ("max_overflow", "gauge", "Connections allowed beyond the pool size."),
+    "checkouts": ("checkouts_total", "counter", "Connections checked out."),
+    "timeouts": ("timeouts_total", "counter", "Checkouts that timed out waiting."),
+    "wait_seconds_total": ("wait_seconds_total", "counter", "Time spent waiting for a checkout."),
+    "wait_seconds_max": ("wait_seconds_max", "gauge", "Longest wait for a checkout."),
+}
+
+PASSWORD_HASHER_FIELDS = {
+    "workers": ("workers", "gauge", "Threads hashing passwords."),
+    "queue_size": ("queue_size", "gauge", "Operations that may wait for a thread."),
+    "queued": ("queued", "gauge", "Operations waiting for a thread."),
+    "running": ("running", "gauge", "Operations being hashed."),
+    "completed": ("completed_total", "counter", "Operations finished."),
+    "rejected": ("rejected_total", "counter", "Operations rejected with a 429."),
+    "wait_seconds_total": ("wait_seconds_total", "counter", "Time operations waited for a thread."),
+    "hash_seconds_total": ("seconds_total", "counter", "Time spent in bcrypt."),
+    "hash_seconds_max": ("seconds_max", "gauge", "Longest bcrypt operation."),
+}
+
+
+@registry.collector
+def db_pool() -> Iterable[Family]:
+    status_dict = getattr(engine.pool, "status_dict", None)
+    return _families("db_pool", status_dict(), POOL_FIELDS) if status_dict else []
+
+
+@registry.collector
+def password_hashing() -> Iterable[Family]:
+    return _families("password_hash", password_hasher.stats(), PASSWORD_HASHER_FIELDS)
+
+
+@registry.collector
+def sql_statements() -> Iterable[Family]:
+    stats = query_stats.as_dict()
+    slowest = [
+        Sample(
+            "db_statement_seconds_max",
+            {"statement": " ".join(entry["statement"].split())[:MAX_STATEMENT_LENGTH]},
+            entry["seconds_max"],
+        )
+        for entry in stats["slowest"]
+    ]
+    return [
+        Family(
+            "db_statements_total",
+            "counter",
+            "SQL statements run.",
+            [Sample("db_statements_total", {}, stats["statements"])],
+        ),
+        Family(
+            "db_statement_seconds_total",
+            "counter",
+            "Time spent running SQL statements.",
+            [Sample("db_statement_seconds_total", {}, stats["seconds_total"])],
+        ),
+        Family(
+            "db_statement_seconds_max",
+            "gauge",
+            "Longest run of the slowest SQL statements.",
+            slowest,
+        ),
+    ]
@@ -0,0 +1,65 @@
+from time import perf_counter
+
+from app.metrics.registry import registry
+
+# routes not matched are counted under one label, so scans don't add series
+UNMATCHED_ROUTE = "<unmatched>"
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+requests_total = registry.counter(
+    "http_requests_total", "Requests handled.", ("method", "route", "status")
+)
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response.",
+    ("method", "route"),
+)
+response_size = registry.histogram(
+    "http_response_size_bytes", "Size of response bodies.", ("method", "route"), SIZE_BUCKETS
+)
+in_flight = registry.gauge("http_requests_in_flight", "Requests being handled.")
+requests_rejected = registry.counter(
+    "http_requests_rejected_total",
+    "Requests turned away by rate limits or admission control.",
+    ("reason",),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency, status and response size of
+    every request, labelled with the route template (`/movies/{id}/`)
+    rather than the path so ids don't each make a series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_recording(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_recording)
+        finally:
+            in_flight.dec()
+            # the router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            requests_total.labels(method, route, str(status_code)).inc()
+            request_duration.labels(method, route).observe(perf_counter() - started)
+            response_size.labels(method, route).observe(size)
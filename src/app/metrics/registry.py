@@ -0,0 +1,258 @@
+"""
+Counters, gauges and histograms rendered in the Prometheus text format.
+
+Recording must cost next to nothing on the request path, so values are
+sharded per thread: every thread adds to its own list of floats, which no
+other thread writes, and no lock is taken. A scrape sums the shards. The
+only lock is taken the first time a thread records into a metric, or a
+new label combination is seen.
+
+Figures kept elsewhere (the pool, the password hasher, the SQL profiler)
+are read at scrape time by collectors, see `Registry.collector`.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# starlette appends the charset to text types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class Family(NamedTuple):
+    """A metric as it is exported: its samples under one HELP and TYPE."""
+
+    name: str
+    type: str
+    documentation: str
+    samples: List[Sample]
+
+
+class _Shards:
+    """`width` floats summed over the threads that wrote them."""
+
+    def __init__(self, width: int):
+        self.width = width
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def local(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0.0] * self.width
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def sum(self) -> List[float]:
+        totals = [0.0] * self.width
+        for values in tuple(self._shards):
+            for index, value in enumerate(values):
+                totals[index] += value
+        return totals
+
+
+class _CounterValue:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.local()[0] += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._shards.local()[0] -= amount
+
+    def get(self) -> float:
+        return self._shards.sum()[0]
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # one slot per bucket, then +Inf, sum and count
+        self._shards = _Shards(len(buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        values = self._shards.local()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def get(self) -> Tuple[List[float], float, float]:
+        """Cumulative bucket counts including +Inf, the sum and the count."""
+        *counts, total, count = self._shards.sum()
+        cumulative, running = [], 0.0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child metric of one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes the labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self) -> Iterable[Tuple[Dict[str, str], object]]:
+        for values, child in tuple(self._children.items()):
+            yield dict(zip(self.labelnames, values)), child
+
+    def collect(self) -> Family:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def collect(self) -> Family:
+        samples = [Sample(self.name, labels, child.get()) for labels, child in self._items()]
+        return Family(self.name, self.type, self.documentation, samples)
+
+
+class Gauge(Counter):
+    """A counter that also goes down, e.g. requests in flight."""
+
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def collect(self) -> Family:
+        samples = []
+        for labels, child in self._items():
+            cumulative, total, count = child.get()
+            for bound, bucket_count in zip((*self.buckets, math.inf), cumulative):
+                bucket_labels = {**labels, "le": _format_value(bound)}
+                samples.append(Sample(f"{self.name}_bucket", bucket_labels, bucket_count))
+            samples.append(Sample(f"{self.name}_sum", labels, total))
+            samples.append(Sample(f"{self.name}_count", labels, count))
+        return Family(self.name, self.type, self.documentation, samples)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Family]]) -> Callable[[], Iterable[Family]]:
+        """Register `fn` to produce families at scrape time, usable as a decorator."""
+        self._collectors.append(fn)
+        return fn
+
+    def collect(self) -> List[Family]:
+        families = [metric.collect() for metric in self._metrics.values()]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        return render(self.collect())
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str, label: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if label else value
+
+
+def render(families: Iterable[Family]) -> str:
+    lines: List[str] = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {_escape(family.documentation, label=False)}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for sample in family.samples:
+            labels = ",".join(
+                f'{key}="{_escape(str(value))}"' for key, value in sample.labels.items()
+            )
+            name = f"{sample.name}{{{labels}}}" if labels else sample.name
+            lines.append(f"{name} {_format_value(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -1,2 +1,3 @@
 from .movies import Movies  # noqa
 from .user import User  # noqa
+from .stats import movie_director_stats, movie_genre_stats, movie_genres  # noqa
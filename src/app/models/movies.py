@@ -1,12 +1,54 @@
-from sqlalchemy import Column, String, ForeignKey, Float
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-from sqlalchemy.orm import relationship
+from typing import Iterable, List
+
+from sqlalchemy import DDL, Column, Computed, String, ForeignKey, Float, Index, event
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, TSVECTOR
+from sqlalchemy.orm import deferred, relationship, validates
 
 from app.db.base_class import Base
 
+# weighted document used for ranked full-text search, name hits rank above
+# director hits. Kept in sync with the `search_vector` migration.
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(director, '')), 'B')"
+)
+
+
+def normalize_genre(genre: str) -> str:
+    """Canonical spelling of a genre, e.g. `" Sci-Fi "` -> `"Sci-Fi"`."""
+    return " ".join(genre.split())
+
+
+def normalize_genres(genres: Iterable[str]) -> List[str]:
+    """Normalize, drop empty and de-duplicate genres keeping their order."""
+    normalized = (normalize_genre(genre) for genre in genres)
+    return list(dict.fromkeys(genre for genre in normalized if genre))
+
 
 class Movies(Base):
     __tablename__ = "movies"
+    __table_args__ = (
+        # keyset pagination indexes, see `app.crud.pagination`
+        Index("ix_movies_created_at_id", "created_at", "id"),
+        Index("ix_movies_imdb_score_id", "imdb_score", "id"),
+        Index("ix_movies_popularity_id", "popularity", "id"),
+        Index("ix_movies_created_by_id_created_at_id", "created_by_id", "created_at", "id"),
+        Index("ix_movies_genre", "genre", postgresql_using="gin"),
+        # search indexes, the trigram ones serve the `ILIKE` filters
+        Index("ix_movies_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_movies_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_movies_director_trgm",
+            "director",
+            postgresql_using="gin",
+            postgresql_ops={"director": "gin_trgm_ops"},
+        ),
+    )
 
     name = Column(String, index=True, nullable=False)
     director = Column(String, nullable=False)
@@ -15,3 +57,18 @@ class Movies(Base):
     genre = Column(ARRAY(String), nullable=False)
     created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     created_by = relationship("User", back_populates="movies")
+    search_vector = deferred(
+        Column(TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True))
+    )
+
+    @validates("genre")
+    def validate_genre(self, key, genre):
+        return normalize_genres(genre)
+
+
+# the trigram indexes need pg_trgm, make sure it exists for `create_all` too
+event.listen(
+    Movies.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
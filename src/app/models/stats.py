@@ -0,0 +1,189 @@
+from sqlalchemy import DDL, BigInteger, Column, Float, ForeignKey, Index, String, Table, event
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base_class import Base
+
+# Aggregates over `movies`, kept current by the `movies_stats_*` triggers
+# so every write path (ORM, bulk statements, the importer) updates
+# them in the same transaction. Averages are stored so rankings can use an
+# index, the sums let them be adjusted incrementally.
+movie_genre_stats = Table(
+    "movie_genre_stats",
+    Base.metadata,
+    Column("genre", String, primary_key=True),
+    Column("movie_count", BigInteger, nullable=False),
+    Column("imdb_score_sum", Float, nullable=False),
+    Column("popularity_sum", Float, nullable=False),
+    Column("popularity_count", BigInteger, nullable=False),
+    Column("avg_imdb_score", Float),
+    Index("ix_movie_genre_stats_movie_count", "movie_count", "genre"),
+)
+
+movie_director_stats = Table(
+    "movie_director_stats",
+    Base.metadata,
+    Column("director", String, primary_key=True),
+    Column("movie_count", BigInteger, nullable=False),
+    Column("imdb_score_sum", Float, nullable=False),
+    Column("popularity_sum", Float, nullable=False),
+    Column("popularity_count", BigInteger, nullable=False),
+    Column("avg_imdb_score", Float),
+    Index("ix_movie_director_stats_avg_imdb_score", "avg_imdb_score", "director"),
+    Index("ix_movie_director_stats_movie_count", "movie_count", "director"),
+)
+
+# one row per (genre, movie), top rated per genre is a range scan of its index
+movie_genres = Table(
+    "movie_genres",
+    Base.metadata,
+    Column("genre", String, primary_key=True),
+    Column(
+        "movie_id",
+        UUID(as_uuid=True),
+        ForeignKey("movies.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("imdb_score", Float, nullable=False),
+    Index("ix_movie_genres_genre_imdb_score", "genre", "imdb_score", "movie_id"),
+)
+
+# Kept in sync with the `movie_stats` migration, which has its own frozen
+# copy. No `%` in here, DDL statements are %-formatted. Changes are passed
+# as `movie_stats_change` values rather than `movies` rows so the function
+# doesn't keep the table from being dropped.
+#
+# The triggers run once per statement with its transition tables, so a
+# batch of the importer takes each genre and director row once, and the
+# upserts take them in key order so concurrent writers can't deadlock on
+# each other's rows. Transition tables rule out one trigger for several
+# events or an `UPDATE OF` column list, updates that leave the aggregated
+# columns alone are filtered out in the function instead.
+STATS_TRIGGER = """
+DROP TYPE IF EXISTS movie_stats_change CASCADE;
+CREATE TYPE movie_stats_change AS (
+    id uuid, director varchar, genre varchar[], imdb_score float, popularity float,
+    delta integer
+);
+
+CREATE OR REPLACE FUNCTION movie_stats_apply(changes movie_stats_change[]) RETURNS void AS $$
+BEGIN
+    IF cardinality(changes) = 0 THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO movie_director_stats AS s
+        (director, movie_count, imdb_score_sum, popularity_sum, popularity_count, avg_imdb_score)
+    SELECT
+        director, movie_count, imdb_score_sum, popularity_sum, popularity_count,
+        imdb_score_sum / nullif(movie_count, 0)
+    FROM (
+        SELECT
+            director,
+            sum(delta) AS movie_count,
+            sum(delta * imdb_score) AS imdb_score_sum,
+            sum(delta * coalesce(popularity, 0)) AS popularity_sum,
+            sum(CASE WHEN popularity IS NULL THEN 0 ELSE delta END) AS popularity_count
+        FROM unnest(changes)
+        GROUP BY director
+    ) AS d
+    WHERE (movie_count, imdb_score_sum, popularity_sum, popularity_count) <> (0, 0, 0, 0)
+    ORDER BY director
+    ON CONFLICT (director) DO UPDATE SET
+        movie_count = s.movie_count + excluded.movie_count,
+        imdb_score_sum = s.imdb_score_sum + excluded.imdb_score_sum,
+        popularity_sum = s.popularity_sum + excluded.popularity_sum,
+        popularity_count = s.popularity_count + excluded.popularity_count,
+        avg_imdb_score = (s.imdb_score_sum + excluded.imdb_score_sum)
+            / nullif(s.movie_count + excluded.movie_count, 0);
+
+    INSERT INTO movie_genre_stats AS s
+        (genre, movie_count, imdb_score_sum, popularity_sum, popularity_count, avg_imdb_score)
+    SELECT
+        genre, movie_count, imdb_score_sum, popularity_sum, popularity_count,
+        imdb_score_sum / nullif(movie_count, 0)
+    FROM (
+        SELECT
+            g.genre,
+            sum(c.delta) AS movie_count,
+            sum(c.delta * c.imdb_score) AS imdb_score_sum,
+            sum(c.delta * coalesce(c.popularity, 0)) AS popularity_sum,
+            sum(CASE WHEN c.popularity IS NULL THEN 0 ELSE c.delta END) AS popularity_count
+        FROM unnest(changes) AS c
+        CROSS JOIN LATERAL (SELECT DISTINCT unnest(c.genre) AS genre) AS g
+        GROUP BY g.genre
+    ) AS d
+    WHERE (movie_count, imdb_score_sum, popularity_sum, popularity_count) <> (0, 0, 0, 0)
+    ORDER BY genre
+    ON CONFLICT (genre) DO UPDATE SET
+        movie_count = s.movie_count + excluded.movie_count,
+        imdb_score_sum = s.imdb_score_sum + excluded.imdb_score_sum,
+        popularity_sum = s.popularity_sum + excluded.popularity_sum,
+        popularity_count = s.popularity_count + excluded.popularity_count,
+        avg_imdb_score = (s.imdb_score_sum + excluded.imdb_score_sum)
+            / nullif(s.movie_count + excluded.movie_count, 0);
+
+    DELETE FROM movie_genres
+    WHERE movie_id IN (SELECT id FROM unnest(changes) WHERE delta < 0);
+    INSERT INTO movie_genres (genre, movie_id, imdb_score)
+    SELECT DISTINCT unnest(genre), id, imdb_score FROM unnest(changes) WHERE delta > 0;
+
+    DELETE FROM movie_director_stats
+    WHERE movie_count <= 0
+        AND director IN (SELECT director FROM unnest(changes) WHERE delta < 0);
+    DELETE FROM movie_genre_stats
+    WHERE movie_count <= 0
+        AND genre IN (SELECT unnest(genre) FROM unnest(changes) WHERE delta < 0);
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION movies_stats_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM movie_stats_apply(ARRAY(
+            SELECT (id, director, genre, imdb_score, popularity, 1)::movie_stats_change
+            FROM new_rows
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM movie_stats_apply(ARRAY(
+            SELECT (id, director, genre, imdb_score, popularity, -1)::movie_stats_change
+            FROM old_rows
+        ));
+    ELSE
+        PERFORM movie_stats_apply(ARRAY(
+            SELECT (c.id, c.director, c.genre, c.imdb_score, c.popularity, c.delta)::movie_stats_change
+            FROM old_rows AS o
+            JOIN new_rows AS n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES
+                (o.id, o.director, o.genre, o.imdb_score, o.popularity, -1),
+                (n.id, n.director, n.genre, n.imdb_score, n.popularity, 1)
+            ) AS c (id, director, genre, imdb_score, popularity, delta)
+            WHERE (o.director, o.genre, o.imdb_score, o.popularity)
+                IS DISTINCT FROM (n.director, n.genre, n.imdb_score, n.popularity)
+        ));
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS movies_stats_insert ON movies;
+CREATE TRIGGER movies_stats_insert
+    AFTER INSERT ON movies REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE movies_stats_trigger();
+
+DROP TRIGGER IF EXISTS movies_stats_update ON movies;
+CREATE TRIGGER movies_stats_update
+    AFTER UPDATE ON movies REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE movies_stats_trigger();
+
+DROP TRIGGER IF EXISTS movies_stats_delete ON movies;
+CREATE TRIGGER movies_stats_delete
+    AFTER DELETE ON movies REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE movies_stats_trigger();
+"""
+
+# `movie_genres` references `movies`, so it's created after it
+event.listen(
+    movie_genres,
+    "after_create",
+    DDL(STATS_TRIGGER).execute_if(dialect="postgresql"),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, String
+from sqlalchemy import Boolean, Column, Index, String
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -6,6 +6,7 @@ from app.db.base_class import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     full_name = Column(String, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
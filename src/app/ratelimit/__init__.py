@@ -0,0 +1,9 @@
+from .limiters import (  # noqa
+    Decision,
+    Limiter,
+    MemoryLimiter,
+    RateLimit,
+    RespLimiter,
+    get_limiter,
+)
+from .admission import AdmissionController, AdmissionMiddleware  # noqa
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.metrics.http import requests_rejected
+
+
+class AdmissionController:
+    """
+    Caps the requests a worker handles at once.
+
+    Up to `max_concurrency` requests run, the next `queue_size` wait at most
+    `queue_timeout` seconds for a slot and anything beyond is rejected right
+    away. Shedding load early keeps the requests that do run fast, instead
+    of every request queueing behind the threadpool and the DB pool.
+    """
+
+    def __init__(self, max_concurrency: int, queue_size: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        # created on first use, inside the event loop
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        """Take a slot, False when the request has to be shed."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        if self._slots.locked():
+            if self.waiting >= self.queue_size:
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        return True
+
+    def release(self) -> None:
+        self._slots.release()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware answering 503 with `Retry-After` when the
+    `AdmissionController` sheds a request. `exempt` paths (liveness,
+    metrics) are always let through.
+    """
+
+    def __init__(self, app, controller: AdmissionController, exempt: Tuple[str, ...] = ()):
+        self.app = app
+        self.controller = controller
+        self.exempt = exempt
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        if not await self.controller.acquire():
+            requests_rejected.labels("overload").inc()
+            response = JSONResponse(
+                {"detail": "Server is overloaded, try again later"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,243 @@
+"""
+Token bucket and sliding window rate limits.
+
+A `RateLimit` rule says how many requests a client may make per period and
+how clients are told apart (`by` IP, user and/or route). The counting is
+done by a backend: `MemoryLimiter` per worker process, or `RespLimiter` on
+a server speaking the Redis protocol, shared by every worker. The shared
+one runs each check as a Lua script so concurrent workers can't both take
+the last token.
+"""
+import logging
+import math
+import threading
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from app.cache.lru import TTLCache
+from app.cache.resp import RespClient, RespError
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("token_bucket", "sliding_window")
+KEY_PARTS = ("ip", "user", "route")
+
+
+class RateLimit:
+    """
+    At most `limit` requests per `period` seconds for every client.
+
+    `token_bucket` allows bursts of `limit` requests and refills steadily,
+    `sliding_window` weighs the previous fixed window by how much of it is
+    still within `period` of now, which smooths the burst at window edges.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        limit: int,
+        period: float,
+        by: Tuple[str, ...] = ("ip",),
+        algorithm: str = "token_bucket",
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(
+                f"Unknown rate limit algorithm {algorithm!r}, expected one of {ALGORITHMS}"
+            )
+        if unknown := set(by) - set(KEY_PARTS):
+            raise ValueError(
+                f"Unknown rate limit key parts {sorted(unknown)}, expected some of {KEY_PARTS}"
+            )
+        if limit < 1 or period <= 0:
+            raise ValueError("A rate limit needs a positive limit and period")
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.by = tuple(by)
+        self.algorithm = algorithm
+
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second."""
+        return self.limit / self.period
+
+    def __repr__(self) -> str:
+        return f"RateLimit({self.name!r}, {self.limit}/{self.period:g}s by {'+'.join(self.by)})"
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    # seconds until the next request would be allowed, 0 when allowed
+    retry_after: float
+
+
+def _token_bucket(rule: RateLimit, tokens: float, allowed: bool) -> Decision:
+    """Decision from the tokens left after the check."""
+    if allowed:
+        return Decision(True, int(tokens), 0.0)
+    return Decision(False, 0, (1 - tokens) / rule.rate)
+
+
+def _sliding_window(
+    rule: RateLimit, elapsed: float, current: int, previous: int, allowed: bool
+) -> Decision:
+    """
+    Decision from the counts of the current and previous fixed windows,
+    `elapsed` being the fraction of the current window gone by.
+    """
+    estimate = previous * (1 - elapsed) + current
+    if allowed:
+        return Decision(True, max(0, int(rule.limit - estimate)), 0.0)
+    if current + 1 > rule.limit or not previous:
+        # only the next window has room
+        return Decision(False, 0, (1 - elapsed) * rule.period)
+    # the previous window's weight has to drop until one more request fits
+    needed = 1 - (rule.limit - 1 - current) / previous
+    return Decision(False, 0, max(0.0, needed - elapsed) * rule.period)
+
+
+class Limiter:
+    def hit(self, rule: RateLimit, key: str) -> Decision:
+        """Count one request of the client `key` against `rule`."""
+        if rule.algorithm == "token_bucket":
+            return self.token_bucket(rule, key, time.time())
+        return self.sliding_window(rule, key, time.time())
+
+    def token_bucket(self, rule: RateLimit, key: str, now: float) -> Decision:
+        raise NotImplementedError
+
+    def sliding_window(self, rule: RateLimit, key: str, now: float) -> Decision:
+        raise NotImplementedError
+
+
+class MemoryLimiter(Limiter):
+    """Per-process counts, each worker allows the full limit on its own."""
+
+    def __init__(self, maxsize: int):
+        # key -> (tokens, updated) or (window, current, previous)
+        self._state = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def token_bucket(self, rule: RateLimit, key: str, now: float) -> Decision:
+        key = f"{rule.name}:{key}"
+        with self._lock:
+            tokens, updated = self._state.get(key) or (rule.limit, now)
+            tokens = min(rule.limit, tokens + max(0.0, now - updated) * rule.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._state.set(key, (tokens, now), ttl=rule.period)
+        return _token_bucket(rule, tokens, allowed)
+
+    def sliding_window(self, rule: RateLimit, key: str, now: float) -> Decision:
+        key = f"{rule.name}:{key}"
+        window, elapsed = divmod(now / rule.period, 1)
+        with self._lock:
+            state_window, current, previous = self._state.get(key) or (window, 0, 0)
+            if window == state_window + 1:
+                current, previous = 0, current
+            elif window != state_window:
+                current, previous = 0, 0
+            allowed = previous * (1 - elapsed) + current + 1 <= rule.limit
+            if allowed:
+                current += 1
+            self._state.set(key, (window, current, previous), ttl=2 * rule.period)
+        return _sliding_window(rule, elapsed, current, previous, allowed)
+
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+# KEYS[1] counts the current fixed window, KEYS[2] the previous one
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local weight = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local current = tonumber(redis.call("GET", KEYS[1]) or "0")
+local previous = tonumber(redis.call("GET", KEYS[2]) or "0")
+if previous * weight + current + 1 > limit then
+    return {0, current, previous}
+end
+current = redis.call("INCR", KEYS[1])
+redis.call("PEXPIRE", KEYS[1], ttl)
+return {1, current, previous}
+"""
+
+
+class RespLimiter(Limiter):
+    """
+    Counts shared by every worker on a Redis protocol server.
+
+    When the server can't be reached requests are let through, like the
+    response cache treats errors as misses, a limiter outage must not
+    become an API outage.
+    """
+
+    def __init__(self, url: str):
+        self.client = RespClient(url)
+
+    def _eval(self, script: str, keys: Tuple[str, ...], *args) -> Optional[list]:
+        try:
+            return self.client.execute("EVAL", script, len(keys), *keys, *args)
+        except RespError as e:
+            logger.warning("Rate limit check failed, allowing the request: %s", e)
+            return None
+
+    def token_bucket(self, rule: RateLimit, key: str, now: float) -> Decision:
+        reply = self._eval(
+            TOKEN_BUCKET_SCRIPT, (f"ratelimit:{rule.name}:{key}",), rule.limit, rule.rate, now
+        )
+        if reply is None:
+            return Decision(True, rule.limit, 0.0)
+        allowed, tokens = reply
+        return _token_bucket(rule, float(tokens), bool(allowed))
+
+    def sliding_window(self, rule: RateLimit, key: str, now: float) -> Decision:
+        window, elapsed = divmod(now / rule.period, 1)
+        prefix = f"ratelimit:{rule.name}:{key}"
+        reply = self._eval(
+            SLIDING_WINDOW_SCRIPT,
+            (f"{prefix}:{int(window)}", f"{prefix}:{int(window) - 1}"),
+            rule.limit,
+            1 - elapsed,
+            math.ceil(2 * rule.period * 1000),
+        )
+        if reply is None:
+            return Decision(True, rule.limit, 0.0)
+        allowed, current, previous = reply
+        return _sliding_window(rule, elapsed, int(current), int(previous), bool(allowed))
+
+
+def get_limiter(name: str, *, url: str, maxsize: int) -> Optional[Limiter]:
+    """Limiter for the `RATE_LIMIT_BACKEND` setting, `None` when rate limiting is off."""
+    if name == "memory":
+        return MemoryLimiter(maxsize=maxsize)
+    if name == "redis":
+        return RespLimiter(url)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown rate limit backend {name!r}")
+
+
+# None when RATE_LIMIT_BACKEND is "none", the rules are then not enforced
+rate_limiter = get_limiter(
+    settings.RATE_LIMIT_BACKEND, url=settings.RATE_LIMIT_URL, maxsize=settings.RATE_LIMIT_SIZE
+)
@@ -1,3 +1,13 @@
-from .movies import Movie, MovieCreate, MovieUpdate, MovieInDB
+from .movies import (
+    Movie,
+    MovieBulkCreate,
+    MovieBulkDelete,
+    MovieBulkUpdate,
+    MovieBulkUpdateItem,
+    MovieCreate,
+    MovieInDB,
+    MovieUpdate,
+)
+from .stats import DirectorStats, GenreStats
 from .token import Token, TokenPayload
-from .user import User, UserCreate, UserInDB, UserUpdate
+from .user import User, UserCreate, UserInDB, UserPrincipal, UserUpdate
@@ -1,9 +1,12 @@
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist, validator
 from pydantic.schema import datetime
 from pydantic.types import UUID
 
+# upper bound of items in one bulk request
+MAX_BULK_ITEMS = 1000
+
 
 # Shared properties
 class MovieBase(BaseModel):
@@ -28,6 +31,29 @@ class MovieUpdate(BaseModel):
     genre: Optional[list[str]] = None
 
 
+# Properties to receive on bulk requests
+class MovieBulkCreate(BaseModel):
+    items: conlist(MovieCreate, min_items=1, max_items=MAX_BULK_ITEMS)
+
+
+class MovieBulkUpdateItem(MovieUpdate):
+    id: UUID
+
+
+class MovieBulkUpdate(BaseModel):
+    items: conlist(MovieBulkUpdateItem, min_items=1, max_items=MAX_BULK_ITEMS)
+
+    @validator("items")
+    def unique_ids(cls, items):
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("each movie can only be updated once per request")
+        return items
+
+
+class MovieBulkDelete(BaseModel):
+    ids: conlist(UUID, min_items=1, max_items=MAX_BULK_ITEMS)
+
+
 # Properties shared by models stored in DB
 class MovieInDBBase(MovieBase):
     id: UUID
@@ -0,0 +1,22 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+# Properties shared by the aggregates
+class MovieStatsBase(BaseModel):
+    movie_count: int
+    avg_imdb_score: Optional[float]
+    avg_popularity: Optional[float]
+
+    class Config:
+        orm_mode = True
+
+
+# Properties to return to client
+class GenreStats(MovieStatsBase):
+    genre: str
+
+
+class DirectorStats(MovieStatsBase):
+    director: str
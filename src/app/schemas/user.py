@@ -41,3 +41,14 @@ class User(UserInDBBase):
 # Additional properties stored in DB
 class UserInDB(UserInDBBase):
     hashed_password: str
+
+
+# Lightweight view of the authenticated user, cached per access token
+class UserPrincipal(BaseModel):
+    id: UUID
+    is_active: bool
+    is_admin: bool
+
+    class Config:
+        orm_mode = True
+        allow_mutation = False
@@ -0,0 +1 @@
+from .index import InMemorySearchIndex, search_index, tokenize  # noqa
@@ -0,0 +1,164 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic.types import UUID
+
+from config import settings
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# same weighting as the `search_vector` column: name hits beat director hits
+NAME_WEIGHT = 1.0
+DIRECTOR_WEIGHT = 0.4
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InMemorySearchIndex:
+    """
+    In-process inverted index over movie names and directors.
+
+    Used as the search backend when the database isn't Postgres (or when
+    `settings.SEARCH_BACKEND` is "memory"). Each query token is treated as a
+    prefix, resolved against a sorted vocabulary with binary search, and the
+    posting lists are intersected, so lookups touch only the matching terms
+    instead of every row.
+
+    The index is built lazily from the database on first use and then kept
+    current by `CRUDMovie` write hooks. Like the catalogue snapshot it is
+    tagged with the movie listing version it was built at, writes made by
+    other workers bump that version and `refresh` rebuilds it, `max_age`
+    bounds how stale it gets when the version doesn't tell. It is per
+    process, so it is only suitable for single worker deployments and tests.
+    """
+
+    def __init__(self, max_age: float = 60.0) -> None:
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._postings: Dict[str, Dict[UUID, float]] = defaultdict(dict)
+        self._docs: Dict[UUID, List[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self.built = False
+        self.version: Optional[int] = None
+        self.built_at = 0.0
+
+    def build(self, rows: Iterable[Tuple[UUID, str, str]], version: int = 0) -> None:
+        with self._lock:
+            self.clear()
+            for id_, name, director in rows:
+                self._add(id_, name, director)
+            self.built = True
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def is_current(self, version: int) -> bool:
+        return (
+            self.built
+            and self.version == version
+            and time.monotonic() - self.built_at < self.max_age
+        )
+
+    def refresh(self, version: int, load: Callable[[], Iterable[Tuple[UUID, str, str]]]) -> None:
+        """Rebuild from `load()` unless current at `version`, one caller at a time."""
+        with self._refresh_lock:
+            if not self.is_current(version):
+                self.build(load(), version)
+
+    def advance(self, version: Optional[int]) -> None:
+        """
+        Move to `version` once this process's own write is patched in, only
+        when it directly follows the version the index is at, otherwise
+        another worker wrote too and the next `refresh` rebuilds.
+        """
+        with self._lock:
+            if version is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._vocabulary = []
+            self._vocabulary_dirty = False
+            self.built = False
+            self.version = None
+
+    def add(self, id_: UUID, name: str, director: str) -> None:
+        if not self.built:
+            return
+        with self._lock:
+            self._remove(id_)
+            self._add(id_, name, director)
+
+    def remove(self, id_: UUID) -> None:
+        if not self.built:
+            return
+        with self._lock:
+            self._remove(id_)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[UUID, float]]:
+        """Return `(id, score)` pairs for documents matching every query token."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            scores: Optional[Dict[UUID, float]] = None
+            for token in tokens:
+                matches: Dict[UUID, float] = {}
+                for term in self._expand(token):
+                    for id_, weight in self._postings[term].items():
+                        matches[id_] = max(matches.get(id_, 0.0), weight)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {id_: s + matches[id_] for id_, s in scores.items() if id_ in matches}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+        return ranked[:limit] if limit is not None else ranked
+
+    def _add(self, id_: UUID, name: str, director: str) -> None:
+        terms: Dict[str, float] = {}
+        for token in tokenize(director):
+            terms[token] = max(terms.get(token, 0.0), DIRECTOR_WEIGHT)
+        for token in tokenize(name):
+            terms[token] = max(terms.get(token, 0.0), NAME_WEIGHT)
+        for term, weight in terms.items():
+            if term not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[term][id_] = weight
+        self._docs[id_] = list(terms)
+
+    def _remove(self, id_: UUID) -> None:
+        for term in self._docs.pop(id_, []):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(id_, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+
+search_index = InMemorySearchIndex(max_age=settings.SEARCH_INDEX_MAX_AGE_SECONDS)
@@ -1,14 +1,18 @@
-from typing import Dict, Generator, Tuple
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, ContextManager, Dict, Generator, Tuple
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy_utils import database_exists, create_database
 
 from app import models
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db
 from app.db.base_class import Base
+from app.db.profiling import instrument, query_stats
+from app.ratelimit import limiters
 from app.tests.utils import (
     get_admin_token_headers,
     get_user_token_headers,
@@ -16,13 +20,17 @@ from app.tests.utils import (
     create_random_movie,
     create_random_movies,
 )
-from config import settings
+from config import settings, to_async_uri
 from main import app
 
 engine = create_engine(settings.SQLALCHEMY_TEST_DATABASE_URI)
 if not database_exists(engine.url):
     create_database(engine.url)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# the app runs on the test session, its statements are counted for `query_budget`
+instrument(engine)
+# every test client comes from the same address, see test_ratelimit for the limits
+limiters.rate_limiter = None
 
 
 @pytest.fixture(scope="session")
@@ -53,16 +61,65 @@ def db() -> Generator:
     connection.close()
 
 
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def async_db(db) -> AsyncGenerator:
+    # depends on `db` so the tables exist, data is isolated the same way
+    async_engine = create_async_engine(to_async_uri(settings.SQLALCHEMY_TEST_DATABASE_URI))
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(bind=connection, expire_on_commit=False)
+        nested = await connection.begin_nested()
+
+        @event.listens_for(session.sync_session, "after_transaction_end")
+        def end_savepoint(session, transaction):
+            nonlocal nested
+            if not nested.is_active:
+                nested = connection.sync_connection.begin_nested()
+
+        yield session
+
+        await session.close()
+        await transaction.rollback()
+    await async_engine.dispose()
+
+
 @pytest.fixture(scope="module")
 def client(db) -> Generator:
     def override_get_db():
         yield db
 
+    # reads share the session too, so they see the uncommitted test data
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     yield TestClient(app)
+    del app.dependency_overrides[get_read_db]
     del app.dependency_overrides[get_db]
 
 
+@pytest.fixture
+def query_budget() -> Callable[[int], ContextManager[None]]:
+    """
+    Fails the test when the block runs more than `statements` SQL statements:
+
+        with query_budget(2):
+            client.get(url, headers=headers)
+    """
+
+    @contextmanager
+    def budget(statements: int) -> Generator:
+        before = query_stats.statements
+        yield
+        issued = query_stats.statements - before
+        assert issued <= statements, f"{issued} SQL statements, the budget is {statements}"
+
+    return budget
+
+
 @pytest.fixture(scope="module")
 def admin_token_headers(client: TestClient, db: Session) -> Dict[str, str]:
     return get_admin_token_headers(db=db, client=client)
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.schemas import MovieCreate, UserCreate
+from app.tests.utils import random_email, random_lower_string
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_admin(db: AsyncSession):
+    user = UserCreate(email=random_email(), password=random_lower_string(), full_name=random_lower_string())
+    return await crud.user_async.create(db, obj=user, is_admin=True)
+
+
+async def create_movie(db: AsyncSession, created_by_id, **kwargs):
+    movie_obj = MovieCreate(
+        name=kwargs.get("name", random_lower_string()),
+        director=kwargs.get("director", random_lower_string()),
+        imdb_score=kwargs.get("imdb_score", 8.0),
+        genre=kwargs.get("genre", [" Drama", "Action"]),
+    )
+    return await crud.movie_async.create_with_owner(db, obj=movie_obj, created_by_id=created_by_id)
+
+
+class TestAsyncCRUDUser:
+    async def test_create_and_authenticate(self, async_db: AsyncSession):
+        # GIVEN
+        email = random_email()
+        password = random_lower_string()
+        user = UserCreate(email=email, password=password, full_name=random_lower_string())
+
+        # WHEN
+        user_obj = await crud.user_async.create(async_db, obj=user)
+
+        # THEN
+        assert await crud.user_async.get_by_email(async_db, email=email) == user_obj
+        assert await crud.user_async.authenticate(async_db, email=email, password=password)
+        assert await crud.user_async.authenticate(async_db, email=email, password="wrong") is None
+        assert crud.user_async.is_admin(user_obj) is False
+
+
+class TestAsyncCRUDMovie:
+    async def test_create_get_update_remove(self, async_db: AsyncSession):
+        # GIVEN
+        admin = await create_admin(async_db)
+        movie = await create_movie(async_db, admin.id)
+
+        # WHEN
+        fetched = await crud.movie_async.get(async_db, id=movie.id)
+        updated = await crud.movie_async.update(async_db, db_obj=fetched, data={"name": "Interstellar"})
+        await crud.movie_async.remove(async_db, id=movie.id)
+
+        # THEN
+        assert fetched.genre == ["Drama", "Action"]
+        assert updated.name == "Interstellar"
+        assert await crud.movie_async.get(async_db, id=movie.id) is None
+
+    async def test_paginate_with_filter(self, async_db: AsyncSession):
+        # GIVEN
+        admin = await create_admin(async_db)
+        genre = random_lower_string()
+        for score in (7.0, 8.0, 9.0):
+            await create_movie(async_db, admin.id, imdb_score=score, genre=[genre])
+        statement = crud.movie_async.filter(crud.movie_async.get_base_query(), q={"genre": genre})
+
+        # WHEN
+        first = await crud.movie_async.paginate(async_db, statement, limit=2, sort="-imdb_score")
+        second = await crud.movie_async.paginate(
+            async_db, statement, limit=2, sort="-imdb_score", cursor=first.next_cursor
+        )
+
+        # THEN
+        assert [m.imdb_score for m in first.items] == [9.0, 8.0]
+        assert [m.imdb_score for m in second.items] == [7.0]
+        assert second.next_cursor is None
@@ -0,0 +1,232 @@
+import socketserver
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.cache import TTLCache, tokens
+from app.cache.backends import MemoryBackend, RedisBackend, cache_errors
+from app.cache.responses import MOVIES_DETAIL, MOVIES_LIST, CachedResponse, ResponseCache
+from app.schemas import UserPrincipal
+
+
+class TestTTLCache:
+    def test_get_and_set(self):
+        # GIVEN
+        cache = TTLCache(maxsize=2, ttl=60)
+
+        # WHEN
+        cache.set("a", 1)
+
+        # THEN
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert "a" in cache
+
+    def test_evicts_least_recently_used(self):
+        # GIVEN
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        # WHEN
+        cache.get("a")
+        cache.set("c", 3)
+
+        # THEN
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_entries_expire(self):
+        # GIVEN
+        cache = TTLCache(maxsize=2, ttl=60)
+
+        # WHEN
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+
+        # THEN
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_discard_where(self):
+        # GIVEN
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 1)
+
+        # WHEN
+        removed = cache.discard_where(lambda value: value == 1)
+
+        # THEN
+        assert removed == 2
+        assert list(key for key in "abc" if key in cache) == ["b"]
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Tiny in-memory server speaking enough RESP for `RedisBackend`."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        self.store = {}
+        super().__init__(("127.0.0.1", 0), RespStandInHandler)
+
+
+class RespStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while line := self.rfile.readline():
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command, *rest = args
+            store = self.server.store
+            if command == b"GET":
+                value = store.get(rest[0])
+                self.wfile.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif command == b"SET":
+                store[rest[0]] = rest[1]
+                self.wfile.write(b"+OK\r\n")
+            elif command == b"DEL":
+                self.wfile.write(b":%d\r\n" % (store.pop(rest[0], None) is not None))
+            elif command == b"INCR":
+                store[rest[0]] = b"%d" % (int(store.get(rest[0], 0)) + 1)
+                self.wfile.write(b":%s\r\n" % store[rest[0]])
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+@pytest.fixture
+def resp_server():
+    server = RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestResponseCache:
+    def test_bump_invalidates_namespace(self):
+        # GIVEN
+        cache = ResponseCache(MemoryBackend(maxsize=10), ttl=60)
+        key = cache.key(MOVIES_LIST, {"offset": 0})
+        cache.set(key, CachedResponse(b"[]", {"X-Next-Cursor": "abc"}))
+
+        # WHEN
+        cached = cache.get(key)
+        cache.invalidate_movies(bulk=True)
+
+        # THEN
+        assert cached.body == b"[]"
+        assert cached.headers == {"X-Next-Cursor": "abc"}
+        assert cache.key(MOVIES_LIST, {"offset": 0}) != key
+        assert cache.get(cache.key(MOVIES_LIST, {"offset": 0})) is None
+
+    def test_invalidate_movies_drops_detail_entries(self):
+        # GIVEN
+        cache = ResponseCache(MemoryBackend(maxsize=10), ttl=60)
+        id_, other_id = uuid.uuid4(), uuid.uuid4()
+        for movie_id in (id_, other_id):
+            cache.set(cache.key(MOVIES_DETAIL, str(movie_id)), CachedResponse(b"{}"))
+
+        # WHEN
+        cache.invalidate_movies([id_])
+
+        # THEN
+        assert cache.get(cache.key(MOVIES_DETAIL, str(id_))) is None
+        assert cache.get(cache.key(MOVIES_DETAIL, str(other_id))) is not None
+
+    def test_disabled_cache(self):
+        # GIVEN
+        cache = ResponseCache(None, ttl=60)
+        key = cache.key(MOVIES_LIST, {})
+
+        # WHEN
+        cache.set(key, CachedResponse(b"[]"))
+
+        # THEN
+        assert not cache.enabled
+        assert cache.get(key) is None
+
+    def test_redis_backend(self, resp_server):
+        # GIVEN
+        host, port = resp_server.server_address
+        cache = ResponseCache(RedisBackend(f"redis://{host}:{port}/0"), ttl=60)
+        key = cache.key(MOVIES_LIST, {"offset": 0})
+
+        # WHEN
+        cache.set(key, CachedResponse(b'[{"name":"x"}]'))
+        cached = cache.get(key)
+        cache.bump(MOVIES_LIST)
+
+        # THEN
+        assert cached.body == b'[{"name":"x"}]'
+        assert cache.key(MOVIES_LIST, {"offset": 0}) != key
+
+    def test_redis_backend_errors_are_misses(self):
+        # GIVEN
+        backend = RedisBackend("redis://127.0.0.1:1/0")
+
+        # WHEN/THEN
+        assert backend.get("key") is None
+        assert backend.get_counter("key") == 0
+        assert backend.incr("key") is None
+        assert not backend.healthy
+
+    def test_lost_invalidation_bypasses_the_cache_until_resent(self, resp_server):
+        # GIVEN
+        host, port = resp_server.server_address
+        backend = RedisBackend(f"redis://{host}:{port}/0", retry_after=60)
+        cache = ResponseCache(backend, ttl=60)
+        key = cache.key(MOVIES_LIST, {"offset": 0})
+        cache.set(key, CachedResponse(b"[]"))
+        errors = cache_errors.labels("INCR").get()
+
+        # WHEN
+        backend.client.port = 1
+        backend.client.close()
+        version = cache.bump(MOVIES_LIST)
+        backend.client.port = port
+
+        # THEN
+        # the entry is outdated but still under the current version
+        assert version is None
+        assert cache_errors.labels("INCR").get() == errors + 1
+        assert not cache.healthy and not cache.shared
+        assert cache.get(key) is None
+        assert cache.recently_written()
+
+        # WHEN
+        backend.retry_after = 0
+
+        # THEN
+        assert cache.healthy
+        assert cache.version(MOVIES_LIST) == 1
+        assert cache.get(cache.key(MOVIES_LIST, {"offset": 0})) is None
+
+
+class TestTokenCache:
+    def test_user_changes_on_other_workers_outdate_cached_tokens(self, resp_server, monkeypatch):
+        # GIVEN
+        host, port = resp_server.server_address
+        url = f"redis://{host}:{port}/0"
+        monkeypatch.setattr(tokens, "epochs", RedisBackend(url))
+        monkeypatch.setattr(tokens, "token_cache", TTLCache(maxsize=10))
+        principal = UserPrincipal(id=uuid.uuid4(), is_active=True, is_admin=True)
+        tokens.cache_principal("token", principal, epoch=tokens.user_epoch(principal.id), ttl=60)
+        cached = tokens.get_principal("token")
+
+        # WHEN
+        # another worker changes the user, it can't drop this worker's entries
+        RedisBackend(url).incr(tokens._epoch_key(principal.id))
+
+        # THEN
+        assert cached == principal
+        assert tokens.get_principal("token") is None
+        assert "token" not in tokens.token_cache
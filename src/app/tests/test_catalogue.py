@@ -0,0 +1,142 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud
+from app.catalogue import CatalogueSnapshot
+from app.crud.filters import Condition
+
+pytest.importorskip("numpy")
+
+CREATED = datetime(2022, 10, 30, 12, 0)
+
+
+def movie_row(name, director, popularity, imdb_score, genre, minutes=0):
+    created_at = CREATED + timedelta(minutes=minutes)
+    return (uuid.uuid4(), name, director, popularity, imdb_score, genre, created_at, created_at)
+
+
+@pytest.fixture
+def rows():
+    return [
+        movie_row("Heat", "Michael Mann", 85.0, 8.3, ["Crime", "Drama"], 1),
+        movie_row("Collateral", "Michael Mann", None, 7.5, ["Crime", "Thriller"], 2),
+        movie_row("Memento", "Christopher Nolan", 90.0, 8.4, ["Mystery", "Thriller"], 3),
+        movie_row("The Prestige", "Christopher Nolan", 92.0, 8.5, ["Drama", "Mystery"], 4),
+        movie_row("50% Off", "Someone", 10.0, 3.0, ["Comedy"], 5),
+    ]
+
+
+@pytest.fixture
+def snapshot(rows):
+    snapshot = CatalogueSnapshot()
+    snapshot.build(rows, version=1)
+    return snapshot
+
+
+def names(rows, selection):
+    by_id = {row[0]: row[1] for row in rows}
+    return [by_id[id_] for id_ in selection.ids]
+
+
+class TestCatalogueSnapshot:
+    @pytest.mark.parametrize(
+        "params, expected",
+        [
+            ([("imdb_score[gte]", "8.4")], ["Memento", "The Prestige"]),
+            ([("popularity[lt]", "90")], ["Heat", "50% Off"]),
+            ([("genre[in]", "Thriller,Comedy")], ["Collateral", "Memento", "50% Off"]),
+            ([("genre[all]", "Drama,Mystery")], ["The Prestige"]),
+            ([("genre[all]", "Drama,Western")], []),
+            ([("director[ilike]", "NOLAN")], ["Memento", "The Prestige"]),
+            ([("name[ilike]", "% o")], ["50% Off"]),
+            ([("name", "Heat")], ["Heat"]),
+            ([("director[ilike]", "mann"), ("imdb_score[lte]", "8")], ["Collateral"]),
+        ],
+    )
+    def test_filters(self, rows, snapshot, params, expected):
+        # GIVEN
+        conditions = crud.movie.parse_filters(params)
+
+        # WHEN
+        selection = snapshot.select(conditions, keys=("created_at", "id"))
+
+        # THEN
+        assert names(rows, selection) == expected
+        assert selection.fingerprint[1] == len(expected)
+
+    def test_pages_by_keyset(self, rows, snapshot):
+        # GIVEN
+        keys = ("popularity", "id")
+        first = snapshot.select([], keys=keys, descending=True, limit=2)
+        memento = next(row for row in rows if row[1] == "Memento")
+
+        # WHEN
+        second = snapshot.select(
+            [], keys=keys, descending=True, after=(memento[3], memento[0]), limit=2
+        )
+        collateral = next(row for row in rows if row[1] == "Collateral")
+        last = snapshot.select(
+            [], keys=keys, descending=True, after=(collateral[3], collateral[0]), limit=2
+        )
+        ascending = snapshot.select([], keys=keys, limit=10)
+
+        # THEN
+        assert names(rows, first) == ["The Prestige", "Memento", "Heat"]
+        # the movie without popularity comes last, like NULLS LAST in SQL
+        assert names(rows, second) == ["Heat", "50% Off", "Collateral"]
+        assert names(rows, last) == []
+        assert names(rows, ascending) == ["50% Off", "Heat", "Memento", "The Prestige", "Collateral"]
+
+    def test_unsupported_conditions_fall_back(self, snapshot):
+        # GIVEN/WHEN/THEN
+        assert snapshot.select([Condition("name", "ilike", "%a_b%")], keys=("id",)) is None
+
+    def test_rebuilds_on_new_version(self, snapshot):
+        # GIVEN/WHEN/THEN
+        assert snapshot.is_current(1)
+        assert not snapshot.is_current(2)
+        snapshot.invalidate()
+        assert not snapshot.is_current(1)
+
+    def test_refresh_runs_one_rebuild_at_a_time(self, rows):
+        # GIVEN
+        snapshot = CatalogueSnapshot()
+        loading = threading.Event()
+        loads = []
+
+        def load():
+            loads.append(1)
+            loading.wait(5)
+            return 3, rows
+
+        # WHEN
+        first = snapshot.refresh(load)
+        second = snapshot.refresh(load)
+        loading.set()
+        first.result(timeout=5)
+
+        # THEN
+        assert second is first
+        assert len(loads) == 1
+        assert snapshot.is_current(3)
+
+    def test_rebuild_started_before_an_invalidation_is_dropped(self, rows):
+        # GIVEN
+        snapshot = CatalogueSnapshot()
+        loading = threading.Event()
+
+        def load():
+            loading.wait(5)
+            return 3, rows
+
+        # WHEN
+        refreshing = snapshot.refresh(load)
+        snapshot.invalidate()
+        loading.set()
+        refreshing.result(timeout=5)
+
+        # THEN
+        assert snapshot.age() is None
@@ -0,0 +1,142 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.cache.responses import CachedResponse
+from app.compression import CompressionMiddleware, negotiate
+
+
+class TestNegotiate:
+    def test_picks_the_preferred_accepted_coding(self):
+        # GIVEN
+        offered = ("br", "gzip")
+
+        # WHEN/THEN
+        assert negotiate("gzip, deflate, br", offered) == "br"
+        assert negotiate("br;q=0.5, gzip", offered) == "gzip"
+        assert negotiate("br;q=0, *", ("br", "gzip")) == "gzip"
+        assert negotiate("gzip", ("br",)) is None
+        assert negotiate("identity", offered) is None
+        assert negotiate(None, offered) is None
+
+
+class TestCompressionMiddleware:
+    def make_client(self) -> TestClient:
+        app = FastAPI()
+        app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+        @app.get("/large")
+        def large():
+            return JSONResponse(["movie"] * 100)
+
+        @app.get("/small")
+        def small():
+            return {"ping": "pong!"}
+
+        @app.get("/stream")
+        def stream():
+            return StreamingResponse(iter([b"a" * 500, b"b" * 500]), media_type="text/plain")
+
+        @app.get("/encoded")
+        def encoded():
+            body = gzip.compress(b"x" * 500)
+            return Response(body, media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+        return TestClient(app)
+
+    def test_compresses_large_bodies(self):
+        # GIVEN
+        client = self.make_client()
+
+        # WHEN
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        # THEN
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert int(response.headers["Content-Length"]) < len(response.content)
+        assert response.json() == ["movie"] * 100
+
+    def test_leaves_small_and_unaccepted_bodies(self):
+        # GIVEN
+        client = self.make_client()
+
+        # WHEN
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+        # THEN
+        assert "Content-Encoding" not in small.headers
+        assert "Content-Encoding" not in identity.headers
+
+    def test_compresses_streamed_bodies(self):
+        # GIVEN
+        client = self.make_client()
+
+        # WHEN
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        # THEN
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == b"a" * 500 + b"b" * 500
+
+    def test_passes_encoded_bodies_through(self):
+        # GIVEN
+        client = self.make_client()
+
+        # WHEN
+        response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+
+        # THEN
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == b"x" * 500
+
+
+class TestCachedResponse:
+    def test_round_trips_precompressed_bodies(self):
+        # GIVEN
+        response = CachedResponse(b"[" + b"1," * 1000 + b"1]", {"ETag": 'W/"etag"'})
+
+        # WHEN
+        response.precompress("gzip")
+        loaded = CachedResponse.loads(response.dumps())
+        sent = loaded.to_response("gzip")
+
+        # THEN
+        assert loaded.body == response.body
+        assert loaded.encoded == response.encoded
+        assert sent.headers["Content-Encoding"] == "gzip"
+        assert sent.headers["ETag"] == 'W/"etag"'
+        assert sent.headers["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(sent.body) == response.body
+
+    def test_compresses_only_the_accepted_coding(self):
+        # GIVEN
+        response = CachedResponse(b"[" + b"1," * 1000 + b"1]", {"ETag": '"etag"'})
+
+        # WHEN
+        identity = response.precompress("identity")
+        added = response.precompress("gzip")
+        again = response.precompress("gzip")
+        plain = response.to_response("identity")
+        sent = response.to_response("gzip")
+
+        # THEN
+        assert (identity, added, again) == (False, True, False)
+        assert list(response.encoded) == ["gzip"]
+        assert plain.headers["ETag"] == '"etag"'
+        assert plain.headers["Vary"] == "Accept-Encoding"
+        assert sent.headers["ETag"] == 'W/"etag"'
+
+    def test_small_bodies_are_not_compressed(self):
+        # GIVEN
+        response = CachedResponse(b"[]")
+
+        # WHEN
+        response.precompress("gzip")
+
+        # THEN
+        assert response.encoded == {}
+        assert "Content-Encoding" not in response.to_response("gzip").headers
@@ -0,0 +1,31 @@
+import datetime
+import uuid
+
+from app.api.conditional import etag_matches, make_etag
+
+
+class TestConditional:
+    def test_make_etag_is_weak_and_stable(self):
+        # GIVEN
+        movie_id = uuid.uuid4()
+        updated_at = datetime.datetime(2022, 10, 28, 12, 0)
+
+        # WHEN
+        etag = make_etag(movie_id, updated_at)
+
+        # THEN
+        assert etag.startswith('W/"')
+        assert etag == make_etag(movie_id, updated_at)
+        assert etag != make_etag(movie_id, updated_at + datetime.timedelta(seconds=1))
+
+    def test_etag_matches(self):
+        # GIVEN
+        etag = make_etag("movie")
+
+        # WHEN/THEN
+        assert etag_matches(etag, etag)
+        assert etag_matches(etag[2:], etag)
+        assert etag_matches(f'"other", {etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('W/"other"', etag)
+        assert not etag_matches(None, etag)
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from core import PasswordHasher, PasswordHasherBusy, get_password_hash, verify_password
+
+
+class TestPasswordHasher:
+    def test_hash_and_verify(self):
+        # GIVEN/WHEN
+        hashed_password = get_password_hash("secret")
+
+        # THEN
+        assert verify_password("secret", hashed_password)
+        assert not verify_password("wrong", hashed_password)
+
+    def test_run_records_stats(self):
+        # GIVEN
+        hasher = PasswordHasher(workers=1, queue_size=1, timeout=1)
+
+        # WHEN
+        result = hasher.run(lambda x: x * 2, 21)
+
+        # THEN
+        assert result == 42
+        stats = hasher.stats()
+        assert stats["completed"] == 1
+        assert stats["queued"] == stats["running"] == 0
+
+    def test_rejects_when_saturated(self):
+        # GIVEN
+        hasher = PasswordHasher(workers=1, queue_size=1, timeout=1)
+        release = threading.Event()
+        running = hasher.submit(release.wait)
+        queued = hasher.submit(release.wait)
+
+        # WHEN/THEN
+        with pytest.raises(PasswordHasherBusy):
+            hasher.submit(release.wait)
+        assert hasher.stats()["rejected"] == 1
+
+        release.set()
+        running.result()
+        queued.result()
+        assert hasher.run(lambda: "ok") == "ok"
+
+    @pytest.mark.anyio
+    async def test_run_async(self):
+        # GIVEN
+        hasher = PasswordHasher(workers=1, queue_size=0, timeout=1)
+
+        # WHEN/THEN
+        assert await hasher.run_async(lambda x: x + 1, 1) == 2
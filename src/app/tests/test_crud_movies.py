@@ -1,12 +1,17 @@
 import random
 import uuid
 
+import pytest
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.models import User
-from app.schemas import MovieCreate
-from app.tests.utils import random_lower_string, create_random_movie
+from app.crud.crud_movies import BulkWriteError
+from app.crud.pagination import PaginationError
+from app.models import Movies, User
+from app.schemas import MovieBulkUpdateItem, MovieCreate
+from app.search import search_index
+from app.tests.utils import random_lower_string, create_random_movie, create_random_movies
+from config import settings
 
 
 class TestCRUDMovie:
@@ -180,3 +185,175 @@ class TestCRUDMovie:
         filtered_query = crud.movie.filter(base_query, q={"popularity__lte": 90.0})
 
         assert len(filtered_query.all()) == 2
+
+    def test_get_multi_by_owner_with_cursor(self, db: Session):
+        # GIVEN
+        count, created_by_id = create_random_movies(db, count=5)
+        first_page = crud.movie.paginate(
+            crud.movie.get_base_query(db).filter(Movies.created_by_id == created_by_id), limit=3
+        )
+
+        # WHEN
+        movies = crud.movie.get_multi_by_owner(
+            db, created_by_id=created_by_id, limit=3, cursor=first_page.next_cursor
+        )
+
+        # THEN
+        assert len(first_page.items) == 3
+        assert len(movies) == count - 3
+        assert not {m.id for m in movies} & {m.id for m in first_page.items}
+
+    @pytest.mark.parametrize("sort", ["popularity", "-popularity"])
+    def test_paginate_keeps_null_sort_keys_last(self, db: Session, sort: str):
+        # GIVEN
+        count, created_by_id = create_random_movies(db, count=3)
+        unranked = [
+            crud.movie.create_with_owner(
+                db,
+                obj=MovieCreate(name=random_lower_string(), director="Unknown", imdb_score=5.0, genre=["Drama"]),
+                created_by_id=created_by_id,
+            )
+            for _ in range(2)
+        ]
+        query = crud.movie.get_base_query(db).filter(Movies.created_by_id == created_by_id)
+        descending = sort.startswith("-")
+
+        # WHEN
+        movies, cursor = [], None
+        while True:
+            # one per page, so cursors land on NULL rows too
+            page = crud.movie.paginate(query, limit=1, cursor=cursor, sort=sort)
+            movies += page.items
+            if not (cursor := page.next_cursor):
+                break
+
+        # THEN
+        assert len(movies) == count + 2
+        popularity = [movie.popularity for movie in movies[:count]]
+        assert popularity == sorted(popularity, reverse=descending)
+        assert [movie.id for movie in movies[count:]] == sorted(
+            (movie.id for movie in unranked), key=lambda id_: id_.bytes, reverse=descending
+        )
+
+    def test_paginate_raises_for_invalid_cursor(self, db: Session):
+        # GIVEN/WHEN/THEN
+        with pytest.raises(PaginationError):
+            crud.movie.paginate(crud.movie.get_base_query(db), cursor="not-a-cursor")
+
+    @pytest.mark.parametrize("backend", ["postgres", "memory"])
+    def test_search(self, db: Session, backend: str, monkeypatch):
+        # GIVEN
+        monkeypatch.setattr(settings, "SEARCH_BACKEND", backend)
+        search_index.clear()
+        crud.movie.bulk_delete(db)
+        by_name = create_random_movie(db, name="Following", director="someone")
+        by_director = create_random_movie(db, name="Memento", director="Christopher Nolan")
+        create_random_movie(db, name="Star Wars", director="George Lucas")
+
+        # WHEN
+        base_query = crud.movie.get_base_query(db)
+        results = crud.movie.search(db, base_query, q="fol").all()
+
+        # THEN
+        assert [movie.id for movie in results] == [by_name.id]
+        assert crud.movie.search(db, base_query, q="christopher nol").all() == [by_director]
+        assert crud.movie.search(db, base_query, q="nothing here").all() == []
+
+    def test_genres_are_normalized_on_write(self, db: Session, admin_user: User):
+        # GIVEN
+        user, _ = admin_user
+        movie_obj = MovieCreate(
+            name=random_lower_string(),
+            director=random_lower_string(),
+            imdb_score=8.0,
+            genre=["Adventure", " Family", "  Film  Noir ", "Family", " "],
+        )
+
+        # WHEN
+        created_movie = crud.movie.create_with_owner(db, obj=movie_obj, created_by_id=user.id)
+        crud.movie.bulk_insert(
+            db,
+            objs=[
+                Movies(
+                    name=random_lower_string(),
+                    director=random_lower_string(),
+                    imdb_score=8.0,
+                    genre=[" Drama", "Drama "],
+                    created_by_id=user.id,
+                )
+            ],
+        )
+
+        # THEN
+        assert created_movie.genre == ["Adventure", "Family", "Film Noir"]
+        filtered_query = crud.movie.filter(crud.movie.get_base_query(db), q={"genre": " Drama"})
+        assert [movie.genre for movie in filtered_query.all()] == [["Drama"]]
+
+    def test_filter_with_multiple_genres(self, db: Session):
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        create_random_movie(db, genre=["Action", "Sci-Fi"])
+        create_random_movie(db, genre=["Action", "Drama"])
+        create_random_movie(db, genre=["Comedy"])
+
+        # WHEN
+        base_query = crud.movie.get_base_query(db)
+        all_query = crud.movie.filter(base_query, q={"genre__all": ["Action", " Sci-Fi"]})
+        any_query = crud.movie.filter(base_query, q={"genre__any": "Sci-Fi,Comedy"})
+
+        # THEN
+        assert len(all_query.all()) == 1
+        assert len(any_query.all()) == 2
+
+    def test_bulk_writes_check_ownership(self, db: Session, admin_user: User):
+        # GIVEN
+        user, _ = admin_user
+        other = create_random_movie(db)
+        objs = [
+            MovieCreate(name=random_lower_string(), director="Bulk", imdb_score=7.0, genre=[" Drama"]),
+            MovieCreate(name=random_lower_string(), director="Bulk", imdb_score=8.0, genre=["Action"]),
+        ]
+
+        # WHEN
+        created = crud.movie.create_many(db, objs=objs, created_by_id=user.id)
+        items = [MovieBulkUpdateItem(id=movie.id, imdb_score=9.0) for movie in created]
+        updated = crud.movie.update_many(db, items=items, created_by_id=user.id)
+        with pytest.raises(BulkWriteError) as exc_info:
+            crud.movie.remove_many(db, ids=[created[0].id, other.id], created_by_id=user.id)
+        deleted = crud.movie.remove_many(db, ids=[movie.id for movie in created], created_by_id=user.id)
+
+        # THEN
+        assert [movie.genre for movie in created] == [["Drama"], ["Action"]]
+        assert {movie.imdb_score for movie in updated} == {9.0}
+        assert exc_info.value.ids == [other.id]
+        assert set(deleted) == {movie.id for movie in created}
+        assert crud.movie.get(db, id=other.id)
+
+    def test_writes_are_scoped_to_the_owner(self, db: Session, admin_user: User):
+        # GIVEN
+        user, _ = admin_user
+        movie = create_random_movie(db)
+
+        # WHEN
+        not_updated = crud.movie.update_by_id(db, id=movie.id, data={"name": "Stolen"}, created_by_id=user.id)
+        not_deleted = crud.movie.remove(db, id=movie.id, created_by_id=user.id)
+        updated = crud.movie.update_by_id(db, id=movie.id, data={"name": "Renamed"}, created_by_id=movie.created_by_id)
+        deleted = crud.movie.remove(db, id=movie.id, created_by_id=movie.created_by_id)
+
+        # THEN
+        assert not_updated is None and not_deleted is None
+        assert updated.name == "Renamed"
+        assert updated.updated_at >= movie.updated_at
+        assert deleted == movie.id
+        assert not crud.movie.exists(db, id=movie.id)
+
+    def test_update_of_a_deleted_movie_returns_none(self, db: Session):
+        # GIVEN
+        movie = create_random_movie(db)
+        crud.movie.remove(db, id=movie.id)
+
+        # WHEN
+        updated = crud.movie.update(db, db_obj=movie, data={"name": "Gone"})
+
+        # THEN
+        assert updated is None
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.db.pool import InstrumentedQueuePool
+
+
+class TestInstrumentedQueuePool:
+    def test_records_checkout_waits_and_timeouts(self, tmp_path):
+        # GIVEN
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+
+        # WHEN
+        connection = engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        connection.close()
+
+        # THEN
+        status = engine.pool.status_dict()
+        assert status["checkouts"] == 1
+        assert status["timeouts"] == 1
+        assert status["wait_seconds_max"] >= 0.05
+        assert status["checked_out"] == 0
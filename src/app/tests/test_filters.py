@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app import crud
+from app.crud.filters import Condition, FilterError, compile_filters
+from app.models import Movies
+
+
+class TestParseFilters:
+    def test_parses_typed_conditions(self):
+        # GIVEN
+        params = [
+            ("imdb_score[gte]", "8"),
+            ("genre[in]", " Drama,Action"),
+            ("name", "Heat"),
+            ("limit", "10"),
+        ]
+
+        # WHEN
+        conditions = crud.movie.parse_filters(params)
+
+        # THEN
+        assert conditions == (
+            Condition("genre", "in", ["Drama", "Action"]),
+            Condition("imdb_score", "gte", 8.0),
+            Condition("name", "eq", "Heat"),
+        )
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            [("budget[gte]", "10")],
+            [("imdb_score[ilike]", "8")],
+            [("director[eq]", "Nolan")],
+            [("imdb_score[gte]", "high")],
+            [("popularity[lt]", "nan")],
+            [("name[ilike]", "ab")],
+            [("genre[in]", " , ")],
+            [("imdb_score[gte]", "8"), ("imdb_score[gte]", "9")],
+        ],
+    )
+    def test_rejects_unsupported_filters(self, params):
+        # GIVEN/WHEN/THEN
+        with pytest.raises(FilterError):
+            crud.movie.parse_filters(params)
+
+
+class TestCompileFilters:
+    def test_filters_of_a_shape_share_a_plan(self):
+        # GIVEN
+        first = crud.movie.parse_filters([("imdb_score[gte]", "8"), ("name[ilike]", "50%")])
+        second = crud.movie.parse_filters([("imdb_score[gte]", "9"), ("name[ilike]", "war")])
+
+        # WHEN
+        statements = [
+            select(Movies.id).filter(compile_filters(Movies, conditions)).compile(
+                dialect=postgresql.dialect()
+            )
+            for conditions in (first, second)
+        ]
+
+        # THEN
+        assert str(statements[0]) == str(statements[1])
+        assert statements[0].params == {"filter_0": 8.0, "filter_1": "%50\\%%"}
+        assert statements[1].params == {"filter_0": 9.0, "filter_1": "%war%"}
@@ -0,0 +1,93 @@
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from starlette import status
+
+from app.api.endpoints import health
+from app.db.health import DatabaseProbe, pool_available
+from config import settings
+
+
+class TestDatabaseProbe:
+    def test_caches_the_result(self, tmp_path):
+        # GIVEN
+        engine = create_engine(f"sqlite:///{tmp_path / 'health.db'}")
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        probe = DatabaseProbe(engine, ttl=60, timeout=5)
+
+        # WHEN
+        first, second = probe.check(), probe.check()
+
+        # THEN
+        assert first.ok and first.revision is None
+        assert second is first
+        assert statements.count("SELECT 1") == 1
+
+    def test_times_out_without_waiting_for_the_database(self, tmp_path):
+        # GIVEN
+        answer = threading.Event()
+        probe = DatabaseProbe(create_engine(f"sqlite:///{tmp_path / 'health.db'}"), ttl=60, timeout=0.05)
+
+        def hanging_probe():
+            answer.wait()
+
+        probe._probe = hanging_probe
+
+        # WHEN
+        result = probe.check()
+        answer.set()
+
+        # THEN
+        assert not result.ok
+        assert "No answer" in result.error
+
+    def test_pool_available(self):
+        # GIVEN
+        figures = {"size": 2, "max_overflow": 1, "checked_out": 3, "timeouts": 4}
+
+        # WHEN/THEN
+        assert pool_available(figures)["ok"] is False
+        assert pool_available({**figures, "checked_out": 2})["ok"] is True
+        assert pool_available({**figures, "max_overflow": -1})["ok"] is True
+
+
+class TestHealthEndpoints:
+    def test_live(self, client: TestClient) -> None:
+        # GIVEN/WHEN
+        response = client.get("/health/live")
+
+        # THEN
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"status": "alive"}
+
+    def test_ready(self, client: TestClient, db: Session, monkeypatch) -> None:
+        # GIVEN
+        probe = DatabaseProbe(db.get_bind().engine, ttl=0, timeout=5)
+        monkeypatch.setattr(health, "database_probe", probe)
+        monkeypatch.setattr(settings, "HEALTH_CHECK_MIGRATIONS", False)
+
+        # WHEN
+        response = client.get("/health/ready")
+
+        # THEN
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["status"] == "ready"
+        assert response.json()["checks"]["database"]["ok"] is True
+        assert "catalogue" in response.json()["caches"]
+
+    def test_ready_fails_behind_the_migration_head(self, client: TestClient, db: Session, monkeypatch) -> None:
+        # GIVEN the test database is created from the models, without migrations
+        probe = DatabaseProbe(db.get_bind().engine, ttl=0, timeout=5)
+        monkeypatch.setattr(health, "database_probe", probe)
+        monkeypatch.setattr(settings, "HEALTH_CHECK_MIGRATIONS", True)
+
+        # WHEN
+        response = client.get("/health/ready")
+
+        # THEN
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["checks"]["migrations"]["current"] is None
+        assert response.json()["checks"]["migrations"]["ok"] is False
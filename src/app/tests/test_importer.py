@@ -0,0 +1,136 @@
+import io
+import json
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.db.importer import Checkpoint, batched, import_movies, iter_json_array, iter_jsonl, iter_tsv, to_row
+from app.models import Movies
+from app.tests.utils import create_user
+
+
+class TestParsers:
+    def test_iter_json_array_across_chunks(self):
+        # GIVEN
+        items = [{"name": f"movie {i}", "genre": ["Drama"]} for i in range(50)] + [1.5, "x"]
+        fp = io.StringIO(json.dumps(items, indent=2))
+
+        # WHEN
+        parsed = list(iter_json_array(fp, chunk_size=7))
+
+        # THEN
+        assert parsed == items
+
+    def test_iter_json_array_stops_at_a_corrupt_item(self):
+        # GIVEN
+        items = ",".join([json.dumps({"name": f"movie {i}"}) for i in range(100)])
+        fp = io.StringIO(f'[{{"name": "a"}}, {{"name": "b",, }}, {items}]')
+        parsed = []
+
+        # WHEN
+        with pytest.raises(ValueError, match="Item 1 "):
+            for item in iter_json_array(fp, chunk_size=16, max_item_size=64):
+                parsed.append(item)
+
+        # THEN
+        # it gave up after a few chunks instead of buffering the rest
+        assert parsed == [{"name": "a"}]
+        assert fp.tell() < 200
+
+    def test_iter_jsonl_skips_blank_lines(self):
+        # GIVEN
+        fp = io.StringIO('{"name": "a"}\n\n{"name": "b"}\n')
+
+        # WHEN/THEN
+        assert [record["name"] for record in iter_jsonl(fp)] == ["a", "b"]
+
+    def test_iter_tsv(self):
+        # GIVEN
+        fp = io.StringIO("name\tdirector\tpopularity\timdb_score\tgenre\nJaws\tSpielberg\t\\N\t8.1\tDrama,Thriller\n")
+
+        # WHEN
+        row = to_row(next(iter_tsv(fp)))
+
+        # THEN
+        assert row == {
+            "name": "Jaws",
+            "director": "Spielberg",
+            "popularity": None,
+            "imdb_score": 8.1,
+            "genre": ["Drama", "Thriller"],
+        }
+
+    def test_to_row_maps_fixture_fields(self):
+        # GIVEN
+        record = {"99popularity": 83.0, "director": "Victor Fleming", "genre": ["Family"], "imdb_score": 8.3, "name": "Oz"}
+
+        # WHEN/THEN
+        assert to_row(record)["popularity"] == 83.0
+
+    def test_to_row_rejects_non_objects(self):
+        # GIVEN/WHEN/THEN
+        with pytest.raises(TypeError):
+            to_row(["Oz", "Victor Fleming"])
+
+    def test_batched(self):
+        # GIVEN/WHEN/THEN
+        assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_checkpoint_belongs_to_its_source(self, tmp_path):
+        # GIVEN
+        source, other = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+        source.write_text("{}\n")
+        other.write_text("{}\n{}\n")
+        Checkpoint(tmp_path / "checkpoint", source).save(1)
+
+        # WHEN/THEN
+        assert Checkpoint(tmp_path / "checkpoint", source).load() == 1
+        assert Checkpoint(tmp_path / "checkpoint", other).load() == 0
+
+
+class TestImportMovies:
+    def test_upserts_on_name_and_director(self, db: Session, tmp_path) -> None:
+        # GIVEN
+        user, _ = create_user(db, is_admin=True)
+        path = tmp_path / "movies.jsonl"
+        records = [
+            {"name": "Import A", "director": "Dir", "imdb_score": 7.0, "genre": [" Drama"]},
+            {"name": "Import B", "director": "Dir", "imdb_score": 6.0, "genre": ["Action"]},
+            {"name": "Import A", "director": "Dir", "imdb_score": 7.5, "genre": ["Drama"]},
+            {"name": "Invalid"},
+        ]
+        path.write_text("\n".join(json.dumps(record) for record in records))
+
+        # WHEN
+        stats = import_movies(db, path, created_by_id=user.id, batch_size=2)
+        again = import_movies(db, path, created_by_id=user.id, batch_size=10, copy=False)
+
+        # THEN
+        movies = db.query(Movies).filter(Movies.name.in_(["Import A", "Import B"])).all()
+        assert stats.records == 4 and stats.skipped == 1
+        assert (stats.inserted, stats.updated) == (2, 1)
+        assert (again.inserted, again.updated) == (0, 0)
+        assert sorted((m.name, m.imdb_score, m.genre) for m in movies) == [
+            ("Import A", 7.5, ["Drama"]),
+            ("Import B", 6.0, ["Action"]),
+        ]
+
+    def test_resumes_from_checkpoint(self, db: Session, tmp_path) -> None:
+        # GIVEN
+        user, _ = create_user(db, is_admin=True)
+        path = tmp_path / "movies.json"
+        path.write_text(json.dumps([
+            {"name": f"Resumed {i}", "director": "Dir", "imdb_score": 5.0, "genre": ["Drama"]}
+            for i in range(3)
+        ]))
+        checkpoint = tmp_path / "checkpoint"
+        Checkpoint(checkpoint, path).save(2)
+
+        # WHEN
+        stats = import_movies(db, path, created_by_id=user.id, checkpoint_path=checkpoint)
+
+        # THEN
+        assert stats.inserted == 1
+        assert crud.movie.filter(db.query(Movies), q={"name": "Resumed"}).count() == 1
+        assert not checkpoint.exists()
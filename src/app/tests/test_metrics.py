@@ -0,0 +1,94 @@
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.metrics import MetricsMiddleware, Registry
+from app.metrics.http import in_flight, request_duration, requests_total, response_size
+from config import settings
+
+
+class TestRegistry:
+    def test_counts_across_threads(self):
+        # GIVEN
+        registry = Registry()
+        counter = registry.counter("jobs_total", "Jobs done.", ("kind",))
+
+        def work():
+            for _ in range(1000):
+                counter.labels("import").inc()
+
+        # WHEN
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # THEN
+        assert 'jobs_total{kind="import"} 4000' in registry.render()
+
+    def test_renders_histograms_in_the_prometheus_format(self):
+        # GIVEN
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", 'Latency of "jobs".', buckets=(0.1, 1))
+
+        # WHEN
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        # THEN
+        assert registry.render() == (
+            '# HELP latency_seconds Latency of "jobs".\n'
+            "# TYPE latency_seconds histogram\n"
+            'latency_seconds_bucket{le="0.1"} 2\n'
+            'latency_seconds_bucket{le="1"} 3\n'
+            'latency_seconds_bucket{le="+Inf"} 4\n'
+            "latency_seconds_sum 3.65\n"
+            "latency_seconds_count 4\n"
+        )
+
+
+class TestMetricsMiddleware:
+    def test_records_requests_by_route_template(self):
+        # GIVEN
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{id}")
+        def get_item(id: int):
+            return {"id": id}
+
+        client = TestClient(app)
+        count = requests_total.labels("GET", "/items/{id}", "200")
+        before = count.get()
+
+        # WHEN
+        client.get("/items/1")
+        response = client.get("/items/2")
+        client.get("/missing")
+
+        # THEN
+        assert count.get() - before == 2
+        assert requests_total.labels("GET", "<unmatched>", "404").get() >= 1
+        _, _, observed = request_duration.labels("GET", "/items/{id}").get()
+        assert observed >= 2
+        _, size, _ = response_size.labels("GET", "/items/{id}").get()
+        assert size >= 2 * len(response.content)
+        assert in_flight.labels().get() == 0
+
+
+class TestMetricsEndpoint:
+    def test_exports_the_worker_metrics(self, client: TestClient, user_token_headers):
+        # GIVEN
+        client.get(f"{settings.API_V1_STR}/movies/", headers=user_token_headers)
+
+        # WHEN
+        response = client.get("/metrics")
+
+        # THEN
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'http_requests_total{method="GET",route="/api/v1/movies/",status="200"}' in response.text
+        for family in ("http_request_duration_seconds", "db_pool_checked_out", "password_hash_seconds_total"):
+            assert f"# TYPE {family} " in response.text
+        assert "# TYPE db_statements_total counter" in response.text
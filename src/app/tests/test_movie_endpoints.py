@@ -1,11 +1,17 @@
 import uuid
 
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from starlette import status
 
 from app import crud
-from app.tests.utils import create_user, create_random_movie, create_random_movies
+from app.cache.responses import response_cache
+from app.catalogue import catalogue
+from app.compression import middleware as compression_middleware
+from app.models import Movies
+from app.tests.utils import create_user, create_random_movie, create_random_movies, random_lower_string
 from config import settings
 from core import create_access_token
 
@@ -44,6 +50,297 @@ class TestMovieEndpoints:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.json()) == count - offset
 
+    def test_get_movies_with_cursor(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        count, _ = create_random_movies(db, count=7)
+        params = {"limit": 3, "sort": "-imdb_score"}
+
+        # WHEN
+        seen = []
+        while True:
+            response = client.get(self.movie_url, headers=user_token_headers, params=params)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(movie["id"] for movie in response.json())
+            if not (cursor := response.headers.get("X-Next-Cursor")):
+                break
+            params["cursor"] = cursor
+
+        # THEN
+        assert len(seen) == len(set(seen)) == count
+
+    def test_get_movies_raises_400_for_invalid_cursor(self, client: TestClient, user_token_headers) -> None:
+        # GIVEN/WHEN
+        response = client.get(self.movie_url, headers=user_token_headers, params={"cursor": "garbage"})
+
+        # THEN
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_movies_with_search(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        movie = create_random_movie(db, name="The Wizard of Oz", director="Victor Fleming")
+
+        # WHEN
+        response = client.get(self.movie_url, headers=user_token_headers, params={"search": "wizard oz"})
+
+        # THEN
+        assert response.status_code == status.HTTP_200_OK
+        assert [m["id"] for m in response.json()] == [str(movie.id)]
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"search": "wizard", "sort": "-popularity"},
+            {"search": "wizard", "cursor": "garbage"},
+            {"sort": "rank"},
+        ],
+    )
+    def test_get_movies_raises_422_for_unsupported_search_and_sort(
+        self, client: TestClient, user_token_headers, params
+    ) -> None:
+        # GIVEN/WHEN
+        response = client.get(self.movie_url, headers=user_token_headers, params=params)
+
+        # THEN
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_get_movies_with_genres(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        create_random_movie(db, genre=["Action", " Sci-Fi"])
+        create_random_movie(db, genre=["Action", "Drama"])
+
+        # WHEN
+        all_response = client.get(
+            self.movie_url, headers=user_token_headers, params={"genre": ["Action", "Sci-Fi"]}
+        )
+        any_response = client.get(
+            self.movie_url,
+            headers=user_token_headers,
+            params={"genre": ["Drama", "Sci-Fi"], "genre_match": "any"},
+        )
+
+        # THEN
+        assert [m["genre"] for m in all_response.json()] == [["Action", "Sci-Fi"]]
+        assert len(any_response.json()) == 2
+
+    def test_get_movies_with_filters(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        create_random_movie(db, imdb_score=8.5, popularity=70.0, genre=["Drama"])
+        create_random_movie(db, imdb_score=9.0, popularity=90.0, genre=["Action"])
+        create_random_movie(db, imdb_score=7.0, popularity=95.0, genre=["Action"])
+        create_random_movie(db, imdb_score=9.5, popularity=99.0, genre=["Comedy"])
+
+        # WHEN
+        response = client.get(
+            f"{self.movie_url}?imdb_score[gte]=8&genre[in]=Drama,Action&sort=-popularity",
+            headers=user_token_headers,
+        )
+        invalid = client.get(f"{self.movie_url}?imdb_score[ilike]=8", headers=user_token_headers)
+
+        # THEN
+        assert response.status_code == status.HTTP_200_OK
+        assert [m["popularity"] for m in response.json()] == [90.0, 70.0]
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_movies_with_total_count(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        count, _ = create_random_movies(db, count=3)
+
+        # WHEN
+        responses = {
+            method: client.get(
+                self.movie_url, headers=user_token_headers, params={"count": method, "limit": 1}
+            )
+            for method in ("exact", "cached", "estimate", "auto")
+        }
+        without = client.get(self.movie_url, headers=user_token_headers, params={"limit": 1})
+
+        # THEN
+        assert responses["exact"].headers["X-Total-Count"] == str(count)
+        assert responses["cached"].headers["X-Total-Count"] == str(count)
+        assert responses["auto"].headers["X-Total-Count-Method"] == "exact"
+        assert int(responses["estimate"].headers["X-Total-Count"]) >= 0
+        assert responses["estimate"].headers["X-Total-Count-Method"] == "estimate"
+        assert "X-Total-Count" not in without.headers
+
+    def test_get_movies_reuses_cached_counts(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        count, _ = create_random_movies(db, count=3)
+        client.get(self.movie_url, headers=user_token_headers, params={"count": "cached", "limit": 1})
+
+        # WHEN
+        pages = [
+            client.get(self.movie_url, headers=user_token_headers, params={"count": method, "limit": 2})
+            for method in ("cached", "estimate")
+        ]
+
+        # THEN
+        assert pages[0].headers["X-Total-Count"] == str(count)
+        assert pages[1].headers["X-Total-Count-Method"] == "estimate"
+        assert pages[0].headers["ETag"] != pages[1].headers["ETag"]
+
+    def test_get_movies_is_cached_until_movies_change(
+        self, client: TestClient, db: Session, user_token_headers, admin_token_headers
+    ) -> None:
+        # GIVEN
+        crud.movie.bulk_delete(db)
+        count, _ = create_random_movies(db, count=2)
+        first = client.get(self.movie_url, headers=user_token_headers)
+
+        # WHEN
+        cached = client.get(self.movie_url, headers=user_token_headers)
+        movie_data = {"director": "George Lucas", "genre": ["Sci-Fi"], "imdb_score": 8.8, "name": "Star Wars"}
+        client.post(self.movie_url, json=movie_data, headers=admin_token_headers)
+        after_create = client.get(self.movie_url, headers=user_token_headers)
+
+        # THEN
+        assert cached.json() == first.json()
+        assert len(first.json()) == count
+        assert len(after_create.json()) == count + 1
+
+    def test_get_movies_returns_304_for_matching_etag(
+        self, client: TestClient, db: Session, user_token_headers, admin_token_headers
+    ) -> None:
+        # GIVEN
+        create_random_movies(db, count=2)
+        etag = client.get(self.movie_url, headers=user_token_headers).headers["ETag"]
+
+        # WHEN
+        headers = {**user_token_headers, "If-None-Match": etag}
+        not_modified = client.get(self.movie_url, headers=headers)
+        movie_data = {"director": "George Lucas", "genre": ["Sci-Fi"], "imdb_score": 8.8, "name": "Star Wars"}
+        client.post(self.movie_url, json=movie_data, headers=admin_token_headers)
+        modified = client.get(self.movie_url, headers=headers)
+
+        # THEN
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified.headers["ETag"] == etag
+        assert not_modified.headers["Vary"] == "Accept-Encoding"
+        assert modified.status_code == status.HTTP_200_OK
+        assert modified.headers["ETag"] != etag
+
+    def test_get_movies_etag_sees_writes_that_bypass_the_api(
+        self, client: TestClient, db: Session, user_token_headers, monkeypatch
+    ) -> None:
+        # GIVEN
+        create_random_movies(db, count=2)
+        # pages aren't kept, only the ETag could still answer for the old listing
+        monkeypatch.setattr(response_cache, "ttl", 0)
+        etag = client.get(self.movie_url, headers=user_token_headers).headers["ETag"]
+
+        # WHEN
+        db.execute(
+            insert(Movies).values(
+                name=random_lower_string(), director="Plain SQL", imdb_score=5.0, genre=["Drama"]
+            )
+        )
+        db.commit()
+        response = client.get(self.movie_url, headers={**user_token_headers, "If-None-Match": etag})
+
+        # THEN
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etag
+
+    def test_get_movies_fast_serialization_renders_the_same(
+        self, client: TestClient, db: Session, user_token_headers, monkeypatch
+    ) -> None:
+        # GIVEN
+        _, created_by_id = create_random_movies(db, count=4)
+        movie = crud.movie.get_multi_by_owner(db, created_by_id=created_by_id)[0]
+        monkeypatch.setattr(response_cache, "backend", None)
+        list_url, detail_url = f"{self.movie_url}?limit=3", f"{self.movie_url}{movie.id}/"
+        default = client.get(list_url, headers=user_token_headers), client.get(detail_url, headers=user_token_headers)
+
+        # WHEN
+        monkeypatch.setattr(settings, "FAST_SERIALIZATION", True)
+        fast = client.get(list_url, headers=user_token_headers), client.get(detail_url, headers=user_token_headers)
+
+        # THEN
+        assert [response.content for response in fast] == [response.content for response in default]
+        assert fast[0].headers["X-Next-Cursor"] == default[0].headers["X-Next-Cursor"]
+
+    def test_get_movies_from_catalogue_snapshot_renders_the_same(
+        self, client: TestClient, db: Session, user_token_headers, monkeypatch
+    ) -> None:
+        # GIVEN
+        pytest.importorskip("numpy")
+        create_random_movies(db, count=5)
+        monkeypatch.setattr(response_cache, "backend", None)
+        url = f"{self.movie_url}?imdb_score[gte]=0&sort=-popularity&limit=2&count=exact"
+        default = client.get(url, headers=user_token_headers)
+        next_url = f"{url}&cursor={default.headers['X-Next-Cursor']}"
+        default_next = client.get(next_url, headers=user_token_headers)
+
+        # WHEN
+        monkeypatch.setattr(settings, "CATALOGUE_SNAPSHOT", True)
+        # rebuilds read the primary, the test data is only in the test transaction
+        catalogue.build(db.execute(crud.movie.catalogue_statement()), version=0)
+        snapshot = client.get(url, headers=user_token_headers)
+        snapshot_next = client.get(next_url, headers=user_token_headers)
+
+        # THEN
+        assert snapshot.content == default.content
+        assert snapshot_next.content == default_next.content
+        assert snapshot.headers["ETag"] == default.headers["ETag"]
+        assert snapshot.headers["X-Total-Count"] == default.headers["X-Total-Count"]
+
+    def test_get_movies_serves_cached_pages_precompressed(
+        self, client: TestClient, db: Session, user_token_headers, monkeypatch
+    ) -> None:
+        # GIVEN
+        create_random_movies(db, count=20)
+        headers = {**user_token_headers, "Accept-Encoding": "gzip"}
+        url = f"{self.movie_url}?limit=20"
+        first = client.get(url, headers=headers)
+
+        # WHEN
+        compressed = []
+        monkeypatch.setattr(compression_middleware, "compress", lambda *args: compressed.append(args))
+        cached = client.get(url, headers=headers)
+
+        # THEN
+        assert first.headers["Content-Encoding"] == cached.headers["Content-Encoding"] == "gzip"
+        assert cached.content == first.content
+        assert compressed == []
+
+    def test_get_movies_stays_within_query_budget(
+        self, client: TestClient, db: Session, user_token_headers, get_movie, query_budget, monkeypatch
+    ) -> None:
+        # GIVEN
+        create_random_movies(db, count=3)
+        monkeypatch.setattr(response_cache, "backend", None)
+        client.get(self.movie_url, headers=user_token_headers)
+
+        # WHEN/THEN
+        with query_budget(2):
+            listing = client.get(self.movie_url, headers=user_token_headers)
+        with query_budget(1):
+            detail = client.get(f"{self.movie_url}{get_movie.id}/", headers=user_token_headers)
+        assert listing.status_code == detail.status_code == status.HTTP_200_OK
+        assert listing.headers["Server-Timing"].startswith('db;desc="2 queries"')
+
+    def test_get_movies_with_fields(self, client: TestClient, db: Session, user_token_headers) -> None:
+        # GIVEN
+        _, created_by_id = create_random_movies(db, count=2)
+        movie = crud.movie.get_multi_by_owner(db, created_by_id=created_by_id)[0]
+
+        # WHEN
+        params = {"fields": "imdb_score,id, name", "limit": 1, "sort": "-imdb_score"}
+        listed = client.get(self.movie_url, params=params, headers=user_token_headers)
+        detail = client.get(f"{self.movie_url}{movie.id}/", params=params, headers=user_token_headers)
+        unknown = client.get(self.movie_url, params={"fields": "id,secret"}, headers=user_token_headers)
+
+        # THEN
+        assert listed.status_code == status.HTTP_200_OK
+        assert [list(item) for item in listed.json()] == [["name", "imdb_score", "id"]]
+        assert "X-Next-Cursor" in listed.headers
+        assert detail.json() == {"name": movie.name, "imdb_score": movie.imdb_score, "id": str(movie.id)}
+        assert unknown.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_get_movie_raises_404_for_invalid_movie_id(self, client: TestClient, user_token_headers) -> None:
         # GIVEN/WHEN
         movie_id = uuid.uuid4()
@@ -62,6 +359,21 @@ class TestMovieEndpoints:
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["id"] == str(movie_id)
 
+    def test_get_movie_returns_304_for_matching_etag(self, client: TestClient, user_token_headers, get_movie) -> None:
+        # GIVEN
+        url = f"{self.movie_url}{get_movie.id}/"
+        etag = client.get(url, headers=user_token_headers).headers["ETag"]
+
+        # WHEN
+        response = client.get(url, headers={**user_token_headers, "If-None-Match": etag})
+        stale = client.get(url, headers={**user_token_headers, "If-None-Match": 'W/"stale"'})
+
+        # THEN
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert stale.status_code == status.HTTP_200_OK
+        assert stale.json()["id"] == str(get_movie.id)
+
     def test_create_movie_raises_401_for_unauthorized_user(self, client: TestClient, user_token_headers) -> None:
         # GIVEN/WHEN
         movie_data = {
@@ -139,3 +451,33 @@ class TestMovieEndpoints:
 
         # THEN
         assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    def test_bulk_endpoints(self, client: TestClient, db: Session, admin_token_headers) -> None:
+        # GIVEN
+        other = create_random_movie(db)
+        items = [
+            {"director": "Bulk", "genre": ["Drama"], "imdb_score": 7.0, "name": "Bulk One"},
+            {"director": "Bulk", "genre": ["Drama"], "imdb_score": 8.0, "name": "Bulk Two"},
+        ]
+
+        # WHEN
+        created = client.post(f"{self.movie_url}bulk/", json={"items": items}, headers=admin_token_headers)
+        ids = [movie["id"] for movie in created.json()]
+        updates = [{"id": id_, "name": "Bulk Renamed"} for id_ in ids]
+        updated = client.patch(f"{self.movie_url}bulk/", json={"items": updates}, headers=admin_token_headers)
+        not_owned = client.patch(
+            f"{self.movie_url}bulk/",
+            json={"items": [{"id": str(other.id), "name": "Stolen"}]},
+            headers=admin_token_headers,
+        )
+        deleted = client.delete(f"{self.movie_url}bulk/", json={"ids": ids}, headers=admin_token_headers)
+
+        # THEN
+        assert created.status_code == status.HTTP_201_CREATED
+        assert [movie["popularity"] for movie in created.json()] == [70.0, 80.0]
+        assert updated.status_code == status.HTTP_200_OK
+        assert {movie["name"] for movie in updated.json()} == {"Bulk Renamed"}
+        assert not_owned.status_code == status.HTTP_400_BAD_REQUEST
+        assert str(other.id) in not_owned.json()["detail"]
+        assert deleted.status_code == status.HTTP_204_NO_CONTENT
+        assert all(crud.movie.get(db, id=id_) is None for id_ in ids)
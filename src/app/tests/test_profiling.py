@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.db.profiling import ProfilingMiddleware, QueryProfile, QueryStats, instrument, query_stats
+
+
+class TestQueryProfile:
+    def test_keeps_the_slowest_statements(self):
+        # GIVEN
+        profile = QueryProfile(keep_slowest=2)
+
+        # WHEN
+        for statement, seconds in (("a", 0.01), ("b", 0.03), ("c", 0.02), ("d", 0.001)):
+            profile.record(statement, seconds)
+
+        # THEN
+        assert profile.statements == 4
+        assert profile.slowest == [(0.03, "b"), (0.02, "c")]
+        assert profile.server_timing() == 'db;desc="4 queries";dur=61.00, db-slowest;dur=30.00'
+
+
+class TestQueryStats:
+    def test_aggregates_by_statement(self):
+        # GIVEN
+        stats = QueryStats(keep_slowest=1)
+
+        # WHEN
+        stats.record("SELECT 1", 0.01)
+        stats.record("SELECT 1", 0.03)
+        stats.record("SELECT 2", 0.02)
+
+        # THEN
+        assert stats.as_dict() == {
+            "statements": 3,
+            "seconds_total": pytest.approx(0.06),
+            "slowest": [
+                {
+                    "statement": "SELECT 1",
+                    "count": 2,
+                    "seconds_total": pytest.approx(0.04),
+                    "seconds_max": 0.03,
+                }
+            ],
+        }
+
+
+class TestProfilingMiddleware:
+    def test_sends_the_statements_of_the_request_in_server_timing(self, tmp_path):
+        # GIVEN
+        engine = instrument(create_engine(f"sqlite:///{tmp_path / 'profiling.db'}"))
+        app = FastAPI()
+        app.add_middleware(ProfilingMiddleware)
+
+        @app.get("/")
+        def endpoint():
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                connection.execute(text("SELECT 2"))
+            return {}
+
+        before = query_stats.statements
+
+        # WHEN
+        response = TestClient(app).get("/")
+
+        # THEN
+        assert response.headers["Server-Timing"].startswith('db;desc="2 queries";dur=')
+        assert query_stats.statements - before == 2
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette import status
+
+from app.ratelimit import AdmissionController, MemoryLimiter, RateLimit, RespLimiter, limiters
+from app.tests.utils import random_email, random_lower_string
+from config import settings
+
+
+class TestRateLimit:
+    def test_rejects_unknown_options(self):
+        # GIVEN/WHEN/THEN
+        with pytest.raises(ValueError):
+            RateLimit("x", limit=1, period=1, algorithm="leaky_bucket")
+        with pytest.raises(ValueError):
+            RateLimit("x", limit=1, period=1, by=("country",))
+
+
+class TestMemoryLimiter:
+    def test_token_bucket_allows_bursts_and_refills(self):
+        # GIVEN
+        limiter = MemoryLimiter(maxsize=100)
+        rule = RateLimit("test", limit=3, period=3)
+
+        # WHEN
+        burst = [limiter.token_bucket(rule, "client", 100.0) for _ in range(4)]
+        other_client = limiter.token_bucket(rule, "other", 100.0)
+        refilled = limiter.token_bucket(rule, "client", 101.0)
+
+        # THEN
+        assert [decision.allowed for decision in burst] == [True, True, True, False]
+        assert burst[0].remaining == 2
+        assert burst[3].retry_after == pytest.approx(1.0)
+        assert other_client.allowed
+        assert refilled.allowed
+
+    def test_sliding_window_weighs_the_previous_window(self):
+        # GIVEN
+        limiter = MemoryLimiter(maxsize=100)
+        rule = RateLimit("test", limit=4, period=10, algorithm="sliding_window")
+        for _ in range(4):
+            assert limiter.sliding_window(rule, "client", 105.0).allowed
+
+        # WHEN
+        same_window = limiter.sliding_window(rule, "client", 109.0)
+        # a quarter into the next window, 3 of the previous 4 requests still count
+        next_window = [limiter.sliding_window(rule, "client", 112.5) for _ in range(2)]
+        later = limiter.sliding_window(rule, "client", 117.5)
+
+        # THEN
+        assert not same_window.allowed
+        assert same_window.retry_after == pytest.approx(1.0)
+        assert [decision.allowed for decision in next_window] == [True, False]
+        assert next_window[1].retry_after == pytest.approx(2.5)
+        assert later.allowed
+
+
+class TestRespLimiter:
+    def test_errors_let_requests_through(self):
+        # GIVEN
+        limiter = RespLimiter("redis://127.0.0.1:1/0")
+        rule = RateLimit("test", limit=1, period=60)
+
+        # WHEN/THEN
+        assert limiter.hit(rule, "client").allowed
+        assert limiter.hit(rule, "client").allowed
+
+
+class TestAdmissionController:
+    def test_sheds_beyond_the_queue(self):
+        async def scenario():
+            # GIVEN
+            controller = AdmissionController(max_concurrency=1, queue_size=1, queue_timeout=0.05)
+            assert await controller.acquire()
+
+            # WHEN
+            queued = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            beyond_queue = await controller.acquire()
+            timed_out = await queued
+            controller.release()
+            after_release = await controller.acquire()
+
+            # THEN
+            assert beyond_queue is False
+            assert timed_out is False
+            assert after_release is True
+
+        asyncio.run(scenario())
+
+
+class TestRateLimitedEndpoints:
+    def test_login_is_limited_per_ip(self, client: TestClient, monkeypatch) -> None:
+        # GIVEN
+        monkeypatch.setattr(limiters, "rate_limiter", MemoryLimiter(maxsize=100))
+        data = {"username": random_email(), "password": random_lower_string()}
+
+        # WHEN
+        responses = [client.post(f"{settings.API_V1_STR}/login/", data=data) for _ in range(11)]
+
+        # THEN
+        assert {response.status_code for response in responses[:10]} == {status.HTTP_400_BAD_REQUEST}
+        assert responses[10].status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(responses[10].headers["Retry-After"]) >= 1
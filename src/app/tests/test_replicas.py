@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints.movies import serves_fresh
+from app.cache.backends import MemoryBackend
+from app.cache.responses import ResponseCache
+from app.db.replicas import PrimaryPins, ReplicaRouter
+from config import settings, to_async_uri
+
+
+@pytest.fixture
+def replica_engines(tmp_path: Path):
+    # SQLite files standing in for two replicas, each knows its name
+    engines = []
+    for name in ("replica_a", "replica_b"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE replica (name TEXT)"))
+            connection.execute(text("INSERT INTO replica VALUES (:name)"), {"name": name})
+        engines.append(engine)
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+def replica_name(session) -> str:
+    return session.execute(text("SELECT name FROM replica")).scalar()
+
+
+class TestReplicaRouter:
+    def test_round_robin(self, replica_engines):
+        # GIVEN
+        router = ReplicaRouter(len(replica_engines), "round_robin")
+        Session = sessionmaker()
+
+        # WHEN
+        names = []
+        for _ in range(4):
+            with router.choose() as index, Session(bind=replica_engines[index]) as session:
+                names.append(replica_name(session))
+
+        # THEN
+        assert names == ["replica_a", "replica_b", "replica_a", "replica_b"]
+        assert router.in_use == [0, 0]
+
+    def test_least_connections(self, replica_engines):
+        # GIVEN
+        router = ReplicaRouter(len(replica_engines), "least_connections")
+        Session = sessionmaker()
+
+        # WHEN
+        with router.choose() as busy:
+            with router.choose() as first, router.choose() as second:
+                names = [
+                    replica_name(Session(bind=replica_engines[index])) for index in (first, second)
+                ]
+
+        # THEN
+        assert first != busy
+        assert names[0] != names[1]
+        assert router.in_use == [0, 0]
+
+    def test_rejects_unknown_strategy(self):
+        # GIVEN/WHEN/THEN
+        with pytest.raises(ValueError):
+            ReplicaRouter(2, "random")
+
+
+class TestPrimaryPins:
+    def test_pins_clients_that_wrote(self):
+        # GIVEN
+        pins = PrimaryPins(ttl=60)
+
+        # WHEN
+        pins.pin("Bearer writer")
+        pins.pin(None)
+
+        # THEN
+        assert pins.pinned("Bearer writer")
+        assert not pins.pinned("Bearer reader")
+        assert not pins.pinned(None)
+
+
+class TestReplicaFreshness:
+    def test_replica_reads_are_not_fresh_right_after_a_write(self, replica_engines, monkeypatch):
+        # GIVEN
+        cache = ResponseCache(MemoryBackend(maxsize=10), ttl=60)
+        monkeypatch.setattr("app.api.endpoints.movies.response_cache", cache)
+        monkeypatch.setattr(settings, "SQLALCHEMY_REPLICA_URIS", ["sqlite://"])
+        primary = sessionmaker(bind=replica_engines[0])()
+        replica = sessionmaker(bind=replica_engines[1])(info={"replica": True})
+        fresh_before = serves_fresh(replica)
+
+        # WHEN
+        cache.invalidate_movies(bulk=True)
+
+        # THEN
+        assert fresh_before
+        assert serves_fresh(primary)
+        assert not serves_fresh(replica)
+
+    def test_async_uris(self):
+        # GIVEN/WHEN/THEN
+        assert to_async_uri("postgresql://u:p@db/imdb") == "postgresql+asyncpg://u:p@db/imdb"
+        assert to_async_uri("postgresql+psycopg2://db/imdb") == "postgresql+asyncpg://db/imdb"
+        assert to_async_uri("sqlite:////tmp/replica.db") == "sqlite+aiosqlite:////tmp/replica.db"
+        with pytest.raises(ValueError):
+            to_async_uri("mysql://db/imdb")
@@ -0,0 +1,95 @@
+import uuid
+
+from app.search import InMemorySearchIndex, tokenize
+
+
+class TestInMemorySearchIndex:
+    def build_index(self):
+        index = InMemorySearchIndex()
+        ids = [uuid.uuid4() for _ in range(3)]
+        index.build(
+            [
+                (ids[0], "The Dark Knight", "Christopher Nolan"),
+                (ids[1], "Nolan's Knight", "Someone Else"),
+                (ids[2], "Star Wars", "George Lucas"),
+            ]
+        )
+        return index, ids
+
+    def test_tokenize(self):
+        # GIVEN/WHEN/THEN
+        assert tokenize("The Dark-Knight!") == ["the", "dark", "knight"]
+        assert tokenize(None) == []
+
+    def test_search_matches_prefixes_of_every_token(self):
+        # GIVEN
+        index, ids = self.build_index()
+
+        # WHEN
+        results = index.search("dar kni")
+
+        # THEN
+        assert [id_ for id_, _ in results] == [ids[0]]
+
+    def test_search_ranks_name_matches_first(self):
+        # GIVEN
+        index, ids = self.build_index()
+
+        # WHEN
+        results = index.search("nolan")
+
+        # THEN
+        assert [id_ for id_, _ in results] == [ids[1], ids[0]]
+
+    def test_add_and_remove(self):
+        # GIVEN
+        index, ids = self.build_index()
+        new_id = uuid.uuid4()
+
+        # WHEN
+        index.add(new_id, "Star Trek", "J.J. Abrams")
+        index.remove(ids[2])
+
+        # THEN
+        assert [id_ for id_, _ in index.search("star")] == [new_id]
+
+    def test_add_is_ignored_until_built(self):
+        # GIVEN
+        index = InMemorySearchIndex()
+
+        # WHEN
+        index.add(uuid.uuid4(), "Star Trek", "J.J. Abrams")
+
+        # THEN
+        assert index.search("star") == []
+
+    def test_refresh_rebuilds_for_other_versions(self):
+        # GIVEN
+        index, ids = self.build_index()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return [(ids[0], "The Dark Knight", "Christopher Nolan")]
+
+        # WHEN
+        index.refresh(0, load)
+        index.refresh(1, load)
+        index.refresh(1, load)
+
+        # THEN
+        assert len(loads) == 1
+        assert [id_ for id_, _ in index.search("star")] == []
+
+    def test_own_writes_advance_the_version(self):
+        # GIVEN
+        index, ids = self.build_index()
+
+        # WHEN
+        index.advance(1)
+        followed = index.is_current(1)
+        index.advance(3)
+
+        # THEN
+        assert followed
+        assert index.is_current(1)
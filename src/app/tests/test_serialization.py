@@ -0,0 +1,47 @@
+import datetime
+import json
+import uuid
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.api import serialization
+from app.api.serialization import dumps, partial_schema
+from app.schemas import Movie
+
+
+class TestDumps:
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_matches_jsonable_encoder(self, use_orjson: bool, monkeypatch):
+        # GIVEN
+        if not use_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        content = [
+            {
+                "id": uuid.uuid4(),
+                "name": "Amélie",
+                "popularity": None,
+                "imdb_score": 8.0,
+                "genre": ["Comedy", "Romance"],
+                "created_at": datetime.datetime(2022, 10, 28, 12, 30, 15, 123456),
+            }
+        ]
+
+        # WHEN
+        body = dumps(content)
+
+        # THEN
+        expected = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":"))
+        assert body == expected.encode()
+
+
+class TestPartialSchema:
+    def test_is_cached_per_field_set(self):
+        # GIVEN/WHEN
+        schema = partial_schema(Movie, ("name", "popularity", "id"))
+
+        # THEN
+        assert schema is partial_schema(Movie, ("name", "popularity", "id"))
+        assert list(schema.__fields__) == ["name", "popularity", "id"]
+        assert not schema.__fields__["popularity"].required
+        assert schema.__config__.orm_mode
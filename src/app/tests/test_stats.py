@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette import status
+
+from app import crud
+from app.tests.utils import create_random_movie, random_lower_string
+from config import settings
+
+
+class TestStats:
+    stats_url = f"{settings.API_V1_STR}/movies/stats/"
+
+    def test_aggregates_follow_movie_writes(self, db: Session):
+        # GIVEN
+        genre, director = random_lower_string(), random_lower_string()
+        first = create_random_movie(db, director=director, genre=[genre], imdb_score=6.0, popularity=60.0)
+        second = create_random_movie(db, director=director, genre=[genre, "Drama"], imdb_score=8.0, popularity=80.0)
+
+        # WHEN
+        created = crud.stats.genre(db, genre=genre)
+        crud.movie.update_by_id(db, id=first.id, data={"imdb_score": 9.0, "genre": ["Drama"]})
+        updated = crud.stats.genre(db, genre=genre), crud.stats.director(db, director=director)
+        crud.movie.remove(db, id=second.id)
+        crud.movie.remove(db, id=first.id)
+
+        # THEN
+        assert (created.movie_count, created.avg_imdb_score, created.avg_popularity) == (2, 7.0, 70.0)
+        assert (updated[0].movie_count, updated[0].avg_imdb_score) == (1, 8.0)
+        assert (updated[1].movie_count, updated[1].avg_imdb_score) == (2, 8.5)
+        assert crud.stats.genre(db, genre=genre) is None
+        assert crud.stats.director(db, director=director) is None
+
+    def test_top_rated(self, db: Session):
+        # GIVEN
+        genre = random_lower_string()
+        scores = [7.0, 9.0, 8.0]
+        movies = [create_random_movie(db, genre=[genre], imdb_score=score) for score in scores]
+
+        # WHEN
+        top = crud.stats.top_rated(db, genre=genre, limit=2)
+
+        # THEN
+        assert [movie.imdb_score for movie in top] == [9.0, 8.0]
+        assert {movie.id for movie in top} <= {movie.id for movie in movies}
+
+    def test_directors_rejects_unindexed_sort(self, db: Session):
+        # GIVEN/WHEN/THEN
+        with pytest.raises(ValueError):
+            crud.stats.directors(db, sort="imdb_score_sum")
+
+    def test_stats_endpoints(self, client: TestClient, db: Session, user_token_headers):
+        # GIVEN
+        genre, director = random_lower_string(), random_lower_string()
+        create_random_movie(db, director=director, genre=[genre], imdb_score=7.0)
+        create_random_movie(db, director=director, genre=[genre], imdb_score=9.0)
+
+        # WHEN
+        genre_stats = client.get(f"{self.stats_url}genres/{genre}/", headers=user_token_headers)
+        top = client.get(f"{self.stats_url}genres/{genre}/top/", headers=user_token_headers)
+        directors = client.get(
+            f"{self.stats_url}directors/",
+            params={"sort": "avg_imdb_score", "min_movies": 2},
+            headers=user_token_headers,
+        )
+        missing = client.get(f"{self.stats_url}directors/{random_lower_string()}/", headers=user_token_headers)
+
+        # THEN
+        assert genre_stats.json()["movie_count"] == 2
+        assert [movie["imdb_score"] for movie in top.json()] == [9.0, 7.0]
+        assert directors.status_code == status.HTTP_200_OK
+        assert director in [stats["director"] for stats in directors.json()]
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
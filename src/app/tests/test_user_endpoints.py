@@ -1,7 +1,9 @@
 from fastapi import status
 from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
 
-from app.tests.utils import random_lower_string, random_email
+from app.cache.tokens import token_cache
+from app.tests.utils import create_user, random_lower_string, random_email
 from config import settings
 from core import create_access_token
 
@@ -48,3 +50,15 @@ class TestUserEndpoints:
         r = client.post(self.reset_password_url, json=data, headers={"Authorization": f"Bearer {access_token}"})
         assert r.status_code == status.HTTP_202_ACCEPTED
         assert r.json()["msg"] == "Password updated successfully"
+
+    def test_reset_password_invalidates_cached_tokens(self, client: TestClient, db: Session) -> None:
+        user, password = create_user(db, is_admin=False)
+        access_token = create_access_token(user.id)
+        headers = {"Authorization": f"Bearer {access_token}"}
+        client.get(f"{settings.API_V1_STR}/movies/", headers=headers)
+        assert access_token in token_cache
+
+        data = {"old_password": password, "new_password": "new"}
+        r = client.post(self.reset_password_url, json=data, headers=headers)
+        assert r.status_code == status.HTTP_202_ACCEPTED
+        assert access_token not in token_cache
@@ -1,6 +1,6 @@
 import random
 import string
-from typing import Dict, Tuple, Any, List
+from typing import Dict, Tuple, Any, List, Sequence
 from typing import Optional
 
 from fastapi.testclient import TestClient
@@ -77,11 +77,26 @@ def create_random_movie(
     return crud.movie.create_with_owner(db=db, obj=movie_obj, created_by_id=created_by_id)
 
 
-def create_random_movies(db: Session, *, created_by_id: Optional[int] = None, count: int = 5) -> Tuple[int, Any]:
+def create_random_movies(
+    db: Session,
+    *,
+    created_by_id: Optional[int] = None,
+    count: int = 5,
+    genres: Optional[Sequence[str]] = None,
+) -> Tuple[int, Any]:
+    """
+    Insert `count` random movies. With `genres` every movie gets one to
+    three of them instead of two random strings, so genre filters match.
+    """
     if created_by_id is None:
         user, _ = create_user(db, is_admin=True)
         created_by_id = user.id
 
+    def random_genres() -> List[str]:
+        if not genres:
+            return [random_lower_string(), random_lower_string()]
+        return random.sample(list(genres), k=random.randint(1, min(3, len(genres))))
+
     popularity = [random.randint(80, 100) for _ in range(count)]
     imdb_score = [random.randint(8, 10) for _ in range(count)]
     movie_objs = [
@@ -90,7 +105,7 @@ def create_random_movies(db: Session, *, created_by_id: Optional[int] = None, co
             director=random_lower_string(),
             popularity=float(random.choice(popularity)),
             imdb_score=float(random.choice(imdb_score)),
-            genre=[random_lower_string(), random_lower_string()],
+            genre=random_genres(),
             created_by_id=created_by_id,
         )
         for _ in range(count)
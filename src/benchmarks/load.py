@@ -0,0 +1,289 @@
+"""
+Load benchmark of the API.
+
+Boots `main.app` in process against a seeded database and drives workloads
+through `TestClient` from a pool of threads:
+
+- login: bursts of logins, each one a bcrypt verification
+- listing: filtered listings with varying filters and sorts
+- pagination: walks deep into the listing following `X-Next-Cursor`
+- writes: admin create, update and delete cycles
+- mixed: all of the above, mostly reads
+
+Every scenario reports p50/p95/p99 latency, requests per second and SQL
+statements per request. Results are written as JSON so runs of different
+commits can be diffed.
+
+    python -m benchmarks.load --movies 50000 --seconds 10 --concurrency 8 --output bench.json
+
+The database at `--database-url` (the test database by default) is dropped
+and seeded again unless `--no-seed` is given. The response cache is off
+unless `--response-cache` is given, so the database paths are measured.
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.deps import get_db, get_read_db
+from app.cache.responses import response_cache
+from app.db.base_class import Base
+from app.tests.utils import create_random_movies, create_user, random_lower_string
+from config import settings
+from main import app
+
+API = settings.API_V1_STR
+MOVIES_URL = f"{API}/movies/"
+
+GENRES = (
+    "Action", "Adventure", "Animation", "Comedy", "Crime", "Drama", "Family",
+    "Fantasy", "Horror", "Mystery", "Romance", "Sci-Fi", "Thriller", "Western",
+)
+SORTS = ("created_at", "-created_at", "-imdb_score", "-popularity")
+
+# share of each scenario in the mixed workload
+MIX = {"listing": 70, "pagination": 15, "writes": 10, "login": 5}
+
+
+class Database:
+    """The benchmark database, counting the statements run against it."""
+
+    def __init__(self, url: str):
+        self.engine: Engine = create_engine(url, pool_size=32, max_overflow=0)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.statements = 0
+        self._lock = threading.Lock()
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args: Any) -> None:
+        with self._lock:
+            self.statements += 1
+
+    def get_db(self) -> Generator:
+        db = self.Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def seed(self, movies: int, batch_size: int) -> None:
+        """Re-create the tables and insert `movies` random movies."""
+        Base.metadata.drop_all(bind=self.engine)
+        Base.metadata.create_all(bind=self.engine)
+        with self.Session() as db:
+            owner, _ = create_user(db, is_admin=True)
+            for start in range(0, movies, batch_size):
+                count = min(batch_size, movies - start)
+                create_random_movies(db, created_by_id=owner.id, count=count, genres=GENRES)
+                print(f"seeded {start + count}/{movies} movies", end="\r", flush=True)
+            db.execute(text("ANALYZE movies"))
+            db.commit()
+        print()
+
+    def credentials(self) -> Dict[str, Dict[str, str]]:
+        """A fresh admin and normal user to log in as."""
+        with self.Session() as db:
+            admin, admin_password = create_user(db, is_admin=True)
+            user, user_password = create_user(db, is_admin=False)
+        return {
+            "admin": {"username": admin.email, "password": admin_password},
+            "user": {"username": user.email, "password": user_password},
+        }
+
+
+class Worker:
+    """State of one client thread, e.g. its cursor and the movie it writes."""
+
+    def __init__(self, client: TestClient, credentials: Dict[str, Dict[str, str]], seed: int):
+        self.client = client
+        self.credentials = credentials
+        self.random = random.Random(seed)
+        self.headers = {role: self.login_headers(role) for role in ("user", "admin")}
+        self.cursor: Optional[str] = None
+        self.movie_id: Optional[str] = None
+
+    def login_headers(self, role: str) -> Dict[str, str]:
+        token = self.client.post(f"{API}/login/", data=self.credentials[role]).json()
+        return {"Authorization": f"Bearer {token['access_token']}"}
+
+    def login(self):
+        return self.client.post(f"{API}/login/", data=self.credentials["user"])
+
+    def listing(self):
+        params = {
+            "imdb_score[gte]": self.random.choice((8, 9, 9.5)),
+            "genre[in]": ",".join(self.random.sample(GENRES, 2)),
+            "sort": self.random.choice(SORTS),
+            "limit": 50,
+        }
+        return self.client.get(MOVIES_URL, params=params, headers=self.headers["user"])
+
+    def pagination(self):
+        params = {"limit": 100, "sort": "-imdb_score"}
+        if self.cursor:
+            params["cursor"] = self.cursor
+        response = self.client.get(MOVIES_URL, params=params, headers=self.headers["user"])
+        self.cursor = response.headers.get("X-Next-Cursor")
+        return response
+
+    def writes(self):
+        headers = self.headers["admin"]
+        if self.movie_id is None:
+            movie = {
+                "name": random_lower_string(),
+                "director": random_lower_string(),
+                "imdb_score": round(self.random.uniform(1, 10), 1),
+                "genre": self.random.sample(GENRES, 2),
+            }
+            response = self.client.post(MOVIES_URL, json=movie, headers=headers)
+            self.movie_id = response.json().get("id")
+            return response
+        if self.random.random() < 0.5:
+            data = {"imdb_score": round(self.random.uniform(1, 10), 1)}
+            return self.client.patch(f"{MOVIES_URL}{self.movie_id}/", json=data, headers=headers)
+        response = self.client.delete(f"{MOVIES_URL}{self.movie_id}/", headers=headers)
+        self.movie_id = None
+        return response
+
+    def mixed(self):
+        name = self.random.choices(list(MIX), weights=list(MIX.values()))[0]
+        return getattr(self, name)()
+
+
+SCENARIOS = ("login", "listing", "pagination", "writes", "mixed")
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest rank percentile of sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_scenario(
+    database: Database,
+    workers: List[Worker],
+    scenario: str,
+    seconds: float,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def drive(worker: Worker) -> None:
+        action: Callable = getattr(worker, scenario)
+        own: List[Tuple[float, int]] = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = action()
+            own.append((time.perf_counter() - started, response.status_code))
+        with lock:
+            for latency, status_code in own:
+                latencies.append(latency)
+                statuses[status_code] += 1
+
+    statements = database.statements
+    started = time.perf_counter()
+    threads = [threading.Thread(target=drive, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    statements = database.statements - statements
+
+    latencies.sort()
+    requests = len(latencies)
+    return {
+        "requests": requests,
+        "errors": sum(count for status_code, count in statuses.items() if status_code >= 400),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "rps": requests / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": sum(latencies) / (requests or 1) * 1000,
+            "max": (latencies[-1] if latencies else 0.0) * 1000,
+        },
+        "queries_per_request": statements / (requests or 1),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=settings.SQLALCHEMY_TEST_DATABASE_URI)
+    parser.add_argument("--movies", type=int, default=10_000, help="movies to seed")
+    parser.add_argument("--seed-batch-size", type=int, default=1_000)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the existing data")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seconds", type=float, default=10.0, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--response-cache", action="store_true")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    database = Database(args.database_url)
+    if not args.no_seed:
+        database.seed(args.movies, args.seed_batch_size)
+    if not args.response_cache:
+        response_cache.backend = None
+    app.dependency_overrides[get_db] = database.get_db
+    app.dependency_overrides[get_read_db] = database.get_db
+
+    credentials = database.credentials()
+    clients = [TestClient(app, raise_server_exceptions=False) for _ in range(args.concurrency)]
+    results: Dict[str, Any] = {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "options": {key: value for key, value in vars(args).items() if key != "database_url"},
+        "scenarios": {},
+    }
+    for client in clients:
+        client.__enter__()
+    try:
+        workers = [Worker(client, credentials, seed) for seed, client in enumerate(clients)]
+        for scenario in args.scenarios:
+            result = run_scenario(database, workers, scenario, args.seconds)
+            results["scenarios"][scenario] = result
+            latency = result["latency_ms"]
+            print(
+                f"{scenario:>10}: {result['rps']:8.1f} req/s  p50 {latency['p50']:7.1f} ms"
+                f"  p95 {latency['p95']:7.1f} ms  p99 {latency['p99']:7.1f} ms"
+                f"  {result['queries_per_request']:5.1f} queries/req  {result['errors']} errors"
+            )
+    finally:
+        for client in clients:
+            client.__exit__(None, None, None)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
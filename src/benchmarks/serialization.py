@@ -0,0 +1,74 @@
+"""
+Serializer benchmark for movie list pages.
+
+Compares rendering a page of movies through the schema (`from_orm`,
+`jsonable_encoder`, `json.dumps`) with dumping column rows directly, the
+path used with `settings.FAST_SERIALIZATION`. No database is needed.
+
+    python -m benchmarks.serialization --page-size 100 --seconds 2
+"""
+import argparse
+import datetime
+import random
+import time
+import uuid
+from typing import Callable, List
+
+from sqlalchemy.engine import Row, result_tuple
+
+from app.api.endpoints.movies import MOVIE_FIELDS, render_movies
+from app.models import Movies
+
+
+def make_page(size: int):
+    now = datetime.datetime.now()
+    entities, rows = [], []
+    make_row = result_tuple(MOVIE_FIELDS)
+    for i in range(size):
+        values = {
+            "id": uuid.uuid4(),
+            "name": f"Movie {i}",
+            "director": f"Director {i}",
+            "popularity": random.uniform(0, 100),
+            "imdb_score": random.uniform(0, 10),
+            "genre": ["Drama", "Action", "Sci-Fi"],
+            "created_by_id": uuid.uuid4(),
+            "created_at": now,
+            "updated_at": now,
+        }
+        entities.append(Movies(**values))
+        rows.append(make_row([values[name] for name in MOVIE_FIELDS]))
+    return entities, rows
+
+
+def measure(render: Callable[[], object], seconds: float) -> float:
+    """Renders per second over roughly `seconds`."""
+    count, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        render()
+        count += 1
+    return count / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    entities, rows = make_page(args.page_size)
+    assert isinstance(rows[0], Row)
+    schema_body = render_movies(entities, etag="").body
+    fast_body = render_movies(rows, etag="").body
+    assert schema_body == fast_body, "the two paths must render the same JSON"
+
+    results: List[tuple] = []
+    for name, page in (("schema", entities), ("columns", rows)):
+        rate = measure(lambda: render_movies(page, etag=""), args.seconds)
+        results.append((name, rate))
+        print(f"{name:>8}: {rate:10.1f} pages/s  {1000 / rate:8.3f} ms/page")
+    print(f"speedup: {results[1][1] / results[0][1]:.1f}x for {args.page_size} movies per page")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import logging
 
 from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
 
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, ensure_database
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,8 +18,9 @@ wait_seconds = 1
     after=after_log(logger, logging.WARN),
 )
 def check_db() -> None:
-    """Check if the database is ready to accept connections."""
+    """Check if the database is ready to accept connections, creating it if needed."""
     try:
+        ensure_database()
         db = SessionLocal()
         # Try to create session to check if DB is awake
         db.execute("SELECT 1")
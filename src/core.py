@@ -1,5 +1,10 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from time import perf_counter
+from typing import Any, Callable, Dict, Union
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -9,6 +14,113 @@ from config import settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool can't take more work."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own bounded thread pool.
+
+    bcrypt releases the GIL, so a small dedicated pool caps how much CPU
+    password work can take, independently of the request threadpool. At most
+    `workers + queue_size` operations are admitted at once, anything beyond
+    that is rejected immediately with `PasswordHasherBusy` (a 429) instead
+    of queueing behind a login burst.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._hash_seconds = 0.0
+        self._max_hash_seconds = 0.0
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy("Too many concurrent password operations")
+        with self._lock:
+            self._queued += 1
+        submitted = perf_counter()
+
+        def task():
+            started = perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return fn(*args)
+            finally:
+                elapsed = perf_counter() - started
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._wait_seconds += started - submitted
+                    self._hash_seconds += elapsed
+                    self._max_hash_seconds = max(self._max_hash_seconds, elapsed)
+
+        future = self._executor.submit(task)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: Future) -> None:
+        if future.cancelled():
+            # never started, so it is still counted as queued
+            with self._lock:
+                self._queued -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable, *args: Any) -> Any:
+        """Run `fn` on the pool and wait for it, for sync callers."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            raise PasswordHasherBusy("Password operation timed out") from e
+
+    async def run_async(self, fn: Callable, *args: Any) -> Any:
+        """Run `fn` on the pool without blocking the event loop."""
+        future = asyncio.wrap_future(self.submit(fn, *args))
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError as e:
+            raise PasswordHasherBusy("Password operation timed out") from e
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Queue depth and latency figures, exported by the metrics endpoint."""
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "wait_seconds_total": self._wait_seconds,
+                "hash_seconds_total": self._hash_seconds,
+                "hash_seconds_avg": self._hash_seconds / completed,
+                "hash_seconds_max": self._max_hash_seconds,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
+
+
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
 ) -> str:
@@ -23,9 +135,19 @@ def create_access_token(
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies plain text password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.run(pwd_context.verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Generates hash for a plain text password"""
-    return pwd_context.hash(password)
+    return password_hasher.run(pwd_context.hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Async variant of `verify_password`"""
+    return await password_hasher.run_async(pwd_context.verify, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Async variant of `get_password_hash`"""
+    return await password_hasher.run_async(pwd_context.hash, password)
@@ -0,0 +1,59 @@
+import argparse
+import logging
+from pathlib import Path
+
+from app import crud
+from app.db.importer import FORMATS, import_movies
+from app.db.session import SessionLocal
+from config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Stream movies from a JSON, JSON lines or TSV file into the database, "
+        "updating existing movies with the same name and director."
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=FORMATS, help="detected from the file suffix by default")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="file recording the progress, an interrupted import resumes from it",
+    )
+    parser.add_argument("--owner-email", default=settings.ADMIN_EMAIL, help="user the new movies belong to")
+    parser.add_argument("--no-copy", action="store_true", help="insert with executemany instead of COPY")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    db = SessionLocal()
+    owner = crud.user.get_by_email(db, email=args.owner_email)
+    if not owner:
+        raise SystemExit(f"No user with email {args.owner_email}")
+
+    logger.info("Importing movies from %s", args.path)
+    stats = import_movies(
+        db,
+        args.path,
+        created_by_id=owner.id,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        copy=not args.no_copy,
+    )
+    logger.info(
+        "Imported %d records: %d inserted, %d updated, %d skipped",
+        stats.records,
+        stats.inserted,
+        stats.updated,
+        stats.skipped,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.endpoints import health, metrics
 from app.api.router import api_router
+from app.compression import CompressionMiddleware
+from app.db.profiling import ProfilingMiddleware
+from app.metrics import MetricsMiddleware
+from app.ratelimit import AdmissionController, AdmissionMiddleware
 from config import settings
+from core import PasswordHasherBusy
 
 # initialise the app
 app = FastAPI(
@@ -19,10 +26,47 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# statement count and DB time of every request in a `Server-Timing` header
+if settings.SQL_PROFILING:
+    app.add_middleware(ProfilingMiddleware)
+
+# brotli or gzip for bodies of at least COMPRESSION_MINIMUM_SIZE bytes
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+# shed load with a 503 once the worker has too many requests to handle
+if settings.ADMISSION_MAX_CONCURRENCY:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+            queue_size=settings.ADMISSION_QUEUE_SIZE,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        ),
+        exempt=("/health/live", "/metrics"),
+    )
+
+# latency, status and size of every request, exported on /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # include the api router
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(health.router, prefix="/health", tags=["health"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+
+
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/")
-def health():
+def ping():
+    """Static ping, see /health/live and /health/ready for the real checks."""
     return {"ping": "pong!"}